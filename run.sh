@@ -1,3 +1,9 @@
+# Back-to-back jobs on the same model: start a resident daemon once and submit to it
+# (see README "Resident Daemon"), instead of reloading the model for every launch:
+# CUDA_VISIBLE_DEVICES=0,1,2,3,4,5,6,7 \
+# python -m video_pipeline.cli.launch --config configs/agibot_scene.yaml --daemon /tmp/vp.sock &
+# python -m video_pipeline.cli.launch --config configs/agibot_scene.yaml --submit /tmp/vp.sock
+
 # CUDA_VISIBLE_DEVICES=0,1,2,3,4,5,6,7 \
 # python -m video_pipeline.cli.launch --config configs/skycaption.yaml
 
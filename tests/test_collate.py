@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip("torch")
+
+from video_pipeline.data.base import BaseDataset
+from video_pipeline.data.collate import collate_batch
+
+
+class ShortTask:
+    """Task stub whose short_circuit answers every sample (no generation needed)."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def short_circuit(self, sample):
+        return {"caption": f"{self.name} of {sample['__key']}"}
+
+
+class StubDataset(BaseDataset):
+    def build_item(self, line_idx, sample, contexts=None):
+        raise AssertionError("every task short-circuits, nothing should be built")
+
+
+def make_dataset(tasks):
+    return StubDataset(
+        samples=[], model_path="stub", video_field="video", id_field=None,
+        vision_kwargs={}, task=tasks[0], tasks=tasks,
+    )
+
+
+def test_multi_task_all_short_circuit_has_one_entry_per_task():
+    ds = make_dataset([ShortTask("a"), ShortTask("b")])
+    batch = collate_batch([ds.make_item(0, {"video": "v.mp4"})])
+    assert batch["tasks"] == ["a", "b"]
+    assert batch["llm_inputs"] == [None, None]
+    assert batch["short"] == [{"caption": "a of 0"}, {"caption": "b of 0"}]
+    assert batch["error"] == [None, None]
+
+
+def test_single_task_all_short_circuit():
+    ds = make_dataset([ShortTask("a")])
+    batch = collate_batch([ds.make_item(3, {"video": "v.mp4"})])
+    assert batch["tasks"] == [None]
+    assert batch["short"] == [{"caption": "a of 3"}]
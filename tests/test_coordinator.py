@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from video_pipeline.utils.coordinator import (
+    CoordinatorState,
+    connect_coordinator,
+    serve_coordinator,
+    start_heartbeat,
+)
+
+AUTHKEY = b"test-coordinator"
+
+
+@pytest.fixture
+def coordinator():
+    # the server thread is a daemon; it goes away with the test process
+    def serve(chunks, **kwargs):
+        state = CoordinatorState(chunks, **kwargs)
+        server = serve_coordinator(state, ("127.0.0.1", 0), AUTHKEY)
+        return state, server.address
+
+    return serve
+
+
+def chunks_of(n, size):
+    return [list(range(i, min(i + size, n))) for i in range(0, n, size)]
+
+
+def run_node(address, node_id, got, *, consumers=2, delay_s=0.0):
+    """A node in a thread: its consumers drain the node's work queue, then it reports idle (like cli/launch.py)."""
+    manager = connect_coordinator(address, AUTHKEY)
+    state = manager.state()
+    stop = start_heartbeat(state, node_id, interval_s=0.05)
+    state.register(node_id, 1)
+    work_q = manager.work_queue(node_id)
+
+    def consume():
+        while True:
+            chunk = work_q.get()
+            if chunk is None:
+                return
+            time.sleep(delay_s)
+            got.extend(chunk)
+
+    while True:
+        threads = [threading.Thread(target=consume) for _ in range(consumers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if not state.node_idle(node_id):
+            break
+    stop.set()
+
+
+def start(target, *args, **kwargs):
+    t = threading.Thread(target=target, args=args, kwargs=kwargs, daemon=True)
+    t.start()
+    return t
+
+
+def test_two_nodes_process_every_line_once(coordinator):
+    state, address = coordinator(chunks_of(100, 7), num_nodes=2)
+    got = []
+    nodes = [start(run_node, address, f"node{i}", got) for i in range(2)]
+    errors = state.wait_finished()
+    for t in nodes:
+        t.join(timeout=10)
+    assert errors == {"node0": None, "node1": None}
+    assert Counter(got) == Counter(range(100))
+    assert state.pending_lines() == 0
+
+
+def test_silent_node_is_retired_and_its_chunks_requeued(coordinator):
+    written = {0, 1}  # what the lost node wrote before it died; the filter drops it on requeue
+    state, address = coordinator(
+        chunks_of(60, 5),
+        num_nodes=2,
+        node_timeout_s=0.5,
+        requeue_filter=lambda lines: [i for i in lines if i not in written],
+    )
+    taken = []
+
+    def dying_node():
+        manager = connect_coordinator(address, AUTHKEY)
+        state = manager.state()
+        state.register("dead", 1)
+        work_q = manager.work_queue("dead")
+        taken.extend(work_q.get() for _ in range(2))
+        # no heartbeat, never reports idle
+
+    got = []
+    dead = start(dying_node)
+    live = start(run_node, address, "live", got, delay_s=0.01)
+    errors = state.wait_finished()
+    live.join(timeout=10)
+    dead.join(timeout=10)
+
+    assert all(taken) and written <= set(taken[0] + taken[1])
+    assert errors["live"] is None and "heartbeat" in errors["dead"]
+    assert Counter(got) == Counter(i for i in range(60) if i not in written)
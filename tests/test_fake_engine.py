@@ -0,0 +1,73 @@
+from video_pipeline.config.schema import SamplingConfig, VLLMConfig
+from video_pipeline.engine.base import generate_isolated
+from video_pipeline.engine.fake import FakeEngine
+
+
+class FailingFakeEngine(FakeEngine):
+    """FakeEngine that rejects prompts containing "corrupt", like an engine choking on one bad request."""
+
+    def _check(self, llm_input):
+        if "corrupt" in llm_input["prompt"]:
+            raise ValueError("cannot process request")
+
+    def generate_batch(self, llm_inputs, scfg):
+        for x in llm_inputs:
+            self._check(x)
+        return super().generate_batch(llm_inputs, scfg)
+
+    def add_request(self, request_id, llm_input, scfg):
+        self._check(llm_input)
+        super().add_request(request_id, llm_input, scfg)
+
+
+def make_engine(cls=FakeEngine):
+    return cls(VLLMConfig(model="fake", engine="fake", engine_params={"output_tokens_mean": 16}))
+
+
+def requests(n, corrupt=()):
+    reqs = []
+    for i in range(n):
+        x = {"prompt": f"{'corrupt ' if i in corrupt else ''}describe video {i}"}
+        if i % 3 == 0:
+            x["sampling_overrides"] = {"max_tokens": 4}
+        reqs.append(x)
+    return reqs
+
+
+def texts(outs):
+    return [o.outputs[0].text for o in outs]
+
+
+def test_batch_and_stream_outputs_match():
+    reqs = requests(20)
+    batch = texts(make_engine().generate_batch(reqs, SamplingConfig()))
+    assert all(batch) and len(set(batch)) == len(batch)
+    streamed = dict(make_engine().generate_stream(iter(enumerate(reqs)), SamplingConfig(), max_in_flight=4))
+    assert [streamed[i].outputs[0].text for i in range(len(reqs))] == batch
+    # batching does not change the output either
+    halves = make_engine().generate_batch(reqs[:7], SamplingConfig()) + make_engine().generate_batch(reqs[7:], SamplingConfig())
+    assert texts(halves) == batch
+
+
+def test_failing_sample_is_isolated_in_batch_mode():
+    reqs = requests(10, corrupt={3, 7})
+    expected = texts(make_engine().generate_batch(requests(10), SamplingConfig()))
+    outs = generate_isolated(make_engine(FailingFakeEngine), reqs, SamplingConfig())
+    for i, out in enumerate(outs):
+        if i in (3, 7):
+            assert isinstance(out, ValueError)
+        else:
+            assert out.outputs[0].text == expected[i]
+
+
+def test_failing_sample_is_isolated_in_stream_mode():
+    reqs = requests(10, corrupt={3, 7})
+    expected = texts(make_engine().generate_batch(requests(10), SamplingConfig()))
+    outs = dict(
+        make_engine(FailingFakeEngine).generate_stream(
+            iter(enumerate(reqs)), SamplingConfig(), max_in_flight=4, isolate_errors=True
+        )
+    )
+    assert sorted(outs) == list(range(10))
+    assert isinstance(outs[3], ValueError) and isinstance(outs[7], ValueError)
+    assert all(outs[i].outputs[0].text == expected[i] for i in range(10) if i not in (3, 7))
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+from collections import Counter
+
+import pytest
+
+web = pytest.importorskip("aiohttp.web")
+
+from video_pipeline.config.schema import SamplingConfig, VLLMConfig
+from video_pipeline.engine.base import generate_isolated
+from video_pipeline.engine.openai_http import HTTPEngineError, OpenAIHTTPEngine
+
+
+class StandInServer:
+    """Local stand-in for `vllm serve`: echoes the prompt; "flaky" prompts get two 503s first, "bad" ones a 400."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self.url = asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._chat)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/v1"
+
+    async def _chat(self, request):
+        body = await request.json()
+        prompt = body["messages"][-1]["content"]
+        self.calls[prompt] += 1
+        if prompt.startswith("flaky") and self.calls[prompt] <= 2:
+            return web.Response(status=503, text="overloaded")
+        if prompt.startswith("bad"):
+            return web.Response(status=400, text="invalid request")
+        return web.json_response({
+            "choices": [{"message": {"content": f"caption of {prompt}"}}],
+            "usage": {"prompt_tokens": 10},
+        })
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+@pytest.fixture
+def server():
+    s = StandInServer()
+    yield s
+    s.close()
+
+
+@pytest.fixture
+def engine(server):
+    vcfg = VLLMConfig(
+        model="stand-in",
+        engine="openai_http",
+        engine_params={"base_url": server.url, "backoff_s": 0.01, "max_retries": 3},
+    )
+    e = OpenAIHTTPEngine(vcfg)
+    yield e
+    e.close()
+
+
+def request(prompt):
+    return {"prompt": prompt, "messages": [{"role": "user", "content": prompt}]}
+
+
+def test_retries_until_success(server, engine):
+    [out] = engine.generate_batch([request("flaky 1")], SamplingConfig())
+    assert out.outputs[0].text == "caption of flaky 1"
+    assert server.calls["flaky 1"] == 3
+
+
+def test_failed_request_is_isolated_without_resending_the_others(server, engine):
+    outs = generate_isolated(engine, [request("ok 1"), request("bad 1"), request("ok 2")], SamplingConfig())
+    assert outs[0].outputs[0].text == "caption of ok 1"
+    assert isinstance(outs[1], HTTPEngineError)
+    assert outs[2].outputs[0].text == "caption of ok 2"
+    assert server.calls == Counter({"ok 1": 1, "bad 1": 1, "ok 2": 1})
+
+
+def test_batch_raises_without_return_exceptions(engine):
+    with pytest.raises(HTTPEngineError):
+        engine.generate_batch([request("ok 1"), request("bad 1")], SamplingConfig())
+
+
+def test_stream_isolates_failed_request(engine):
+    reqs = [(p, request(p)) for p in ("ok 1", "bad 1", "flaky 2", "ok 2")]
+    outs = dict(engine.generate_stream(iter(reqs), SamplingConfig(), max_in_flight=2, isolate_errors=True))
+    assert isinstance(outs.pop("bad 1"), HTTPEngineError)
+    assert {p: o.outputs[0].text for p, o in outs.items()} == {p: f"caption of {p}" for p in outs}
@@ -0,0 +1,271 @@
+# video_pipeline/cli/daemon.py
+"""
+Resident job daemon: one long-lived worker per GPU group keeps its engine (and the
+processor / tokenizer) loaded, and jobs are submitted over a local unix socket, so
+consecutive runs of the same model skip imports, model loading and graph capture.
+
+Each job is a config file: the daemon computes its pending work, shards it over the
+resident ranks exactly like the launcher (run.schedule), shows progress, and
+consolidates the outputs before replying. Jobs run one at a time in submission
+order; a job whose `vllm` section differs from the loaded one restarts the ranks
+(a vLLM engine cannot be released in-process), which then load the new engine.
+
+    daemon : python -m video_pipeline.cli.launch --config configs/agibot_scene.yaml --daemon /tmp/vp.sock
+    submit : python -m video_pipeline.cli.launch --config configs/agibot_scene.yaml --submit /tmp/vp.sock
+    stop   : python -m video_pipeline.cli.launch --submit /tmp/vp.sock --stop-daemon
+
+Without --authkey / VP_COORDINATOR_AUTHKEY the daemon generates a key and writes it
+to `<socket>.key` (mode 0600), where --submit picks it up.
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+import queue
+import secrets
+import time
+from multiprocessing.connection import AuthenticationError, Client, Listener
+from typing import Any, Dict, List, Optional
+
+from ..config.loader import load_config
+from ..utils.mp import find_free_port
+from .launch import _consolidate, _local_gpu_groups, _pending_work, _plan_work, _start_monitor
+
+
+def _drain(q) -> None:
+    # leftovers of a previous job (chunks of a rank that died, late progress ticks)
+    while True:
+        try:
+            q.get(timeout=0.1)
+        except queue.Empty:
+            return
+
+
+class ResidentRanks:
+    """The daemon's worker processes (cli/worker.py:daemon_worker_main), one per GPU group."""
+
+    def __init__(self, ctx, gpu_groups: List[List[int]], *, progress_q, work_q):
+        self.ctx = ctx
+        self.gpu_groups = gpu_groups
+        self.world_size = len(gpu_groups)
+        self.progress_q = progress_q
+        self.work_q = work_q
+        self.result_q = ctx.Queue()
+        self.master_port = find_free_port()
+        self.vcfg = None  # vllm section the ranks have loaded (set by the first job)
+        self.procs: List[Any] = [None] * self.world_size
+        self.job_qs: List[Any] = [None] * self.world_size
+        for rank in range(self.world_size):
+            self._spawn(rank)
+
+    def _spawn(self, rank: int) -> None:
+        from .worker import daemon_worker_main
+
+        job_q = self.ctx.Queue()
+        proc = self.ctx.Process(
+            target=daemon_worker_main,
+            kwargs=dict(
+                rank=rank,
+                world_size=self.world_size,
+                gpu_group=self.gpu_groups[rank],
+                master_addr="127.0.0.1",
+                master_port=self.master_port,
+                extra_env={"TOKENIZERS_PARALLELISM": "false"},
+                job_queue=job_q,
+                result_queue=self.result_q,
+                progress_queue=self.progress_q,
+                work_queue=self.work_q,
+            ),
+        )
+        proc.start()
+        self.procs[rank], self.job_qs[rank] = proc, job_q
+
+    def run(self, job: Dict[str, Any], plan_paths: List[Optional[str]], vcfg) -> Dict[int, str]:
+        """
+        Hand `job` to every rank and wait for all of them; -> {rank: error} of the ranks
+        that failed. `vcfg` is the job's vllm section; a new one restarts the ranks.
+        """
+        if self.vcfg is not None and vcfg != self.vcfg:
+            print("♻️  vllm config changed, restarting the ranks")
+            self.close()
+            self.master_port = find_free_port()
+            for rank in range(self.world_size):
+                self._spawn(rank)
+        self.vcfg = vcfg
+        for rank, proc in enumerate(self.procs):
+            if not proc.is_alive():
+                # lost in a previous job; the replacement loads its engine with this job
+                print(f"♻️  Rank {rank} exited (code {proc.exitcode}), restarting it")
+                self._spawn(rank)
+        for rank, job_q in enumerate(self.job_qs):
+            job_q.put({**job, "shard_plan": plan_paths[rank]})
+
+        waiting = set(range(self.world_size))
+        errors: Dict[int, str] = {}
+        while waiting:
+            try:
+                job_id, rank, error = self.result_q.get(timeout=1.0)
+            except queue.Empty:
+                for rank in list(waiting):
+                    proc = self.procs[rank]
+                    if not proc.is_alive():
+                        errors[rank] = f"rank process exited (code {proc.exitcode})"
+                        waiting.discard(rank)
+                continue
+            if job_id != job["job_id"] or rank not in waiting:
+                continue
+            waiting.discard(rank)
+            if error is not None:
+                errors[rank] = error
+        return errors
+
+    def close(self) -> None:
+        for proc, job_q in zip(self.procs, self.job_qs):
+            if proc.is_alive():
+                job_q.put(None)
+        for proc in self.procs:
+            proc.join(timeout=60)
+            if proc.is_alive():
+                proc.kill()
+                proc.join(timeout=5)
+
+
+def _run_submitted(ranks: ResidentRanks, msg: Dict[str, Any], *, job_id: int, tp: int) -> Dict[str, Any]:
+    t0 = time.monotonic()
+    if msg.get("cwd") != os.getcwd():
+        # data paths in the configs are relative to the working directory
+        return {"ok": False, "error": f"the daemon runs in {os.getcwd()}; submit jobs from there"}
+    try:
+        cfg = load_config(msg["config"])
+        if cfg.vllm.tensor_parallel_size != tp:
+            raise ValueError(
+                f"vllm.tensor_parallel_size={cfg.vllm.tensor_parallel_size} but the daemon's GPU groups use {tp}"
+            )
+        index, pending, out_paths, total, completed_count = _pending_work(cfg)
+        dynamic = cfg.run.schedule == "dynamic"
+        _drain(ranks.work_q)
+        _drain(ranks.progress_q)
+        plan_paths = _plan_work(cfg, index, pending, ranks.world_size, ranks.work_q if dynamic else None)
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    print(f"▶️  Job {job_id}: {msg['config']} ({len(pending)} pending samples)")
+    t = _start_monitor(ranks.progress_q, total, completed_count)
+    try:
+        errors = ranks.run(
+            {"job_id": job_id, "config_path": msg["config"], "dynamic": dynamic}, plan_paths, cfg.vllm
+        )
+    finally:
+        ranks.progress_q.put("__STOP__")
+        t.join(timeout=5)
+
+    # consolidate what the healthy ranks wrote; resubmitting the job picks up the rest
+    _consolidate(cfg, out_paths)
+    seconds = time.monotonic() - t0
+    if errors:
+        print(f"⚠️  Job {job_id} failed on rank(s) {sorted(errors)}")
+        return {"ok": False, "error": f"ranks did not finish: {errors}", "samples": len(pending), "seconds": seconds}
+    print(f"✅ Job {job_id} done in {seconds:.1f}s")
+    return {"ok": True, "error": None, "samples": len(pending), "seconds": seconds}
+
+
+def _check_socket_free(address: str, authkey: bytes) -> None:
+    if not os.path.exists(address):
+        return
+    try:
+        Client(address, family="AF_UNIX", authkey=authkey).close()
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(address)  # stale socket of a daemon that did not shut down cleanly
+        return
+    except AuthenticationError:
+        pass
+    raise RuntimeError(f"A daemon is already listening on {address}")
+
+
+def _key_path(address: str) -> str:
+    return address + ".key"
+
+
+def _write_key(address: str, authkey: str) -> None:
+    path = _key_path(address)
+    if os.path.exists(path):
+        os.unlink(path)  # a stale daemon's key (its mode may be wider)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(authkey)
+
+
+def _read_key(address: str) -> str:
+    try:
+        with open(_key_path(address)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        raise RuntimeError(
+            f"No {_key_path(address)}; pass the daemon's --authkey (or VP_COORDINATOR_AUTHKEY)"
+        ) from None
+
+
+def daemon_main(args, cfg) -> None:
+    """Start the resident ranks, warm their engines with `cfg`, then serve submitted jobs."""
+    key_file = not args.authkey
+    authkey = (secrets.token_hex(16) if key_file else args.authkey).encode()
+    _check_socket_free(args.daemon, authkey)
+    gpu_groups = _local_gpu_groups(args, cfg)
+
+    ctx = mp.get_context("spawn")
+    ranks = ResidentRanks(ctx, gpu_groups, progress_q=ctx.Queue(maxsize=10000), work_q=ctx.Queue())
+    try:
+        print(f"🔥 Daemon: loading {cfg.vllm.model} on {len(gpu_groups)} GPU group(s)")
+        warmup = {"job_id": 0, "config_path": os.path.abspath(args.config), "dynamic": False, "warmup": True}
+        errors = ranks.run(warmup, [None] * ranks.world_size, cfg.vllm)
+        if errors:
+            print(f"⚠️  Warm-up failed on rank(s) {sorted(errors)} (retried with the first job): {errors}")
+
+        if key_file:
+            _write_key(args.daemon, authkey.decode())
+        with Listener(args.daemon, family="AF_UNIX", authkey=authkey) as listener:
+            print(f"🛎️  Daemon ready on {args.daemon}")
+            job_id = 0
+            while True:
+                try:
+                    conn = listener.accept()
+                except AuthenticationError as e:
+                    print(f"⚠️  Rejected connection: {e}")
+                    continue
+                with conn:
+                    try:
+                        msg = conn.recv()
+                    except EOFError:
+                        continue
+                    if msg.get("cmd") == "stop":
+                        conn.send({"ok": True, "error": None})
+                        return
+                    job_id += 1
+                    reply = _run_submitted(ranks, msg, job_id=job_id, tp=cfg.vllm.tensor_parallel_size)
+                    try:
+                        conn.send(reply)
+                    except OSError:
+                        pass  # the client went away; the job's outputs are on disk anyway
+    finally:
+        if key_file and os.path.exists(_key_path(args.daemon)):
+            os.unlink(_key_path(args.daemon))
+        print("🛑 Daemon: stopping ranks")
+        ranks.close()
+        ranks.work_q.cancel_join_thread()
+
+
+def submit_main(args) -> None:
+    """Client side: submit `args.config` to a running daemon and wait for the job (or stop the daemon)."""
+    if args.stop_daemon:
+        msg: Dict[str, Any] = {"cmd": "stop"}
+    else:
+        msg = {"cmd": "run", "config": os.path.abspath(args.config), "cwd": os.getcwd()}
+    authkey = args.authkey or _read_key(args.submit)
+    with Client(args.submit, family="AF_UNIX", authkey=authkey.encode()) as conn:
+        conn.send(msg)
+        reply = conn.recv()
+    if not reply["ok"]:
+        raise RuntimeError(f"Daemon job failed: {reply['error']}")
+    if not args.stop_daemon:
+        print(f"✅ {reply['samples']} samples in {reply['seconds']:.1f}s")
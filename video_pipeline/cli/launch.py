@@ -3,14 +3,46 @@ from __future__ import annotations
 
 import argparse
 import multiprocessing as mp
+import os
+import secrets
+import socket
 import threading
-from typing import List, Optional
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from ..config.loader import load_config
-from ..utils.mp import find_free_port, make_gpu_groups, parse_visible_gpu_ids, spawn
+from ..config.loader import load_config, task_names
+from ..config.schema import make_vision_kwargs
+from ..utils.mp import find_free_port, make_gpu_groups, parse_visible_gpu_ids, supervise
 from ..utils.progress import ProgressMonitor
-from ..data.jsonl_reader import iter_jsonl
-from ..io.resume import load_done_keys
+from ..utils.coordinator import (
+    CoordinatorState,
+    connect_coordinator,
+    parse_address,
+    serve_coordinator,
+    start_heartbeat,
+)
+from ..data.jsonl_index import load_or_build_index
+from ..data.sharding import (
+    fill_work_queue,
+    iter_chunks,
+    load_taken_lines,
+    lpt_shards,
+    modulo_shards,
+    remove_shard_plan,
+    save_held_plan,
+    save_shard_plan,
+    taken_log_prefix,
+)
+from ..data.video_meta import estimate_costs, open_meta_cache
+from ..io.resume import (
+    iter_pending,
+    list_rank_outputs,
+    load_done_keys,
+    load_global_done_keys,
+    pending_line_idxs,
+    quarantine_path,
+    task_output_path,
+)
 
 
 def _parse_gpu_ids(s: Optional[str]) -> Optional[List[int]]:
@@ -19,78 +51,291 @@ def _parse_gpu_ids(s: Optional[str]) -> Optional[List[int]]:
     return [int(x) for x in s.split(",") if x.strip() != ""]
 
 
+def _pending_work(cfg) -> Tuple[Any, array, List[str], int, int]:
+    """-> (input index, pending line idxs, output paths, total, already completed) for progress."""
+    # total videos (all samples); also builds the sidecar index the workers reuse
+    index = load_or_build_index(cfg.data.input_jsonl)
+    total = len(index)
+
+    # Global done-set (all rank files of any previous world_size + consolidated output);
+    # the remaining work is resharded over the GPU groups available now.
+    # Multi-task runs: one output per task, a sample is pending while any task lacks it.
+    names = task_names(cfg)
+    out_paths = [task_output_path(cfg.data.output_jsonl, n, len(names) > 1) for n in names]
+    done_sets = [load_global_done_keys(p) for p in out_paths] if cfg.data.resume else [set()]
+    if cfg.data.resume and cfg.data.skip_quarantined:
+        # samples that failed to decode / generate before are not retried
+        for d, p in zip(done_sets, out_paths):
+            d |= load_global_done_keys(quarantine_path(p))
+    pending = pending_line_idxs(index, set.intersection(*done_sets), cfg.data.id_field)
+    if len(names) > 1:
+        # progress counts (sample, task) records
+        completed_count = sum(min(len(d), total) for d in done_sets)
+        total *= len(names)
+    else:
+        completed_count = total - len(pending)
+    return index, pending, out_paths, total, completed_count
+
+
+def _plan_work(cfg, index, pending, world_size: int, work_q) -> List[Optional[str]]:
+    """Fill `work_q` with chunks (dynamic schedule) or write the per-rank plan files; -> plan paths."""
+    if cfg.run.schedule == "dynamic":
+        remove_shard_plan(cfg.data.output_jsonl)  # stale taken-chunk logs / held plans
+        n_chunks = fill_work_queue(
+            work_q,
+            pending,
+            chunk_size=cfg.run.chunk_size,
+            num_consumers=world_size * max(1, cfg.data.num_workers),
+        )
+        print(f"🧩 Dynamic schedule: {len(pending)} samples in {n_chunks} chunks")
+        return [None] * world_size
+    if cfg.run.schedule == "static":
+        return save_shard_plan(cfg.data.output_jsonl, modulo_shards(pending, world_size))
+    if cfg.run.schedule == "balanced":
+        costs = estimate_costs(
+            (s for _, s in index.iter_lines(pending)),
+            video_field=cfg.data.video_field,
+            vision_kwargs=make_vision_kwargs(cfg.vision),
+            num_workers=cfg.run.probe_workers,
+            cache=open_meta_cache(cfg.data),
+        )
+        shards, loads = lpt_shards(pending, costs, world_size)
+        if loads and max(loads) > 0:
+            print(f"⚖️  Balanced schedule: est. load min/max = {min(loads) / max(loads):.3f}")
+        return save_shard_plan(cfg.data.output_jsonl, shards)
+    raise ValueError(f"Unknown run.schedule: {cfg.run.schedule}")
+
+
+def _start_monitor(q, total: int, completed_count: int) -> threading.Thread:
+    # Progress monitor thread in parent (terminal only shows this)
+    monitor = ProgressMonitor(total=total, desc="Completed", unit="video", initial=completed_count)
+    t = threading.Thread(target=monitor.run, kwargs=dict(q=q, stop_token="__STOP__"), daemon=True)
+    t.start()
+    return t
+
+
+def _worker_kwargs(
+    args, gpu_groups: List[List[int]], *, rank_base: int, world_size: int, progress_queue, plan_paths, work_q
+) -> List[Dict[str, Any]]:
+    master_port = find_free_port()
+    return [
+        dict(
+            rank=rank_base + i,
+            world_size=world_size,
+            gpu_group=group,
+            master_addr="127.0.0.1",
+            master_port=master_port,
+            config_path=args.config,
+            extra_env={"TOKENIZERS_PARALLELISM": "false"},
+            progress_queue=progress_queue,
+            shard_plan=plan_paths[i],
+            work_queue=work_q,
+        )
+        for i, group in enumerate(gpu_groups)
+    ]
+
+
+def _supervise(cfg, worker_kwargs_list, work_q) -> Optional[BaseException]:
+    """Run the ranks under the supervisor; -> the failure (if some rank did not finish)."""
+    from .worker import worker_main
+
+    def on_restart(kwargs) -> None:
+        if work_q is not None:
+            # the chunks the dead rank had taken go to its restarted process (which
+            # skips what was already written), not back on the shared queue
+            held = load_taken_lines(taken_log_prefix(cfg.data.output_jsonl, kwargs["rank"]))
+            if held:
+                kwargs["shard_plan"] = save_held_plan(cfg.data.output_jsonl, kwargs["rank"], held)
+            # the dead rank may have consumed some of its stop tokens already
+            for _ in range(max(1, cfg.data.num_workers)):
+                work_q.put(None)
+
+    try:
+        supervise(
+            worker_fn=worker_main,
+            worker_kwargs_list=worker_kwargs_list,
+            max_restarts=cfg.run.max_restarts,
+            on_restart=on_restart,
+        )
+    except RuntimeError as e:
+        # still consolidate what the healthy ranks wrote; resume picks up the rest
+        print(f"⚠️  {e}")
+        return e
+    return None
+
+
+def _consolidate(cfg, out_paths: List[str]) -> None:
+    # Consolidate rank-sharded JSONL files (and the quarantine files, if any sample failed)
+    from ..io.jsonl_consolidator import consolidate_jsonl
+    try:
+        for out_path in out_paths:
+            consolidate_jsonl(out_path, keep_rank_files=False, append=cfg.data.resume)
+            q_path = quarantine_path(out_path)
+            if list_rank_outputs(q_path):
+                consolidate_jsonl(q_path, keep_rank_files=False, append=cfg.data.resume)
+        remove_shard_plan(cfg.data.output_jsonl)
+    except Exception as e:
+        print(f"⚠️  JSONL consolidation failed: {e}")
+
+
+def _local_gpu_groups(args, cfg) -> List[List[int]]:
+    gpu_ids = _parse_gpu_ids(args.gpu_ids) or parse_visible_gpu_ids()
+    if gpu_ids is None:
+        raise ValueError("Please provide --gpu-ids or set CUDA_VISIBLE_DEVICES")
+    return make_gpu_groups(tp=cfg.vllm.tensor_parallel_size, dp=args.dp, gpu_ids=gpu_ids)
+
+
+def _requeue_filter(cfg, index) -> Callable[[List[int]], List[int]]:
+    """-> filter keeping the lines of a lost node's chunks that no rank file of this run holds yet."""
+    names = task_names(cfg)
+    out_paths = [task_output_path(cfg.data.output_jsonl, n, len(names) > 1) for n in names]
+
+    def still_pending(line_idxs: List[int]) -> List[int]:
+        done_sets = []
+        for out_path in out_paths:
+            done: set = set()
+            for p in (out_path, quarantine_path(out_path)):
+                for _, rank_file in list_rank_outputs(p):
+                    done |= load_done_keys(rank_file)
+            done_sets.append(done)
+        done = set.intersection(*done_sets)
+        return [i for i, _ in iter_pending(index.iter_lines(line_idxs), done, cfg.data.id_field)]
+
+    return still_pending
+
+
+def serve_main(args, cfg) -> None:
+    """Multi-node coordinator: hands out chunks of pending lines, aggregates progress, consolidates."""
+    index, pending, out_paths, total, completed_count = _pending_work(cfg)
+    remove_shard_plan(cfg.data.output_jsonl)  # stale taken-chunk logs / held plans
+    state = CoordinatorState(
+        iter_chunks(pending, cfg.run.chunk_size),
+        num_nodes=args.nodes,
+        node_timeout_s=args.node_timeout,
+        requeue_filter=_requeue_filter(cfg, index),
+    )
+    authkey = args.authkey
+    if not authkey:
+        authkey = secrets.token_hex(16)
+        print(f"🔑 Authkey: {authkey} (pass it to the nodes with --authkey or VP_COORDINATOR_AUTHKEY)")
+    serve_coordinator(state, parse_address(args.serve), authkey.encode())
+    print(f"🛰️  Coordinator on {args.serve}: {len(pending)} samples, waiting for {args.nodes} node(s)")
+
+    t = _start_monitor(state.progress_q, total, completed_count)
+    try:
+        errors = state.wait_finished()
+    finally:
+        state.progress_q.put("__STOP__")
+        t.join(timeout=5)
+
+    _consolidate(cfg, out_paths)
+    failed = {node: err for node, err in errors.items() if err}
+    left = state.pending_lines()
+    if left:
+        raise RuntimeError(f"{left} samples were not handed out, every node failed: {failed}")
+    if failed:
+        # their chunks were requeued and finished by the other nodes
+        print(f"⚠️  Nodes lost during the run: {failed}")
+
+
+def node_main(args, cfg) -> None:
+    """Multi-node worker host: runs one rank per local GPU group on the coordinator's work queue."""
+    gpu_groups = _local_gpu_groups(args, cfg)
+    manager = connect_coordinator(parse_address(args.coordinator), args.authkey.encode())
+    state = manager.state()
+    node_id = f"{socket.gethostname()}:{os.getpid()}"
+    stop_heartbeat = start_heartbeat(state, node_id)
+    try:
+        rank_base, world_size = state.register(node_id, len(gpu_groups))
+        print(f"🛰️  Node {node_id}: ranks {rank_base}..{rank_base + len(gpu_groups) - 1} of {world_size}")
+
+        work_q = manager.work_queue(node_id)
+        progress_q = manager.progress_queue()
+        while True:
+            worker_kwargs_list = _worker_kwargs(
+                args, gpu_groups, rank_base=rank_base, world_size=world_size,
+                progress_queue=progress_q, plan_paths=[None] * len(gpu_groups), work_q=work_q,
+            )
+            failure = _supervise(cfg, worker_kwargs_list, work_q)
+            # blocks while other nodes still work; True => a lost node's chunks were requeued
+            if not state.node_idle(node_id, None if failure is None else str(failure)):
+                break
+            print(f"🔁 Node {node_id}: picking up chunks of a lost node")
+    finally:
+        stop_heartbeat.set()
+    if failure is not None:
+        raise failure
+
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--config", type=str, required=True)
+    ap.add_argument("--config", type=str, default=None)
     ap.add_argument("--gpu-ids", type=str, default=None)
     ap.add_argument("--dp", type=int, default=None)
+    # multi-node: one coordinator (no GPUs needed) + one launcher per node
+    ap.add_argument("--serve", type=str, default=None, metavar="HOST:PORT", help="run as multi-node coordinator")
+    ap.add_argument("--nodes", type=int, default=1, help="(coordinator) nodes to wait for before starting")
+    ap.add_argument("--coordinator", type=str, default=None, metavar="HOST:PORT", help="join a coordinator")
+    ap.add_argument(
+        "--node-timeout", type=float, default=120.0, help="(coordinator) seconds without heartbeat before a node is lost"
+    )
+    # shared secret of the coordinator / daemon; generated (and printed / written to a file) if unset
+    ap.add_argument("--authkey", type=str, default=os.environ.get("VP_COORDINATOR_AUTHKEY"))
+    # resident daemon (engines stay loaded between jobs) + job submission
+    ap.add_argument("--daemon", type=str, default=None, metavar="SOCKET", help="run as job daemon on a unix socket")
+    ap.add_argument("--submit", type=str, default=None, metavar="SOCKET", help="submit --config to a daemon")
+    ap.add_argument("--stop-daemon", action="store_true", help="(with --submit) shut the daemon down")
     args = ap.parse_args()
+    if args.config is None and not (args.submit and args.stop_daemon):
+        ap.error("--config is required")
+    if args.coordinator and not args.authkey:
+        ap.error("--coordinator needs the coordinator's --authkey (or VP_COORDINATOR_AUTHKEY)")
 
-    cfg = load_config(args.config)
-    tp = cfg.vllm.tensor_parallel_size
+    if args.submit:
+        from .daemon import submit_main
+        return submit_main(args)
 
-    gpu_ids = _parse_gpu_ids(args.gpu_ids) or parse_visible_gpu_ids()
-    if gpu_ids is None:
-        raise ValueError("Please provide --gpu-ids or set CUDA_VISIBLE_DEVICES")
+    cfg = load_config(args.config)
+    if args.daemon:
+        from .daemon import daemon_main
+        return daemon_main(args, cfg)
+    if args.serve:
+        return serve_main(args, cfg)
+    if args.coordinator:
+        return node_main(args, cfg)
 
-    gpu_groups = make_gpu_groups(tp=tp, dp=args.dp, gpu_ids=gpu_ids)
+    gpu_groups = _local_gpu_groups(args, cfg)
     world_size = len(gpu_groups)
-    master_port = find_free_port()
 
-    # total videos (all samples)
-    total = sum(1 for _ in iter_jsonl(cfg.data.input_jsonl))
-    
-    # Calculate already completed count if resume is enabled
-    completed_count = 0
-    if cfg.data.resume:
-        import os
-        out_path = cfg.data.output_jsonl
-        root, ext = os.path.splitext(out_path)
-        
-        # Count completed items across all rank files
-        for rank in range(len(gpu_groups)):
-            rank_out_path = f"{root}.rank{rank}{ext}"
-            done_keys = load_done_keys(rank_out_path)
-            completed_count += len(done_keys)
+    index, pending, out_paths, total, completed_count = _pending_work(cfg)
 
-    # Queue for progress updates
     ctx = mp.get_context("spawn")
-    q = ctx.Queue(maxsize=10000)
 
-    # Progress monitor thread in parent (terminal only shows this)
-    monitor = ProgressMonitor(total=total, desc="Completed", unit="video", initial=completed_count)
-    t = threading.Thread(target=monitor.run, kwargs=dict(q=q, stop_token="__STOP__"), daemon=True)
-    t.start()
-
-    from .worker import worker_main
+    # Work distribution: static per-rank plan files, or a shared queue of chunks that
+    # ranks pull from as they drain (completion is recorded by each rank's checkpoint).
+    work_q = ctx.Queue() if cfg.run.schedule == "dynamic" else None
+    plan_paths = _plan_work(cfg, index, pending, world_size, work_q)
 
-    worker_kwargs_list = []
-    for rank, group in enumerate(gpu_groups):
-        worker_kwargs_list.append(
-            dict(
-                rank=rank,
-                world_size=world_size,
-                gpu_group=group,
-                master_addr="127.0.0.1",
-                master_port=master_port,
-                config_path=args.config,
-                extra_env={"TOKENIZERS_PARALLELISM": "false"},
-                progress_queue=q,          # <--- NEW
-            )
-        )
+    # Queue for progress updates
+    q = ctx.Queue(maxsize=10000)
+    t = _start_monitor(q, total, completed_count)
 
+    worker_kwargs_list = _worker_kwargs(
+        args, gpu_groups, rank_base=0, world_size=world_size,
+        progress_queue=q, plan_paths=plan_paths, work_q=work_q,
+    )
     try:
-        spawn(worker_fn=worker_main, worker_kwargs_list=worker_kwargs_list)
+        failure = _supervise(cfg, worker_kwargs_list, work_q)
     finally:
         q.put("__STOP__")
         t.join(timeout=5)
-    
-    # Consolidate rank-sharded JSONL files
-    from ..io.jsonl_consolidator import consolidate_jsonl
-    try:
-        consolidate_jsonl(cfg.data.output_jsonl, world_size=world_size, keep_rank_files=False)
-    except Exception as e:
-        print(f"⚠️  JSONL consolidation failed: {e}")
+        if work_q is not None:
+            # leftover chunks (e.g. a rank died) must not block interpreter exit
+            work_q.cancel_join_thread()
+
+    _consolidate(cfg, out_paths)
+    if failure is not None:
+        raise failure
 
 
 if __name__ == "__main__":
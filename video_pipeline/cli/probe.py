@@ -0,0 +1,59 @@
+# video_pipeline/cli/probe.py
+from __future__ import annotations
+
+import argparse
+
+from tqdm import tqdm
+
+# ✅ 只读容器头（torchcodec），不解码、不 import vllm
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Probe duration/fps/resolution of every video in the manifest into the metadata cache")
+    ap.add_argument("--config", type=str, required=True)
+    ap.add_argument("--workers", type=int, default=32)
+    ap.add_argument("--batch", type=int, default=4096, help="paths probed per round (bounds memory)")
+    args = ap.parse_args()
+
+    from ..config.loader import load_config
+    from ..data.jsonl_index import load_or_build_index
+    from ..data.video_meta import meta_from_sample, open_meta_cache
+
+    cfg = load_config(args.config)
+    index = load_or_build_index(cfg.data.input_jsonl)
+    cache = open_meta_cache(cfg.data)
+    if cache is None:
+        raise SystemExit("❌ The video meta cache is not writable; set data.meta_cache to a writable path")
+
+    n_ok = n_fail = n_manifest = 0
+    batch = []
+
+    def flush():
+        nonlocal n_ok, n_fail
+        found = cache.probe(batch, num_workers=args.workers)
+        for p in batch:
+            if found.get(p) is None:
+                n_fail += 1
+            else:
+                n_ok += 1
+        pbar.update(len(batch))
+        batch.clear()
+
+    with tqdm(total=len(index), desc="Probing", unit="video", dynamic_ncols=True) as pbar:
+        for _, sample in index.iter_lines(index.line_idxs):
+            path = sample.get(cfg.data.video_field)
+            if meta_from_sample(sample) is not None or not path:
+                n_manifest += 1
+                pbar.update(1)
+                continue
+            batch.append(str(path))
+            if len(batch) >= args.batch:
+                flush()
+        if batch:
+            flush()
+
+    print(f"✅ Probed: ok={n_ok} failed={n_fail} from_manifest={n_manifest} cache={cache.db_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,14 +17,15 @@ def main():
     args = ap.parse_args()
 
     # 延迟 import：让这个脚本尽量轻量
-    from ..config.loader import load_config
-    from ..data.jsonl_reader import iter_jsonl
+    from ..config.loader import load_config, task_names
+    from ..data.jsonl_index import iter_jsonl_shard
     from ..io.resume import make_key
     from ..utils.logging import setup_logging, LogConfig, get_logger
 
     # 触发 task/dataset 注册（按你项目的实际 import 方式调整）
     from ..tasks.registry import get_task
     from ..data.registry import get_dataset_cls
+    from ..config.schema import make_vision_kwargs
 
     cfg = load_config(args.config)
 
@@ -32,7 +33,7 @@ def main():
     logger = get_logger("video_pipeline.test_video_processing")
 
     # 这个测试仅依赖 task 的 message 构造与 dataset 的 video 处理
-    task = get_task(cfg.run.task)
+    task = get_task(task_names(cfg)[0])
     DatasetCls = get_dataset_cls(task.dataset_name)
 
     # 简单分片：可选（方便你用 python spawn 多进程时做快速验证）
@@ -40,15 +41,12 @@ def main():
     world_size = int(os.environ.get("WORLD_SIZE", "1"))
 
     indexed: List[Tuple[int, Dict[str, Any]]] = []
-    for line_idx, sample in iter_jsonl(cfg.data.input_jsonl):
-        if (line_idx % world_size) == rank:
-            indexed.append((line_idx, sample))
+    for line_idx, sample in iter_jsonl_shard(cfg.data.input_jsonl, rank, world_size):
+        indexed.append((line_idx, sample))
         if len(indexed) >= args.max_samples:
             break
 
-    vision_kwargs = {"total_pixels": cfg.vision.total_pixels, "min_pixels": cfg.vision.min_pixels}
-    if cfg.vision.fps is not None:
-        vision_kwargs["fps"] = cfg.vision.fps
+    vision_kwargs = make_vision_kwargs(cfg.vision)
 
     ds = DatasetCls(
         samples=indexed,
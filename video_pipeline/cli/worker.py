@@ -2,7 +2,45 @@
 from __future__ import annotations
 
 import os
-from typing import List, Dict, Any
+import queue
+import sys
+from contextlib import ExitStack
+from typing import List, Dict, Any, Optional
+
+
+def _set_worker_env(
+    *, rank: int, world_size: int, gpu_group: List[int], master_addr: str, master_port: int, extra_env: Dict[str, str]
+) -> None:
+    # must run BEFORE importing torch/vllm
+    os.environ["CUDA_VISIBLE_DEVICES"] = ",".join(str(i) for i in gpu_group)
+    os.environ["RANK"] = str(rank)
+    os.environ["WORLD_SIZE"] = str(world_size)
+    os.environ["LOCAL_RANK"] = "0"
+    os.environ["MASTER_ADDR"] = master_addr
+    os.environ["MASTER_PORT"] = str(master_port)
+    for k, v in (extra_env or {}).items():
+        os.environ[k] = str(v)
+
+
+def _init_worker_process() -> None:
+    import torch
+    if torch.cuda.is_available():  # the fake engine runs on CPU-only boxes
+        torch.cuda.set_device(0)
+
+
+def _setup_worker_logging(cfg):
+    from ..utils.logging import setup_logging, LogConfig, get_logger
+
+    # IMPORTANT: do NOT log to console from workers; file only
+    setup_logging(LogConfig(run_name=f"{cfg.run.task}", log_dir="logs", console=False, file=True))
+
+    # hard-silence vllm loggers (in case they bypass stdout redirect via handlers)
+    import logging
+    logging.getLogger("vllm").setLevel(logging.ERROR)
+    logging.getLogger("vllm.engine").setLevel(logging.ERROR)
+    logging.getLogger("vllm.worker").setLevel(logging.ERROR)
+    return get_logger("video_pipeline.worker")
+
 
 def worker_main(
     *,
@@ -14,121 +52,499 @@ def worker_main(
     config_path: str,
     extra_env: Dict[str, str],
     progress_queue,  # multiprocessing.Queue
+    shard_plan: Optional[str] = None,  # launcher's plan file; None => line_idx % world_size
+    work_queue=None,  # multiprocessing.Queue of line-idx chunks (run.schedule == "dynamic")
+    restart: int = 0,  # >0 => restarted by the launcher's supervisor: skip what this rank already wrote
 ) -> None:
     # 1) set env BEFORE importing torch/vllm
-    os.environ["CUDA_VISIBLE_DEVICES"] = ",".join(str(i) for i in gpu_group)
-    os.environ["RANK"] = str(rank)
-    os.environ["WORLD_SIZE"] = str(world_size)
-    os.environ["LOCAL_RANK"] = "0"
-    os.environ["MASTER_ADDR"] = master_addr
-    os.environ["MASTER_PORT"] = str(master_port)
-    for k, v in (extra_env or {}).items():
-        os.environ[k] = str(v)
+    _set_worker_env(
+        rank=rank, world_size=world_size, gpu_group=gpu_group,
+        master_addr=master_addr, master_port=master_port, extra_env=extra_env,
+    )
 
     # 2) redirect all stdout/stderr of this worker to file
     from ..utils.stdio import redirect_stdouterr
     with redirect_stdouterr(f"logs/stdout.rank{rank}.log"):
+        _init_worker_process()
 
-        import torch
-        torch.cuda.set_device(0)
+        from ..config.loader import load_config
+        from ..engine.registry import build_engine
+
+        cfg = load_config(config_path)
+        logger = _setup_worker_logging(cfg)
+
+        runner = build_engine(cfg.vllm)
+        try:
+            run_job(
+                cfg,
+                runner,
+                rank=rank,
+                world_size=world_size,
+                progress_queue=progress_queue,
+                shard_plan=shard_plan,
+                work_queue=work_queue,
+                restart=restart,
+                logger=logger,
+            )
+        finally:
+            runner.close()
+
+
+def daemon_worker_main(
+    *,
+    rank: int,
+    world_size: int,
+    gpu_group: List[int],
+    master_addr: str,
+    master_port: int,
+    extra_env: Dict[str, str],
+    job_queue,  # multiprocessing.Queue of job dicts (see cli/daemon.py); None => exit
+    result_queue,  # multiprocessing.Queue of (job_id, rank, error or None)
+    progress_queue,
+    work_queue,  # the daemon's shared chunk queue, used by jobs with run.schedule == "dynamic"
+) -> None:
+    """
+    Resident rank of the job daemon: the engine is built once and kept across jobs,
+    also across failed jobs. An engine cannot be released in-process (vLLM keeps its
+    GPU memory and distributed state), so a job whose `vllm` section differs from the
+    loaded one, or a failed engine build, ends the process; the daemon respawns it.
+    """
+    _set_worker_env(
+        rank=rank, world_size=world_size, gpu_group=gpu_group,
+        master_addr=master_addr, master_port=master_port, extra_env=extra_env,
+    )
+
+    from ..utils.stdio import redirect_stdouterr
+    with redirect_stdouterr(f"logs/stdout.rank{rank}.log"):
+        _init_worker_process()
 
         from ..config.loader import load_config
-        from ..utils.logging import setup_logging, LogConfig, get_logger
-        from ..tasks.registry import get_task
+        from ..engine.registry import build_engine
 
-        from ..data.registry import get_dataset_cls
-        from ..data.jsonl_reader import iter_jsonl
-        from ..data.collate import collate_batch
-        from ..engine.vllm_runner import VLLMRunner
-        from ..io.jsonl_writer import JsonlWriter
-        from ..io.resume import load_done_keys
+        runner, runner_vcfg = None, None
+        try:
+            while True:
+                job = job_queue.get()
+                if job is None:
+                    return
+                error = None
+                try:
+                    cfg = load_config(job["config_path"])
+                    logger = _setup_worker_logging(cfg)
+                    if runner is not None and runner_vcfg != cfg.vllm:
+                        logger.info("rank %d: vllm config changed, exiting to reload the engine", rank)
+                        result_queue.put((job["job_id"], rank, "vllm config changed; the rank restarts"))
+                        sys.exit(1)
+                    if runner is None:
+                        try:
+                            runner, runner_vcfg = build_engine(cfg.vllm), cfg.vllm
+                        except Exception as e:
+                            # a half-built engine may still hold the GPU: start over in a new process
+                            import traceback
+                            traceback.print_exc()  # -> logs/stdout.rank{rank}.log
+                            result_queue.put((job["job_id"], rank, f"engine build failed: {type(e).__name__}: {e}"))
+                            sys.exit(1)
+                    if not job.get("warmup"):
+                        logger.info("rank %d: job %s (%s)", rank, job["job_id"], job["config_path"])
+                        run_job(
+                            cfg,
+                            runner,
+                            rank=rank,
+                            world_size=world_size,
+                            progress_queue=progress_queue,
+                            shard_plan=job["shard_plan"],
+                            work_queue=work_queue if job["dynamic"] else None,
+                            logger=logger,
+                        )
+                except Exception as e:
+                    import traceback
+                    traceback.print_exc()  # -> logs/stdout.rank{rank}.log
+                    error = f"{type(e).__name__}: {e}"  # the engine is kept for the next job
+                result_queue.put((job["job_id"], rank, error))
+        finally:
+            if runner is not None:
+                runner.close()
 
-        cfg = load_config(config_path)
 
-        # 3) IMPORTANT: do NOT log to console from workers; file only
-        setup_logging(LogConfig(run_name=f"{cfg.run.task}", log_dir="logs", console=False, file=True))
-        logger = get_logger("video_pipeline.worker")
+def run_job(
+    cfg,
+    runner,
+    *,
+    rank: int,
+    world_size: int,
+    progress_queue,
+    shard_plan: Optional[str] = None,
+    work_queue=None,
+    restart: int = 0,
+    logger,
+) -> None:
+    """One run of `cfg` on this rank with an already built engine (which stays open)."""
+    from ..config.loader import task_names
+    from ..tasks.registry import get_task
 
-        # 4) hard-silence vllm loggers (in case they bypass stdout redirect via handlers)
-        import logging
-        logging.getLogger("vllm").setLevel(logging.ERROR)
-        logging.getLogger("vllm.engine").setLevel(logging.ERROR)
-        logging.getLogger("vllm.worker").setLevel(logging.ERROR)
+    from ..config.schema import make_vision_kwargs
+    from ..data.registry import get_dataset_cls
+    from ..data.jsonl_index import iter_jsonl_shard, load_or_build_index
+    from ..data.sharding import load_shard_plan, taken_log_prefix
+    from ..data.streaming import StreamingJsonlDataset
+    from ..data.video_meta import estimate_prompt_tokens, open_meta_cache
+    from ..data.frame_cache import open_frame_cache
+    from ..data.bucketing import TokenBudgetBatchSampler
+    from ..data.collate import collate_batch
+    from ..data.watchdog import DecodeTimeout, DecodeWatchdog
+    from ..engine.base import PrefixCacheStats, generate_isolated
+    from ..engine.result_cache import CachedEngine, open_result_cache
+    from ..io.jsonl_writer import JsonlWriter
+    from ..utils.pipeline import iter_threaded_batches, run_pipelined
+    from ..io.resume import (
+        iter_pending,
+        load_global_done_keys,
+        pending_line_filter,
+        quarantine_path,
+        rank_output_path,
+        task_output_path,
+    )
 
-        task = get_task(cfg.run.task)
+    names = task_names(cfg)
+    multi_task = len(names) > 1
+    tasks = {}
+    for name in names:
+        t = get_task(name)
         # inject task_params into task instance for tasks that need it
-        setattr(task, "task_params", cfg.task_params or {})
-        DatasetCls = get_dataset_cls(task.dataset_name)
-
-        # shard by line_idx % world_size
-        indexed = [(i, s) for i, s in iter_jsonl(cfg.data.input_jsonl) if (i % world_size) == rank]
-
-        out_path = cfg.data.output_jsonl
-        root, ext = os.path.splitext(out_path)
-        out_path = f"{root}.rank{rank}{ext}"
-
-        done = load_done_keys(out_path) if cfg.data.resume else set()
-
-        vision_kwargs = {"total_pixels": cfg.vision.total_pixels, "min_pixels": cfg.vision.min_pixels}
-        if cfg.vision.fps is not None:
-            vision_kwargs["fps"] = cfg.vision.fps
-
-        ds = DatasetCls(
-            samples=indexed,
-            model_path=cfg.vllm.model,
-            video_field=cfg.data.video_field,
-            id_field=cfg.data.id_field,
-            vision_kwargs=vision_kwargs,
-            task=task,
-            dataset_params=cfg.task_params.get("dataset", {}),
+        setattr(t, "task_params", cfg.task_params or {})
+        tasks[name] = t
+    task = tasks[names[0]]
+    if len({t.dataset_name for t in tasks.values()}) > 1:
+        raise ValueError(f"run.tasks must share one dataset type, got {[(n, t.dataset_name) for n, t in tasks.items()]}")
+    DatasetCls = get_dataset_cls(task.dataset_name)
+    if multi_task and not DatasetCls.supports_multi_task:
+        raise ValueError(f"Dataset {task.dataset_name} does not support multi-task runs")
+
+    out_paths = {n: task_output_path(cfg.data.output_jsonl, n, multi_task) for n in names}
+
+    # the launcher's plan / work queue already excludes finished keys; without them (or
+    # after a restart, when part of the plan has been written) fall back to the global
+    # done-set (all rank files + consolidated output, any world_size).
+    # A sample is done once every task is done for it.
+    own_plan = (shard_plan is not None or work_queue is not None) and not restart
+    done_by_task = {n: set() for n in names}
+    if (cfg.data.resume or restart) and (multi_task or not own_plan):
+        done_by_task = {n: load_global_done_keys(p) for n, p in out_paths.items()}
+        if cfg.data.skip_quarantined or restart:
+            for n, p in out_paths.items():
+                done_by_task[n] |= load_global_done_keys(quarantine_path(p))
+    if not own_plan:
+        done = set.intersection(*done_by_task.values())
+    else:
+        done = set()
+
+    vision_kwargs = make_vision_kwargs(cfg.vision)
+
+    ds_kwargs = dict(
+        model_path=cfg.vllm.model,
+        video_field=cfg.data.video_field,
+        id_field=cfg.data.id_field,
+        vision_kwargs=vision_kwargs,
+        task=task,
+        tasks=list(tasks.values()),
+        dataset_params=cfg.task_params.get("dataset", {}),
+        meta_cache=open_meta_cache(cfg.data),
+        frame_cache=open_frame_cache(cfg.vision),
+        catch_errors=cfg.run.isolate_errors,
+    )
+    if cfg.data.streaming or work_queue is not None:
+        # samples are read lazily inside the DataLoader (workers), sharded by rank + worker
+        # or pulled chunk by chunk from the launcher's work queue
+        ds = StreamingJsonlDataset(
+            DatasetCls(samples=[], **ds_kwargs),
+            input_jsonl=cfg.data.input_jsonl,
+            rank=rank,
+            world_size=world_size,
+            done_keys=done,
+            plan_path=shard_plan,
+            work_queue=work_queue,
+            taken_log=None if work_queue is None else taken_log_prefix(cfg.data.output_jsonl, rank),
         )
+    elif shard_plan is not None:
+        line_idxs = load_shard_plan(shard_plan)
+        line_filter = pending_line_filter(done, cfg.data.id_field)
+        if line_filter is not None:
+            line_idxs = [i for i in line_idxs if line_filter(i)]
+        planned = load_or_build_index(cfg.data.input_jsonl).iter_lines(line_idxs)
+        indexed = list(iter_pending(planned, done, cfg.data.id_field))
+        logger.info("rank %d: %d planned samples (restart %d)", rank, len(indexed), restart)
+        ds = DatasetCls(samples=indexed, **ds_kwargs)
+    else:
+        # shard by line_idx % world_size; completed keys are dropped here, before any
+        # decoding (line-number keys are skipped without even parsing the line)
+        shard = iter_jsonl_shard(
+            cfg.data.input_jsonl,
+            rank,
+            world_size,
+            line_filter=pending_line_filter(done, cfg.data.id_field),
+        )
+        indexed = list(iter_pending(shard, done, cfg.data.id_field))
+        logger.info("rank %d: %d pending samples (%d already done)", rank, len(indexed), len(done))
+        ds = DatasetCls(samples=indexed, **ds_kwargs)
+
+    base_ds = ds.dataset if isinstance(ds, StreamingJsonlDataset) else ds
+    if cfg.run.decode_timeout_s > 0:
+        if cfg.data.num_workers > 0:
+            # DataLoader workers are daemonic and cannot supervise decoder processes
+            logger.warning("run.decode_timeout_s needs data.num_workers == 0 (use run.decode_threads); ignored")
+        else:
+            base_ds.watchdog = DecodeWatchdog(
+                base_ds, num_procs=cfg.run.decode_threads, timeout_s=cfg.run.decode_timeout_s, logger=logger
+            )
 
-        from torch.utils.data import DataLoader
+    from torch.utils.data import BatchSampler, DataLoader, IterableDataset, SequentialSampler
+    batch_sampler = None
+    if not isinstance(ds, IterableDataset):
+        if cfg.run.batch_tokens > 0:
+            tokens = estimate_prompt_tokens(
+                [s for _, s in ds.samples],
+                video_field=cfg.data.video_field,
+                vision_kwargs=vision_kwargs,
+                num_workers=cfg.run.probe_workers,
+                cache=ds.meta_cache,
+            )
+            batch_sampler = TokenBudgetBatchSampler(
+                tokens, max_tokens=cfg.run.batch_tokens, max_batch_size=cfg.run.batch_size
+            )
+            logger.info(
+                "rank %d: %d samples in %d token-budget batches (~%.0f tokens total)",
+                rank, len(ds), len(batch_sampler), sum(tokens),
+            )
+        else:
+            batch_sampler = BatchSampler(SequentialSampler(ds), cfg.run.batch_size, drop_last=False)
+    elif cfg.run.batch_tokens > 0:
+        logger.warning("run.batch_tokens is ignored for streaming / dynamic datasets")
+
+    if batch_sampler is not None and cfg.data.num_workers == 0 and cfg.run.decode_threads > 1:
+        # decode items in a thread pool (video decoders release the GIL)
+        dl = iter_threaded_batches(
+            ds,
+            batches=batch_sampler,
+            collate_fn=collate_batch,
+            num_threads=cfg.run.decode_threads,
+        )
+    else:
         dl = DataLoader(
             ds,
-            batch_size=cfg.run.batch_size,
-            shuffle=False,
+            batch_size=cfg.run.batch_size if batch_sampler is None else 1,
+            batch_sampler=batch_sampler,
             num_workers=cfg.data.num_workers,
             pin_memory=cfg.data.pin_memory,
             collate_fn=collate_batch,
             persistent_workers=(cfg.data.num_workers > 0),
         )
 
-        runner = VLLMRunner(cfg.vllm)
+    result_cache = open_result_cache(cfg.run)
+    if result_cache is not None:
+        runner = CachedEngine(runner, result_cache)
+    prefix_stats = PrefixCacheStats()
+    report_every = max(1, cfg.run.log_every * cfg.run.batch_size)
 
-        with JsonlWriter(out_path, flush_every=cfg.run.flush_every, fsync_every=cfg.run.fsync_every) as w:
-            for batch in dl:
-                keys = batch["keys"]
-                raws = batch["raws"]
-                llm_inputs = batch["llm_inputs"]
+    def task_sample(raw: Dict[str, Any], ctx) -> Dict[str, Any]:
+        # the sample as the task saw it in build_messages: with its TaskContext (memoised
+        # intermediates, seeded rng); `raw` itself is written back unchanged
+        return raw if ctx is None else {**raw, "__ctx": ctx}
+
+    def engine_input(batch, j: int) -> Dict[str, Any]:
+        x = batch["llm_inputs"][j]
+        t = tasks[batch["tasks"][j] or task.name]
+        overrides = t.sampling_overrides(task_sample(batch["raws"][j], batch["ctx"][j]))
+        if overrides:
+            x = {**x, "sampling_overrides": overrides}
+        if runner.needs_messages:
+            x = {**x, "messages": batch["messages"][j]}
+        return x
+
+    def generate(batch):
+        # (multi-task) drop tasks already finished for this sample in a previous run;
+        # short-circuited entries are answered by the task and items that failed to
+        # decode are quarantined, neither reaches the engine
+        pending = [
+            j for j, (k, name) in enumerate(zip(batch["keys"], batch["tasks"]))
+            if k not in done_by_task[name or task.name]
+        ]
+        if not pending:
+            return None
+        errors = [j for j in pending if batch["error"][j] is not None]
+        shorts = [j for j in pending if batch["error"][j] is None and batch["short"][j] is not None]
+        keep = [j for j in pending if batch["error"][j] is None and batch["short"][j] is None]
+        inputs = [engine_input(batch, j) for j in keep]
+        if not inputs:
+            outputs = []
+        elif cfg.run.isolate_errors:
+            # a failing batch is bisected; failed requests come back as exceptions
+            outputs = generate_isolated(runner, inputs, cfg.sampling)
+        else:
+            outputs = runner.generate_batch(inputs, cfg.sampling)
+        return keep, outputs, shorts, errors
+
+    error_streak = [0]  # consecutive failed requests (engine errors) across batches
+
+    def count_failure(failed: bool, error: str) -> None:
+        error_streak[0] = error_streak[0] + 1 if failed else 0
+        if error_streak[0] > cfg.run.max_consecutive_errors:
+            raise RuntimeError(
+                f"{error_streak[0]} consecutive generation failures, engine looks broken; last: {error}"
+            )
 
-                keep = [(k, raw, inp) for k, raw, inp in zip(keys, raws, llm_inputs) if k not in done]
-                if not keep:
+    def write_error(k, raw, name: str, stage: str, error: str) -> None:
+        """Error record -> the task's quarantine file (skipped on resume unless data.skip_quarantined is false)."""
+        if stage == "decode" and error.startswith(DecodeTimeout.__name__):
+            stage = "timeout"
+        w = error_writers.get(name)
+        if w is None:
+            w = error_writers[name] = stack.enter_context(
+                JsonlWriter(rank_output_path(quarantine_path(out_paths[name]), rank))
+            )
+        w.write({
+            "__key": k,
+            "__task": name,
+            "__model": cfg.vllm.model,
+            "__rank": rank,
+            "__world_size": world_size,
+            "__stage": stage,
+            "__error": error,
+            "input": raw,
+        })
+        done_by_task[name].add(k)
+        logger.warning("rank %d: quarantined %s (%s, %s): %s", rank, k, name, stage, error)
+        try:
+            progress_queue.put_nowait(1)
+        except Exception:
+            pass
+
+    def write_one(k, raw, name: str, out=None, short: Optional[Dict[str, Any]] = None, ctx=None) -> None:
+        t = tasks[name]
+        if short is not None:
+            text, parsed = "", short
+        else:
+            text = out.outputs[0].text if out.outputs else ""
+            parsed = t.parse(text, task_sample(raw, ctx))
+        record = {
+            "__key": k,
+            "__task": name,
+            "__model": cfg.vllm.model,
+            "__rank": rank,
+            "__world_size": world_size,
+            "input": raw,
+            "output_text": text,
+            **t.extra_output_fields(),
+            **parsed,
+        }
+        if short is not None:
+            record["__short_circuit"] = True
+        elif getattr(out, "from_cache", False):
+            record["__cached"] = True
+        writers[name].write(record)
+        done_by_task[name].add(k)
+
+        if out is not None:
+            prefix_stats.update(out)
+            if prefix_stats.requests % report_every == 0:
+                logger.info("rank %d prefix cache: %s", rank, prefix_stats.summary())
+                if cfg.data.num_workers == 0:
+                    logger.info("rank %d decode latency: %s", rank, base_ds.decode_stats.summary())
+
+        # ✅ report progress (one video done)
+        try:
+            progress_queue.put_nowait(1)
+        except Exception:
+            # if queue is full, it's okay to drop some increments occasionally
+            pass
+
+    def write_results(batch, result) -> None:
+        keep, outputs, shorts, errors = result
+        for j in errors:
+            write_error(batch["keys"][j], batch["raws"][j], batch["tasks"][j] or task.name, "decode", batch["error"][j])
+        for j in shorts:
+            write_one(batch["keys"][j], batch["raws"][j], batch["tasks"][j] or task.name, short=batch["short"][j])
+        for j, out in zip(keep, outputs):
+            name = batch["tasks"][j] or task.name
+            if isinstance(out, Exception):
+                error = f"{type(out).__name__}: {out}"
+                count_failure(True, error)
+                write_error(batch["keys"][j], batch["raws"][j], name, "generate", error)
+                continue
+            count_failure(False, "")
+            write_one(batch["keys"][j], batch["raws"][j], name, out, ctx=batch["ctx"][j])
+
+    # continuous mode: short-circuit results and decode errors found while feeding the
+    # engine (prefetch thread) are handed to the main thread, which owns the writers
+    short_q: "queue.SimpleQueue" = queue.SimpleQueue()
+
+    def iter_requests():
+        for batch in dl:
+            for j, (k, raw, name) in enumerate(zip(batch["keys"], batch["raws"], batch["tasks"])):
+                name = name or task.name
+                if k in done_by_task[name]:
                     continue
+                if batch["error"][j] is not None or batch["short"][j] is not None:
+                    short_q.put((k, raw, name, batch["short"][j], batch["error"][j]))
+                else:
+                    yield (k, raw, name, batch["ctx"][j]), engine_input(batch, j)
+
+    def drain_shorts() -> None:
+        while True:
+            try:
+                k, raw, name, parsed, error = short_q.get_nowait()
+            except queue.Empty:
+                return
+            if error is not None:
+                write_error(k, raw, name, "decode", error)
+            else:
+                write_one(k, raw, name, short=parsed)
+
+    error_writers: Dict[str, Any] = {}  # opened on the first quarantined sample of a task
+    with ExitStack() as stack:
+        if base_ds.watchdog is not None:
+            stack.callback(base_ds.watchdog.close)
+        writers = {
+            n: stack.enter_context(
+                JsonlWriter(
+                    rank_output_path(p, rank),
+                    flush_every=cfg.run.flush_every,
+                    fsync_every=cfg.run.fsync_every,
+                )
+            )
+            for n, p in out_paths.items()
+        }
+        if cfg.run.engine_mode == "continuous":
+            # batch_size = max requests in flight; results are written as they finish
+            for (k, raw, name, ctx), out in runner.generate_stream(
+                iter_requests(), cfg.sampling, max_in_flight=cfg.run.batch_size,
+                isolate_errors=cfg.run.isolate_errors,
+            ):
+                if isinstance(out, Exception):
+                    error = f"{type(out).__name__}: {out}"
+                    count_failure(True, error)
+                    write_error(k, raw, name, "generate", error)
+                else:
+                    count_failure(False, "")
+                    write_one(k, raw, name, out, ctx=ctx)
+                drain_shorts()
+            drain_shorts()
+        elif cfg.run.prefetch_batches > 0:
+            # decode (background thread / DataLoader workers) -> generate (here) -> parse+write (writer thread)
+            run_pipelined(
+                dl,
+                generate,
+                write_results,
+                prefetch=cfg.run.prefetch_batches,
+                write_queue=cfg.run.write_queue,
+                logger=logger,
+                log_every=cfg.run.log_every,
+            )
+        else:
+            for batch in dl:
+                result = generate(batch)
+                if result is not None:
+                    write_results(batch, result)
 
-                keys2, raws2, inputs2 = zip(*keep)
-                outputs = runner.generate_batch(list(inputs2), cfg.sampling)
-
-                for k, raw, out in zip(keys2, raws2, outputs):
-                    text = out.outputs[0].text if out.outputs else ""
-                    parsed = task.parse(text, raw)
-                    record = {
-                        "__key": k,
-                        "__task": cfg.run.task,
-                        "__model": cfg.vllm.model,
-                        "__rank": rank,
-                        "__world_size": world_size,
-                        "input": raw,
-                        "output_text": text,
-                        **task.extra_output_fields(),
-                        **parsed,
-                    }
-                    w.write(record)
-                    done.add(k)
-
-                    # ✅ report progress (one video done)
-                    try:
-                        progress_queue.put_nowait(1)
-                    except Exception:
-                        # if queue is full, it's okay to drop some increments occasionally
-                        pass
+    logger.info("rank %d prefix cache (run total): %s", rank, prefix_stats.summary())
+    if cfg.data.num_workers == 0:  # with DataLoader workers the latencies stay in those processes
+        logger.info("rank %d decode latency (run total): %s", rank, base_ds.decode_stats.summary())
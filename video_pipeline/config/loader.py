@@ -2,7 +2,7 @@
 from __future__ import annotations
 import json
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 import yaml
 
@@ -26,4 +26,13 @@ def load_config(path: str) -> AppConfig:
         run=RunConfig(**raw["run"]),
         task_params=raw.get("task_params", {}),
     )
+    if not cfg.run.task and not cfg.run.tasks:
+        raise ValueError("run.task or run.tasks is required")
+    if cfg.run.tasks and not cfg.run.task:
+        cfg.run.task = "+".join(cfg.run.tasks)
+    if cfg.run.engine_mode not in ("batch", "continuous"):
+        raise ValueError(f"Unknown run.engine_mode: {cfg.run.engine_mode!r} (expected 'batch' or 'continuous')")
     return cfg
+
+def task_names(cfg: AppConfig) -> List[str]:
+    return list(cfg.run.tasks) or [cfg.run.task]
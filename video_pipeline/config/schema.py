@@ -1,7 +1,7 @@
 # video_pipeline/config/schema.py
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 @dataclass
 class DataConfig:
@@ -11,10 +11,14 @@ class DataConfig:
     num_workers: int = 0            # 建议默认0：视频解码+大对象传递更稳
     prefetch_factor: int = 2
     pin_memory: bool = False
+    streaming: bool = False         # True => IterableDataset 按需读取 jsonl，内存不随输入规模增长
+    meta_cache: Optional[str] = None  # 视频元数据缓存 (sqlite)；None => <input_jsonl>.meta.sqlite
 
     # 断点重启 / 分片
     output_jsonl: str = "outputs.jsonl"
     resume: bool = True
+    # 解码 / 生成失败的样本记录在 <output>.quarantine.jsonl；True => resume 时跳过它们，False => 重试
+    skip_quarantined: bool = True
     num_shards: int = 1
     shard_id: int = 0
 
@@ -26,9 +30,23 @@ class VisionConfig:
     min_pixels: int = 16 * 28 * 28
     fps: Optional[float] = None  # qwen-vl-utils 是否支持显式fps取决于版本；不强依赖
 
+    # 解码帧缓存（按视频内容 + 采样参数做 key，跨 task / 多次运行复用）；None => 关闭
+    frame_cache_dir: Optional[str] = None
+    frame_cache_max_gb: float = 200.0
+
+def make_vision_kwargs(vision_cfg: VisionConfig) -> Dict[str, Any]:
+    """VisionConfig -> kwargs injected into every video block of the messages."""
+    vision_kwargs: Dict[str, Any] = {"total_pixels": vision_cfg.total_pixels, "min_pixels": vision_cfg.min_pixels}
+    if vision_cfg.fps is not None:
+        vision_kwargs["fps"] = vision_cfg.fps
+    return vision_kwargs
+
 @dataclass
 class VLLMConfig:
     model: str
+    # 推理后端（engine/registry.py）："vllm" | "fake"（CPU 假引擎，用于压测 / 回归）| "openai_http"（OpenAI 兼容服务）
+    engine: str = "vllm"
+    engine_params: Dict[str, Any] = field(default_factory=dict)
     dtype: str = "bfloat16"
     max_model_len: int = 32768
     gpu_memory_utilization: float = 0.9
@@ -50,15 +68,55 @@ class SamplingConfig:
     top_p: float = 0.9
     max_tokens: int = 512
     repetition_penalty: float = 1.0
+    stop: Optional[List[str]] = None
+    json_schema: Optional[Dict[str, Any]] = None  # guided decoding：输出必须满足该 JSON schema
+
+    # task 可以按样本覆盖以上字段（Task.sampling_overrides），例如 stop / max_tokens / json_schema
 
 @dataclass
 class RunConfig:
-    task: str
+    task: str = ""
+    # 多任务单遍模式：同一 dataset 类型的多个 task，每个视频只解码一次；输出按 task 分文件
+    tasks: List[str] = field(default_factory=list)
     batch_size: int = 1
+    # >0 => 按估计的 prompt token 数（文本 + 视觉）分桶组 batch，每个 batch 总 token 不超过该值，
+    #       batch_size 变为单 batch 样本数上限（仅 map-style，streaming / dynamic 时忽略）
+    batch_tokens: int = 0
     log_every: int = 20
     fsync_every: int = 1   # 每写几条 fsync 一次；=1 最安全但慢
     flush_every: int = 1   # 每写几条 flush 一次
 
+    # 调度："static" => 启动时按 rank 轮询切好；"balanced" => 按视频时长/分辨率估计成本做 LPT 装箱；
+    #       "dynamic" => launcher 维护任务队列，rank 按需领取 chunk
+    schedule: str = "static"
+    chunk_size: int = 32
+    probe_workers: int = 16   # balanced 预扫描视频元数据的线程数
+
+    # 流水线：解码 / 生成 / 解析写出 三段并行；0 => 串行（解码完一个 batch 再生成）
+    prefetch_batches: int = 0  # 已解码、等待生成的 batch 队列上限
+    write_queue: int = 2       # 已生成、等待解析写出的 batch 队列上限
+    decode_threads: int = 1    # data.num_workers == 0 时的解码线程数（map-style dataset）
+    # >0 => 每个样本的解码（构造 item）在受监管的子进程中进行（decode_threads 个），超时则杀掉并替换
+    #       该子进程，样本记为超时错误（进入 quarantine）；需要 data.num_workers == 0
+    decode_timeout_s: float = 0.0
+
+    # 生成模式："batch" => 每个 batch 同步 generate；"continuous" => 请求逐个提交给引擎，
+    #           batch_size 作为同时在飞的请求数上限，完成一条写一条
+    engine_mode: str = "batch"
+
+    # 故障隔离：单个样本解码失败、或引擎 batch 失败（二分定位出错的请求）时只隔离这些样本，
+    # 写入 quarantine 文件后继续；连续失败超过 max_consecutive_errors 条则认为引擎已坏，退出
+    isolate_errors: bool = True
+    max_consecutive_errors: int = 64
+
+    # 进程级容错：rank 异常退出后立即在同一组 GPU 上重启（从已写出的结果续跑）；某组 GPU 失败
+    # 超过 max_restarts 次则停用，剩余工作交给已完成的健康 rank 的 GPU 组
+    max_restarts: int = 2
+
+    # 结果缓存 (sqlite)：key = 引擎 + 模型 + 渲染后的 prompt + 媒体内容指纹 + sampling 参数；None => 关闭
+    result_cache: Optional[str] = None
+    result_cache_max_gb: float = 10.0
+
 @dataclass
 class AppConfig:
     data: DataConfig
@@ -1 +1,3 @@
-from . import qwen_video, first_frame, pure_text
\ No newline at end of file
+# dataset implementations (transformers / qwen-vl-utils / torchcodec) register themselves on
+# import; data/registry.py imports them on the first lookup, so the light modules here
+# (jsonl_index, sharding, video_meta, ...) load without those dependencies
@@ -1,17 +1,50 @@
 # video_pipeline/data/base.py
 from __future__ import annotations
+import threading
+import time
 from abc import ABC
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from torch.utils.data import Dataset
 
+from .frame_cache import FrameCache
+from .video_meta import VideoMetaCache
+from .watchdog import LatencyStats
+from ..io.resume import make_key
+from ..tasks.base import TaskContext
+
+
+_PRETRAINED: Dict[Tuple[str, str, Tuple[Tuple[str, Any], ...]], Any] = {}
+_PRETRAINED_LOCK = threading.Lock()
+
+
+def load_pretrained(loader, model_path: str, **kwargs) -> Any:
+    """
+    `loader.from_pretrained(model_path, **kwargs)`, loaded once per process: datasets
+    are rebuilt for every job of a resident daemon worker (cli/daemon.py), the
+    processor / tokenizer is not.
+    """
+    key = (loader.__name__, model_path, tuple(sorted(kwargs.items())))
+    with _PRETRAINED_LOCK:
+        if key not in _PRETRAINED:
+            _PRETRAINED[key] = loader.from_pretrained(model_path, **kwargs)
+        return _PRETRAINED[key]
+
+
 class BaseDataset(Dataset, ABC):
     """
     所有 dataset 的统一基类（可选，但推荐）。
-    约定：__getitem__ 返回 dict，至少包含：
+    子类实现 build_item(line_idx, sample)；map-style 的 __getitem__ 与
+    streaming 模式（见 data/streaming.py）都通过它构造样本。
+    约定：build_item 返回 dict，至少包含：
       - __key
       - raw
       - llm_input  (vLLM 需要的 {"prompt":..., "multi_modal_data":...})
+    多任务模式下（supports_multi_task 的子类）另含 llm_inputs: {task_name: llm_input}。
+    contexts: {task_name: TaskContext}，build_messages 前用 task_sample() 把对应的 context
+    放进 sample（make_item 会把它们附到 item 上，随 collate 传给 parse）。
     """
+    supports_multi_task: bool = False
+
     def __init__(
         self,
         *,
@@ -21,7 +54,11 @@ class BaseDataset(Dataset, ABC):
         id_field: Optional[str],
         vision_kwargs: Dict[str, Any],
         task,
+        tasks: Optional[List[Any]] = None,
         dataset_params: Optional[Dict[str, Any]] = None,
+        meta_cache: Optional[VideoMetaCache] = None,
+        frame_cache: Optional[FrameCache] = None,
+        catch_errors: bool = False,
     ):
         self.samples = samples
         self.model_path = model_path
@@ -29,4 +66,90 @@ class BaseDataset(Dataset, ABC):
         self.id_field = id_field
         self.vision_kwargs = vision_kwargs
         self.task = task
+        self.tasks = list(tasks) if tasks else [task]
         self.dataset_params = dataset_params or {}
+        self.meta_cache = meta_cache
+        self.frame_cache = frame_cache
+        self.catch_errors = catch_errors
+        self.watchdog = None  # data/watchdog.py DecodeWatchdog: build items in supervised processes
+        self.decode_stats = LatencyStats()
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        line_idx, sample = self.samples[i]
+        return self.make_item(line_idx, sample)
+
+    def make_item(self, line_idx: int, sample: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        build_item + task short-circuits. Tasks whose `short_circuit` returns a result
+        are recorded under `short_circuit` ({task name, or None for single-task runs:
+        parsed}); if every task short-circuits, nothing is built or decoded.
+
+        With `catch_errors`, an exception while building the item (corrupt video, ...)
+        does not propagate: the item carries `error` (message) and no llm_input.
+        With a `watchdog`, the item is built in a supervised child process under a
+        per-sample timeout. Wall time per item goes to `decode_stats`.
+        """
+        t0 = time.perf_counter()
+        try:
+            if self.watchdog is not None:
+                return self.watchdog.make_item(line_idx, sample)
+            key = make_key(line_idx, sample, self.id_field)
+            try:
+                return self._make_item(key, line_idx, sample)
+            except Exception as e:
+                if not self.catch_errors:
+                    raise
+                return self.error_item(line_idx, sample, f"{type(e).__name__}: {e}")
+        finally:
+            self.decode_stats.add(time.perf_counter() - t0)
+
+    def error_item(self, line_idx: int, sample: Dict[str, Any], error: str) -> Dict[str, Any]:
+        """Item for a sample that could not be built: no llm_input, `error` = message."""
+        item: Dict[str, Any] = {
+            "__key": make_key(line_idx, sample, self.id_field), "__line_idx": line_idx, "raw": sample,
+            "llm_input": None, "error": error,
+        }
+        if len(self.tasks) > 1:
+            item["llm_inputs"] = {t.name: None for t in self.tasks}
+        return item
+
+    def _make_item(self, key: str, line_idx: int, sample: Dict[str, Any]) -> Dict[str, Any]:
+        sample2 = {
+            **sample,
+            "__key": key,
+            "__line_idx": line_idx,
+            "__task_params": getattr(self.task, "task_params", {}),
+        }
+        multi = len(self.tasks) > 1
+        contexts = {t.name: TaskContext(key, t.name) for t in self.tasks}
+        short: Dict[Optional[str], Dict[str, Any]] = {}
+        for t in self.tasks:
+            parsed = t.short_circuit(self.task_sample(t, sample2, contexts))
+            if parsed is not None:
+                short[t.name if multi else None] = parsed
+        if len(short) == len(self.tasks):
+            item = {"__key": key, "__line_idx": line_idx, "raw": sample, "llm_input": None, "short_circuit": short}
+            if multi:
+                # like error_item: one entry per task, no single-task {None: llm_input} entry
+                item["llm_inputs"] = {t.name: None for t in self.tasks}
+        else:
+            item = self.build_item(line_idx, sample, contexts)
+            if short:
+                item["short_circuit"] = short
+        # keyed like short_circuit: task name, or None for single-task runs
+        item["contexts"] = {(n if multi else None): c for n, c in contexts.items()}
+        return item
+
+    def build_item(
+        self, line_idx: int, sample: Dict[str, Any], contexts: Optional[Dict[str, TaskContext]] = None
+    ) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    @staticmethod
+    def task_sample(task, sample2: Dict[str, Any], contexts: Optional[Dict[str, TaskContext]]) -> Dict[str, Any]:
+        """sample2 as seen by `task`: with its TaskContext under `__ctx` (if any)."""
+        ctx = (contexts or {}).get(task.name)
+        return sample2 if ctx is None else {**sample2, "__ctx": ctx}
@@ -0,0 +1,47 @@
+# video_pipeline/data/bucketing.py
+"""
+Token-budget batching: instead of `batch_size` samples in input order, samples are
+sorted by estimated prompt tokens (text + visual, see video_meta.estimate_prompt_tokens)
+and packed greedily so that every batch stays under `run.batch_tokens`, with at most
+`run.batch_size` samples. Similar lengths end up together, so one long clip no longer
+dictates the latency and KV memory of a batch of short ones.
+
+Batches are emitted longest first, so an over-large budget fails (OOM) right away
+rather than hours into a run.
+"""
+
+from __future__ import annotations
+
+from typing import Iterator, List, Sequence
+
+from torch.utils.data import Sampler
+
+
+def token_budget_batches(tokens: Sequence[float], *, max_tokens: float, max_batch_size: int) -> List[List[int]]:
+    """Indices grouped into batches with sum(tokens) <= max_tokens (a single larger sample forms its own batch)."""
+    order = sorted(range(len(tokens)), key=lambda i: (-tokens[i], i))
+    batches: List[List[int]] = []
+    cur: List[int] = []
+    cur_tokens = 0.0
+    for i in order:
+        if cur and (cur_tokens + tokens[i] > max_tokens or len(cur) >= max_batch_size):
+            batches.append(cur)
+            cur, cur_tokens = [], 0.0
+        cur.append(i)
+        cur_tokens += tokens[i]
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+class TokenBudgetBatchSampler(Sampler):
+    """batch_sampler for DataLoader over a map-style dataset."""
+
+    def __init__(self, tokens: Sequence[float], *, max_tokens: float, max_batch_size: int):
+        self.batches = token_budget_batches(tokens, max_tokens=max_tokens, max_batch_size=max_batch_size)
+
+    def __iter__(self) -> Iterator[List[int]]:
+        return iter(self.batches)
+
+    def __len__(self) -> int:
+        return len(self.batches)
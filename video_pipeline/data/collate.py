@@ -2,10 +2,46 @@
 from __future__ import annotations
 from typing import Any, Dict, List
 
+
 def collate_batch(items: List[Dict[str, Any]]) -> Dict[str, Any]:
-    return {
-        "keys": [it["__key"] for it in items],
-        "line_idxs": [it["__line_idx"] for it in items],
-        "raws": [it["raw"] for it in items],
-        "llm_inputs": [it["llm_input"] for it in items],
+    """
+    Multi-task items carry `llm_inputs` ({task_name: llm_input}); they are flattened so
+    that every task of every sample goes into the same engine batch. `tasks[i]` is the
+    task name of entry i (None for single-task items); `messages[i]` its chat messages.
+
+    `short[i]` is the task's short-circuit result (no generation needed) or None;
+    `ctx[i]` the TaskContext the dataset built for that (sample, task), for parse;
+    `error[i]` the message if the item could not be built (see BaseDataset.catch_errors).
+    """
+    entries = []
+    for it in items:
+        short = it.get("short_circuit") or {}
+        if it.get("llm_inputs"):
+            per_task = dict(it["llm_inputs"])
+        else:
+            per_task = {None: it["llm_input"]}
+        for task_name in short:
+            per_task.setdefault(task_name, None)
+        messages = it.get("messages_by_task") or {}
+        contexts = it.get("contexts") or {}
+        for task_name, llm_input in per_task.items():
+            entries.append((
+                it, task_name, llm_input, messages.get(task_name, it.get("messages")),
+                short.get(task_name), contexts.get(task_name), it.get("error"),
+            ))
+
+    out: Dict[str, List[Any]] = {
+        "keys": [], "line_idxs": [], "raws": [], "llm_inputs": [], "tasks": [], "messages": [], "short": [],
+        "ctx": [], "error": [],
     }
+    for it, task_name, llm_input, msgs, short_result, ctx, error in entries:
+        out["keys"].append(it["__key"])
+        out["line_idxs"].append(it["__line_idx"])
+        out["raws"].append(it["raw"])
+        out["llm_inputs"].append(llm_input)
+        out["tasks"].append(task_name)
+        out["messages"].append(msgs)
+        out["short"].append(short_result)
+        out["ctx"].append(ctx)
+        out["error"].append(error)
+    return out
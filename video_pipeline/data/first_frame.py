@@ -1,49 +1,30 @@
 from __future__ import annotations
-from typing import Any, Dict, Optional, Tuple, List
+from typing import Any, Dict, Optional
 
 from transformers import AutoProcessor
 from qwen_vl_utils import process_vision_info
 from torchcodec.decoders import SimpleVideoDecoder
 from torchvision.transforms import ToPILImage
 
-from .base import BaseDataset
+from .base import BaseDataset, load_pretrained
 from .registry import register_dataset
 from ..io.resume import make_key
+from ..tasks.base import TaskContext
 
 @register_dataset("first_frame")
 class QwenImageJsonlDataset(BaseDataset):
-    def __init__(
-        self,
-        *,
-        samples: List[Tuple[int, Dict[str, Any]]],
-        model_path: str,
-        video_field: str,
-        id_field: Optional[str],
-        vision_kwargs: Dict[str, Any],
-        task,
-        dataset_params: Optional[Dict[str, Any]] = None,
-    ):
-        super().__init__(
-            samples=samples,
-            model_path=model_path,
-            video_field=video_field,
-            id_field=id_field,
-            vision_kwargs=vision_kwargs,
-            task=task,
-            dataset_params=dataset_params,
-        )
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
         self._processor = None
 
     def _get_processor(self):
         if self._processor is None:
-            self._processor = AutoProcessor.from_pretrained(self.model_path)
+            self._processor = load_pretrained(AutoProcessor, self.model_path)
         return self._processor
 
-    def __len__(self) -> int:
-        return len(self.samples)
-
-    def __getitem__(self, i: int) -> Dict[str, Any]:
-        line_idx, sample = self.samples[i]
+    def build_item(
+        self, line_idx: int, sample: Dict[str, Any], contexts: Optional[Dict[str, TaskContext]] = None
+    ) -> Dict[str, Any]:
         key = make_key(line_idx, sample, self.id_field)
 
         video_path = sample[self.video_field]
@@ -56,7 +37,7 @@ class QwenImageJsonlDataset(BaseDataset):
         sample2["__line_idx"] = line_idx
         sample2["__image_pil"] = first_frame
 
-        messages = self.task.build_messages(sample2)
+        messages = self.task.build_messages(self.task_sample(self.task, sample2, contexts))
 
         processor = self._get_processor()
         prompt = processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
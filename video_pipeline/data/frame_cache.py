@@ -0,0 +1,162 @@
+# video_pipeline/data/frame_cache.py
+"""
+On-disk cache of decoded + resized video frames (output of `process_vision_info`).
+
+Entries are keyed by a content fingerprint of the video plus every sampling
+parameter in its message block (fps / nframes / min|max|total pixels / start|end)
+and the processor patch size, so different tasks that share `vision` settings reuse
+the same frames. Frames are stored as `.npy` and memory-mapped on read; the cache is
+size-bounded with LRU eviction (entry mtime is touched on every hit).
+
+Layout: <root>/<key[:2]>/<key>/{meta.json, video<i>.npy}
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from ..utils.fingerprint import content_fingerprint
+
+
+
+def _local_path(uri: str) -> str:
+    return uri[len("file://"):] if uri.startswith("file://") else uri
+
+
+def _jsonable(x: Any) -> Any:
+    if isinstance(x, torch.Tensor):
+        return x.tolist()
+    if isinstance(x, np.ndarray):
+        return x.tolist()
+    if isinstance(x, np.generic):
+        return x.item()
+    if isinstance(x, dict):
+        return {k: _jsonable(v) for k, v in x.items()}
+    if isinstance(x, (list, tuple)):
+        return [_jsonable(v) for v in x]
+    return x
+
+
+class FrameCache:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._fingerprints: Dict[Tuple[str, int, int], str] = {}
+        self._approx_bytes: Optional[int] = None
+
+    # ---------- keys ----------
+
+    def fingerprint(self, video_path: str) -> Optional[str]:
+        """Content hash of a local video (size + first/last MiB); memoised per (path, mtime, size)."""
+        path = _local_path(video_path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        memo_key = (path, st.st_mtime_ns, st.st_size)
+        fp = self._fingerprints.get(memo_key)
+        if fp is None:
+            fp = content_fingerprint(path, st.st_size)
+            self._fingerprints[memo_key] = fp
+        return fp
+
+    def make_key(self, video_item: Dict[str, Any], **extra: Any) -> Optional[str]:
+        """Key for one message video block (`{"type": "video", "video": uri, **vision_kwargs}`)."""
+        uri = str(video_item.get("video", ""))
+        if uri.startswith(("http://", "https://")):
+            return None
+        fp = self.fingerprint(uri)
+        if fp is None:
+            return None
+        params = {k: v for k, v in video_item.items() if k not in ("type", "video")}
+        blob = json.dumps({"video": fp, "params": params, **extra}, sort_keys=True, default=str)
+        return hashlib.sha1(blob.encode()).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    # ---------- get / put ----------
+
+    def get(self, key: str) -> Optional[Tuple[List[Any], Dict[str, Any]]]:
+        """(video_inputs, video_kwargs) as returned by process_vision_info, or None."""
+        d = self._entry_dir(key)
+        try:
+            with open(os.path.join(d, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            video_inputs: List[Any] = []
+            for i, vmeta in enumerate(meta["videos"]):
+                # copy-on-write mmap: 不读入整个数组，且得到可写 tensor
+                arr = np.load(os.path.join(d, f"video{i}.npy"), mmap_mode="c")
+                frames = torch.from_numpy(arr)
+                video_inputs.append((frames, vmeta) if vmeta is not None else frames)
+            os.utime(d)
+        except (OSError, ValueError, KeyError):
+            return None
+        return video_inputs, meta["video_kwargs"]
+
+    def put(self, key: str, video_inputs: List[Any], video_kwargs: Dict[str, Any]) -> None:
+        final = self._entry_dir(key)
+        if os.path.isdir(final):
+            return
+        tmp = os.path.join(self.root, "tmp", uuid.uuid4().hex)
+        os.makedirs(tmp, exist_ok=True)
+        try:
+            vmetas = []
+            nbytes = 0
+            for i, v in enumerate(video_inputs):
+                frames, vmeta = v if isinstance(v, tuple) else (v, None)
+                arr = frames.cpu().numpy() if isinstance(frames, torch.Tensor) else np.asarray(frames)
+                np.save(os.path.join(tmp, f"video{i}.npy"), arr)
+                nbytes += arr.nbytes
+                vmetas.append(_jsonable(vmeta))
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"videos": vmetas, "video_kwargs": _jsonable(video_kwargs)}, f)
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            os.rename(tmp, final)
+        except OSError:
+            # 另一个进程抢先写入同一个 key，或磁盘已满：放弃本次写入
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        if self._approx_bytes is not None:
+            self._approx_bytes += nbytes
+        if self._approx_bytes is None or self._approx_bytes > self.max_bytes:
+            self._evict()
+
+    # ---------- eviction ----------
+
+    def _evict(self) -> None:
+        """Scan the cache and drop least recently used entries down to 90% of max_bytes."""
+        entries = []
+        total = 0
+        for shard in os.scandir(self.root):
+            if not shard.is_dir() or shard.name == "tmp":
+                continue
+            for e in os.scandir(shard.path):
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(e.path))
+                    entries.append((e.stat().st_mtime, size, e.path))
+                except OSError:
+                    continue
+                total += size
+        if total > self.max_bytes:
+            target = int(self.max_bytes * 0.9)
+            for _, size, path in sorted(entries):
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                if total <= target:
+                    break
+        self._approx_bytes = total
+
+
+def open_frame_cache(vision_cfg) -> Optional[FrameCache]:
+    if not vision_cfg.frame_cache_dir:
+        return None
+    return FrameCache(vision_cfg.frame_cache_dir, int(vision_cfg.frame_cache_max_gb * (1 << 30)))
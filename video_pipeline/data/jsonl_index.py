@@ -0,0 +1,136 @@
+# video_pipeline/data/jsonl_index.py
+from __future__ import annotations
+
+import json
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# sidecar 格式: header(magic, size, mtime_ns, n) + n 个 line_idx + n 个 byte offset
+_MAGIC = b"VPJIDX01"
+_HEADER = struct.Struct("<8sQQQ")
+
+
+def index_path_for(jsonl_path: str) -> str:
+    return f"{jsonl_path}.idx"
+
+
+class JsonlIndex:
+    """
+    Line-offset index of a JSONL file.
+
+    Only non-empty lines are indexed; `line_idxs[k]` is the physical line number
+    (same numbering as `iter_jsonl`) and `offsets[k]` its byte offset. The index is
+    persisted next to the file and reused while the file's size/mtime match.
+    """
+
+    def __init__(self, path: str, line_idxs: array, offsets: array, *, size: int, mtime_ns: int):
+        self.path = path
+        self.line_idxs = line_idxs
+        self.offsets = offsets
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    def __len__(self) -> int:
+        return len(self.line_idxs)
+
+    # ---------- build / load ----------
+
+    @classmethod
+    def build(cls, path: str) -> "JsonlIndex":
+        st = os.stat(path)
+        line_idxs = array("q")
+        offsets = array("q")
+        pos = 0
+        with open(path, "rb") as f:
+            for i, line in enumerate(f):
+                if line.strip():
+                    line_idxs.append(i)
+                    offsets.append(pos)
+                pos += len(line)
+        return cls(path, line_idxs, offsets, size=st.st_size, mtime_ns=st.st_mtime_ns)
+
+    @classmethod
+    def load(cls, path: str, index_path: Optional[str] = None) -> Optional["JsonlIndex"]:
+        """Load the sidecar index; returns None if it is missing or stale."""
+        index_path = index_path or index_path_for(path)
+        try:
+            st = os.stat(path)
+            with open(index_path, "rb") as f:
+                magic, size, mtime_ns, n = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != _MAGIC or size != st.st_size or mtime_ns != st.st_mtime_ns:
+                    return None
+                line_idxs = array("q")
+                offsets = array("q")
+                line_idxs.fromfile(f, n)
+                offsets.fromfile(f, n)
+        except (OSError, EOFError, struct.error):
+            return None
+        return cls(path, line_idxs, offsets, size=size, mtime_ns=mtime_ns)
+
+    def save(self, index_path: Optional[str] = None) -> None:
+        index_path = index_path or index_path_for(self.path)
+        tmp = f"{index_path}.tmp.{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, self.size, self.mtime_ns, len(self)))
+            self.line_idxs.tofile(f)
+            self.offsets.tofile(f)
+        os.replace(tmp, index_path)
+
+    # ---------- queries ----------
+
+    def shard(self, rank: int, world_size: int) -> List[int]:
+        """Line indices owned by `rank` under `line_idx % world_size` sharding."""
+        return [i for i in self.line_idxs if (i % world_size) == rank]
+
+    def offset_of(self, line_idx: int) -> int:
+        # 没有空行时 line_idxs[k] == k，直接命中；否则二分
+        k = line_idx
+        if not (k < len(self.line_idxs) and self.line_idxs[k] == line_idx):
+            k = bisect_left(self.line_idxs, line_idx)
+            if k >= len(self.line_idxs) or self.line_idxs[k] != line_idx:
+                raise KeyError(f"line {line_idx} is empty or out of range in {self.path}")
+        return self.offsets[k]
+
+    def iter_lines(self, line_idxs: Iterable[int]) -> Iterator[Tuple[int, Dict]]:
+        """Seek to each requested line and parse only that line."""
+        with open(self.path, "rb") as f:
+            for i in line_idxs:
+                f.seek(self.offset_of(i))
+                yield i, json.loads(f.readline())
+
+
+def load_or_build_index(path: str, *, save: bool = True) -> JsonlIndex:
+    idx = JsonlIndex.load(path)
+    if idx is not None:
+        return idx
+    idx = JsonlIndex.build(path)
+    if save:
+        try:
+            idx.save()
+        except OSError:
+            # 只读目录：退化为内存索引
+            pass
+    return idx
+
+
+def count_jsonl(path: str) -> int:
+    return len(load_or_build_index(path))
+
+
+def iter_jsonl_shard(
+    path: str,
+    rank: int,
+    world_size: int,
+    line_filter: Optional[Callable[[int], bool]] = None,
+) -> Iterator[Tuple[int, Dict]]:
+    """Same items as `iter_jsonl` filtered by `line_idx % world_size == rank`, without
+    parsing the other ranks' lines. `line_filter(line_idx) -> False` skips a line
+    before it is read."""
+    idx = load_or_build_index(path)
+    line_idxs = idx.shard(rank, world_size)
+    if line_filter is not None:
+        line_idxs = [i for i in line_idxs if line_filter(i)]
+    return idx.iter_lines(line_idxs)
@@ -1,61 +1,34 @@
 # video_pipeline/data/dataset_qwen_video.py
 from __future__ import annotations
-from typing import Any, Dict, Optional, Tuple, List
+import json
+from typing import Any, Dict, List, Optional, Tuple
 
 from transformers import AutoProcessor
 from qwen_vl_utils import process_vision_info
 
-from .base import BaseDataset
+from .base import BaseDataset, load_pretrained
+from ..tasks.base import TaskContext
 from .registry import register_dataset
 from ..io.resume import make_key
 
 @register_dataset("qwen_video")
 class QwenVideoJsonlDataset(BaseDataset):
-    def __init__(
-        self,
-        *,
-        samples: List[Tuple[int, Dict[str, Any]]],
-        model_path: str,
-        video_field: str,
-        id_field: Optional[str],
-        vision_kwargs: Dict[str, Any],
-        task,
-        dataset_params: Optional[Dict[str, Any]] = None,
-    ):
-        super().__init__(
-            samples=samples,
-            model_path=model_path,
-            video_field=video_field,
-            id_field=id_field,
-            vision_kwargs=vision_kwargs,
-            task=task,
-            dataset_params=dataset_params,
-        )
+    supports_multi_task = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
         self._processor = None
 
     def _get_processor(self):
         if self._processor is None:
-            self._processor = AutoProcessor.from_pretrained(self.model_path)
+            self._processor = load_pretrained(AutoProcessor, self.model_path)
         return self._processor
 
-    def __len__(self) -> int:
-        return len(self.samples)
-
-    def __getitem__(self, i: int) -> Dict[str, Any]:
-        line_idx, sample = self.samples[i]
-        key = make_key(line_idx, sample, self.id_field)
-
-        video_path = sample[self.video_field]
-        video_uri = video_path if str(video_path).startswith(("http://", "https://", "file://")) else f"file://{video_path}"
-
-        sample2 = dict(sample)
-        sample2["__key"] = key
-        sample2["__line_idx"] = line_idx
-        sample2["__video_uri"] = video_uri
-
-        messages = self.task.build_messages(sample2)
-
-        # 注入 vision kwargs 到 video item
+    def _prepare_messages(self, messages: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], bool]:
+        """注入 vision kwargs 到 video item；返回 (video items, 是否含图片)。"""
+        video_first = bool(self.dataset_params.get("video_first", False))
+        video_items = []
+        has_image = False
         for msg in messages:
             if msg.get("role") != "user":
                 continue
@@ -64,9 +37,25 @@ class QwenVideoJsonlDataset(BaseDataset):
                 for item in content:
                     if isinstance(item, dict) and item.get("type") == "video":
                         item.update(self.vision_kwargs)
+                        video_items.append(item)
+                    elif isinstance(item, dict) and item.get("type") == "image":
+                        has_image = True
+                if video_first:
+                    # 视频块放在文本前面：system 相同的 task 共享 (system + video) 前缀，便于 prefix caching
+                    content.sort(key=lambda it: not (isinstance(it, dict) and it.get("type") == "video"))
+        return video_items, has_image
 
-        processor = self._get_processor()
-        prompt = processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    def _decode(self, messages, video_items, has_image, processor):
+        # 帧缓存：只缓存单视频、无图片的消息，命中则完全跳过解码
+        cache_key = None
+        if self.frame_cache is not None and len(video_items) == 1 and not has_image:
+            cache_key = self.frame_cache.make_key(
+                video_items[0], image_patch_size=processor.image_processor.patch_size
+            )
+        cached = self.frame_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            video_inputs, video_kwargs = cached
+            return None, video_inputs, video_kwargs
 
         image_inputs, video_inputs, video_kwargs = process_vision_info(
             messages,
@@ -74,23 +63,62 @@ class QwenVideoJsonlDataset(BaseDataset):
             return_video_kwargs=True,
             return_video_metadata=True
         )
-        # print(video_inputs[0][1]['frames_indices'])
-        mm_data: Dict[str, Any] = {}
-        if video_inputs is not None:
-            mm_data["video"] = video_inputs
-        if image_inputs is not None:
-            mm_data["image"] = image_inputs
-
-        llm_input = {
-            "prompt": prompt, 
-            "multi_modal_data": mm_data,
-            "mm_processor_kwargs": video_kwargs
-        }
+        if cache_key is not None and video_inputs is not None:
+            self.frame_cache.put(cache_key, video_inputs, video_kwargs)
+        return image_inputs, video_inputs, video_kwargs
+
+    def build_item(
+        self, line_idx: int, sample: Dict[str, Any], contexts: Optional[Dict[str, TaskContext]] = None
+    ) -> Dict[str, Any]:
+        key = make_key(line_idx, sample, self.id_field)
+
+        video_path = sample[self.video_field]
+        video_uri = video_path if str(video_path).startswith(("http://", "https://", "file://")) else f"file://{video_path}"
+
+        sample2 = dict(sample)
+        sample2["__key"] = key
+        sample2["__line_idx"] = line_idx
+        sample2["__video_uri"] = video_uri
+
+        processor = self._get_processor()
+
+        # 多任务：每个 task 各自构造 prompt，但相同的视觉输入只解码一次
+        decoded: Dict[str, Tuple[Any, Any, Any]] = {}
+        llm_inputs: Dict[str, Dict[str, Any]] = {}
+        messages_by_task: Dict[str, List[Dict[str, Any]]] = {}
+        for task in self.tasks:
+            messages = task.build_messages(self.task_sample(task, sample2, contexts))
+            video_items, has_image = self._prepare_messages(messages)
+            prompt = processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+
+            vis_sig = json.dumps([video_items, has_image], sort_keys=True, default=repr)
+            if vis_sig not in decoded:
+                decoded[vis_sig] = self._decode(messages, video_items, has_image, processor)
+            image_inputs, video_inputs, video_kwargs = decoded[vis_sig]
+
+            # print(video_inputs[0][1]['frames_indices'])
+            mm_data: Dict[str, Any] = {}
+            if video_inputs is not None:
+                mm_data["video"] = video_inputs
+            if image_inputs is not None:
+                mm_data["image"] = image_inputs
+
+            llm_inputs[task.name] = {
+                "prompt": prompt, 
+                "multi_modal_data": mm_data,
+                "mm_processor_kwargs": video_kwargs
+            }
+            messages_by_task[task.name] = messages
 
-        return {
+        first = self.tasks[0].name
+        item = {
             "__key": key,
             "__line_idx": line_idx,
             "raw": sample,
-            "messages": messages,
-            "llm_input": llm_input,
+            "messages": messages_by_task[first],
+            "llm_input": llm_inputs[first],
         }
+        if len(self.tasks) > 1:
+            item["llm_inputs"] = llm_inputs
+            item["messages_by_task"] = messages_by_task
+        return item
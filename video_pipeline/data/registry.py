@@ -12,6 +12,8 @@ def register_dataset(name: str):
     return deco
 
 def get_dataset_cls(name: str) -> Type[BaseDataset]:
+    # built-in datasets register on import (heavy: transformers, qwen-vl-utils, torchcodec)
+    from . import qwen_video, first_frame, pure_text  # noqa: F401
     if name not in _DATASETS:
         raise KeyError(f"Unknown dataset: {name}. Available: {sorted(_DATASETS.keys())}")
     return _DATASETS[name]
@@ -0,0 +1,152 @@
+# video_pipeline/data/sharding.py
+"""
+Shard plans: which input line indices each rank processes in this run.
+
+The launcher computes the plan from the *pending* lines (global done-set removed),
+so a restart can use any number of GPU groups. Each rank's share is stored as a
+flat int64 array under `<output root>.plan/rank<N>.idx`. `run.schedule: balanced`
+uses estimated per-video cost (see data/video_meta.py) instead of round-robin.
+
+With `run.schedule: dynamic` there is no static plan: the launcher puts chunks of
+pending lines on a work queue and every consumer (rank x DataLoader worker) pulls
+the next chunk when it runs dry, terminated by one `None` per consumer. Every
+consumer appends the chunks it takes to a log (`<output root>.taken/`), so the
+chunks a crashed rank was holding can be handed to its restarted process.
+"""
+
+from __future__ import annotations
+
+import heapq
+import os
+import shutil
+from array import array
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+
+def plan_dir_for(output_jsonl: str) -> str:
+    root, _ = os.path.splitext(output_jsonl)
+    return f"{root}.plan"
+
+
+def plan_path_for(output_jsonl: str, rank: int) -> str:
+    return os.path.join(plan_dir_for(output_jsonl), f"rank{rank}.idx")
+
+
+def held_plan_path_for(output_jsonl: str, rank: int) -> str:
+    return os.path.join(plan_dir_for(output_jsonl), f"held.rank{rank}.idx")
+
+
+def taken_dir_for(output_jsonl: str) -> str:
+    root, _ = os.path.splitext(output_jsonl)
+    return f"{root}.taken"
+
+
+def taken_log_prefix(output_jsonl: str, rank: int) -> str:
+    """Per-rank prefix of the taken-chunk logs; each consumer adds `.w<worker id>.idx`."""
+    return os.path.join(taken_dir_for(output_jsonl), f"rank{rank}")
+
+
+def modulo_shards(line_idxs: Sequence[int], world_size: int) -> List[array]:
+    """Round-robin over the pending lines, so every rank gets an equal share."""
+    return [array("q", line_idxs[r::world_size]) for r in range(world_size)]
+
+
+def lpt_shards(
+    line_idxs: Sequence[int], costs: Sequence[float], world_size: int
+) -> Tuple[List[array], List[float]]:
+    """
+    Longest-processing-time-first: assign samples in decreasing cost order to the
+    currently least loaded rank. Each shard keeps input order for sequential reads.
+    Returns (shards, estimated load per rank).
+    """
+    loads = [(0.0, r) for r in range(world_size)]
+    heapq.heapify(loads)
+    assigned: List[List[int]] = [[] for _ in range(world_size)]
+    for k in sorted(range(len(line_idxs)), key=lambda k: costs[k], reverse=True):
+        load, r = heapq.heappop(loads)
+        assigned[r].append(line_idxs[k])
+        heapq.heappush(loads, (load + costs[k], r))
+    per_rank = [0.0] * world_size
+    for load, r in loads:
+        per_rank[r] = load
+    return [array("q", sorted(a)) for a in assigned], per_rank
+
+
+def save_shard_plan(output_jsonl: str, shards: Sequence[Sequence[int]]) -> List[str]:
+    d = plan_dir_for(output_jsonl)
+    if os.path.isdir(d):
+        shutil.rmtree(d)
+    os.makedirs(d, exist_ok=True)
+    paths = []
+    for rank, shard in enumerate(shards):
+        p = plan_path_for(output_jsonl, rank)
+        with open(p, "wb") as f:
+            array("q", shard).tofile(f)
+        paths.append(p)
+    return paths
+
+
+def save_held_plan(output_jsonl: str, rank: int, line_idxs: Sequence[int]) -> str:
+    """Plan file with the lines a crashed rank had taken; its restarted process does them first."""
+    p = held_plan_path_for(output_jsonl, rank)
+    os.makedirs(os.path.dirname(p), exist_ok=True)
+    with open(p, "wb") as f:
+        array("q", line_idxs).tofile(f)
+    return p
+
+
+def load_shard_plan(plan_path: str) -> array:
+    line_idxs = array("q")
+    with open(plan_path, "rb") as f:
+        line_idxs.frombytes(f.read())
+    return line_idxs
+
+
+def remove_shard_plan(output_jsonl: str) -> None:
+    shutil.rmtree(plan_dir_for(output_jsonl), ignore_errors=True)
+    shutil.rmtree(taken_dir_for(output_jsonl), ignore_errors=True)
+
+
+def iter_chunks(line_idxs: Sequence[int], chunk_size: int) -> Iterator[List[int]]:
+    chunk_size = max(1, chunk_size)
+    for i in range(0, len(line_idxs), chunk_size):
+        yield list(line_idxs[i : i + chunk_size])
+
+
+def fill_work_queue(q, line_idxs: Sequence[int], *, chunk_size: int, num_consumers: int) -> int:
+    """Enqueue all chunks followed by one stop token per consumer; returns #chunks."""
+    n = 0
+    for chunk in iter_chunks(line_idxs, chunk_size):
+        q.put(chunk)
+        n += 1
+    for _ in range(num_consumers):
+        q.put(None)
+    return n
+
+
+def load_taken_lines(prefix: str) -> array:
+    """All lines logged by the consumers of one rank (see `taken_log_prefix`)."""
+    d, name = os.path.split(prefix)
+    line_idxs = array("q")
+    if os.path.isdir(d):
+        for fn in sorted(os.listdir(d)):
+            if fn.startswith(f"{name}.w") and fn.endswith(".idx"):
+                with open(os.path.join(d, fn), "rb") as f:
+                    data = f.read()
+                # a chunk torn by the crash is cut; it was never handed out
+                line_idxs.frombytes(data[: len(data) - len(data) % line_idxs.itemsize])
+    return line_idxs
+
+
+def iter_work_queue(q, log_path: Optional[str] = None) -> Iterator[int]:
+    """Lines of the chunks pulled from `q`; each chunk is appended to `log_path` before it is handed out."""
+    if log_path is not None:
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    while True:
+        chunk = q.get()
+        if chunk is None:
+            return
+        if log_path is not None:
+            with open(log_path, "ab") as f:
+                array("q", chunk).tofile(f)
+        yield from chunk
@@ -0,0 +1,77 @@
+# video_pipeline/data/streaming.py
+from __future__ import annotations
+
+import itertools
+from typing import Any, Dict, Iterable, Iterator, Optional, Set
+
+from torch.utils.data import IterableDataset, get_worker_info
+
+from .base import BaseDataset
+from .jsonl_index import JsonlIndex, load_or_build_index
+from .sharding import iter_work_queue, load_shard_plan
+from ..io.resume import iter_pending, pending_line_filter
+
+
+class StreamingJsonlDataset(IterableDataset):
+    """
+    Lazily reads samples from the input JSONL and builds items with a BaseDataset.
+
+    Lines are sharded first across ranks (`line_idx % world_size == rank`, same as the
+    map-style path, so keys/resume are unchanged) and then round-robin across DataLoader
+    workers. No per-rank sample list is kept in memory or pickled into workers; the
+    wrapped dataset is constructed with `samples=[]` and only its `make_item` is used.
+    With `plan_path` (the launcher's shard plan, see data/sharding.py) the rank's lines
+    are read from the plan instead of the modulo rule; with `work_queue` (dynamic
+    scheduling) chunks of lines are pulled from the launcher's queue on demand and
+    logged under `taken_log` (prefix, one file per worker). A restarted rank gets both:
+    `plan_path` then holds the lines its predecessor had taken, done before new chunks.
+    Keys in `done_keys` are dropped before `build_item`, i.e. before any decoding.
+    """
+
+    def __init__(
+        self,
+        dataset: BaseDataset,
+        *,
+        input_jsonl: str,
+        rank: int,
+        world_size: int,
+        done_keys: Optional[Set[str]] = None,
+        plan_path: Optional[str] = None,
+        work_queue=None,  # multiprocessing.Queue of line-idx chunks
+        taken_log: Optional[str] = None,
+    ):
+        super().__init__()
+        self.dataset = dataset
+        self.input_jsonl = input_jsonl
+        self.rank = rank
+        self.world_size = world_size
+        self.done_keys = done_keys or set()
+        self.plan_path = plan_path
+        self.work_queue = work_queue
+        self.taken_log = taken_log
+
+    def _iter_line_idxs(self, index: JsonlIndex, worker_id: int, num_workers: int) -> Iterator[int]:
+        if self.work_queue is not None:
+            # held lines are split round-robin; every consumer then pulls its own chunks
+            held = [] if self.plan_path is None else load_shard_plan(self.plan_path)[worker_id::num_workers]
+            log = None if self.taken_log is None else f"{self.taken_log}.w{worker_id}.idx"
+            worker_id, num_workers = 0, 1
+            owned: Iterable[int] = itertools.chain(held, iter_work_queue(self.work_queue, log))
+        elif self.plan_path is not None:
+            owned = load_shard_plan(self.plan_path)
+        else:
+            owned = (i for i in index.line_idxs if (i % self.world_size) == self.rank)
+        line_filter = pending_line_filter(self.done_keys, self.dataset.id_field)
+        for k, line_idx in enumerate(owned):
+            if (k % num_workers) != worker_id:
+                continue
+            if line_filter is None or line_filter(line_idx):
+                yield line_idx
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        info = get_worker_info()
+        worker_id, num_workers = (info.id, info.num_workers) if info is not None else (0, 1)
+        index = load_or_build_index(self.input_jsonl, save=False)
+        samples = index.iter_lines(self._iter_line_idxs(index, worker_id, num_workers))
+        for line_idx, sample in iter_pending(samples, self.done_keys, self.dataset.id_field):
+            yield self.dataset.make_item(line_idx, sample)
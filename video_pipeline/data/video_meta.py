@@ -0,0 +1,262 @@
+# video_pipeline/data/video_meta.py
+"""
+Cheap per-video metadata (duration / fps / resolution) and cost estimates.
+
+Metadata is taken from the manifest when a sample already carries it (top level or
+under `meta`), otherwise probed from the container header with torchcodec — no
+frames are decoded. Probe results are persisted in a SQLite sidecar
+(`VideoMetaCache`, default `<input_jsonl>.meta.sqlite`) keyed by video path and
+invalidated when the file's mtime or size changes.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+META_FIELDS = ("duration", "fps", "width", "height")
+
+# qwen-vl-utils 的默认采样规则（近似）
+_PATCH = 28            # 14px patch * 2x2 merge
+_TEMPORAL_PATCH = 2
+_DEFAULT_FPS = 2.0
+_MIN_FRAMES = 4
+_MAX_FRAMES = 768
+_VIDEO_MAX_PIXELS = 768 * 28 * 28
+_DECODE_WEIGHT = 0.05  # 解码成本（按源帧像素计）相对视觉 token 的权重
+_PROMPT_TOKENS = 256   # system / task 指令等固定文本 token 的粗略估计
+_CHARS_PER_TOKEN = 3.0
+
+
+def meta_from_sample(sample: Dict[str, Any]) -> Optional[Dict[str, float]]:
+    for src in (sample, sample.get("meta") or {}):
+        if isinstance(src, dict) and all(src.get(k) is not None for k in META_FIELDS):
+            return {k: float(src[k]) for k in META_FIELDS}
+    return None
+
+
+def probe_video(path: str) -> Optional[Dict[str, float]]:
+    """Read duration/fps/resolution from the container header; None if unreadable."""
+    from torchcodec.decoders import VideoDecoder
+
+    try:
+        # approximate 模式只读容器头，不做全文件扫描
+        md = VideoDecoder(_local_path(path), seek_mode="approximate").metadata
+    except Exception:
+        return None
+    duration = md.duration_seconds
+    fps = md.average_fps
+    if duration is None and md.num_frames is not None and fps:
+        duration = md.num_frames / fps
+    if duration is None or fps is None or md.width is None or md.height is None:
+        return None
+    return {"duration": float(duration), "fps": float(fps), "width": float(md.width), "height": float(md.height)}
+
+
+def _local_path(path: str) -> str:
+    return path[len("file://"):] if path.startswith("file://") else path
+
+
+def meta_cache_path_for(input_jsonl: str) -> str:
+    return f"{input_jsonl}.meta.sqlite"
+
+
+def open_meta_cache(data_cfg) -> Optional["VideoMetaCache"]:
+    """
+    VideoMetaCache for a DataConfig (`meta_cache` or the input's sidecar); None (probe
+    without caching) with a warning if the cache cannot be written, e.g. the input
+    lives on a read-only mount.
+    """
+    cache = VideoMetaCache(data_cfg.meta_cache or meta_cache_path_for(data_cfg.input_jsonl))
+    try:
+        cache.check_writable()
+    except (OSError, sqlite3.Error) as e:
+        logging.getLogger("video_pipeline.video_meta").warning(
+            "video meta cache %s is not writable (%s); probing without a cache "
+            "(set data.meta_cache to a writable path)", cache.db_path, e,
+        )
+        return None
+    return cache
+
+
+class VideoMetaCache:
+    """
+    Persistent path -> metadata cache. Entries are valid while the video's
+    (mtime_ns, size) match; unreadable videos are cached too (as None) so they are
+    not re-probed on every run. The connection is opened lazily per process, so the
+    object can be handed to DataLoader workers.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def __getstate__(self):
+        return {"db_path": self.db_path, "_conn": None, "_pid": None}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=60)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta ("
+                " path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, ok INTEGER,"
+                " duration REAL, fps REAL, width REAL, height REAL)"
+            )
+            self._pid = os.getpid()
+        return self._conn
+
+    def check_writable(self) -> None:
+        """Raises OSError / sqlite3.Error if the database cannot be created or written."""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        db.rollback()
+
+    @staticmethod
+    def _stat(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(_local_path(path))
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def lookup(self, paths: Sequence[str]) -> Dict[str, Optional[Dict[str, float]]]:
+        """Valid cached entries only; a missing key means "not cached / stale"."""
+        db = self._db()
+        out: Dict[str, Optional[Dict[str, float]]] = {}
+        for path in paths:
+            row = db.execute(
+                "SELECT mtime_ns, size, ok, duration, fps, width, height FROM meta WHERE path = ?",
+                (path,),
+            ).fetchone()
+            if row is None or self._stat(path) != (row[0], row[1]):
+                continue
+            out[path] = dict(zip(META_FIELDS, row[3:])) if row[2] else None
+        return out
+
+    def get(self, path: str) -> Optional[Dict[str, float]]:
+        return self.lookup([path]).get(path)
+
+    def put_many(self, items: Iterable[Tuple[str, Optional[Dict[str, float]]]]) -> None:
+        rows = []
+        for path, meta in items:
+            st = self._stat(path)
+            if st is None:
+                continue
+            vals = tuple(meta[k] for k in META_FIELDS) if meta else (None,) * len(META_FIELDS)
+            rows.append((path, st[0], st[1], int(meta is not None), *vals))
+        db = self._db()
+        with db:
+            db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def probe(self, paths: Sequence[str], *, num_workers: int = 16) -> Dict[str, Optional[Dict[str, float]]]:
+        """Cached metadata for `paths`, probing (in parallel) and storing the misses."""
+        uniq = list(dict.fromkeys(paths))
+        out = self.lookup(uniq)
+        todo = [p for p in uniq if p not in out]
+        if todo:
+            with ThreadPoolExecutor(max_workers=max(1, num_workers)) as ex:
+                probed = list(zip(todo, ex.map(probe_video, todo)))
+            self.put_many(probed)
+            out.update(probed)
+        return out
+
+
+def estimate_visual_tokens(meta: Dict[str, float], vision_kwargs: Dict[str, Any]) -> float:
+    """Approximate visual tokens after qwen-vl-utils frame sampling + resizing."""
+    fps = vision_kwargs.get("fps") or _DEFAULT_FPS
+    nframes = meta["duration"] * min(fps, meta["fps"] or fps)
+    nframes = max(_MIN_FRAMES, min(_MAX_FRAMES, nframes))
+    nframes = max(_TEMPORAL_PATCH, _TEMPORAL_PATCH * round(nframes / _TEMPORAL_PATCH))
+
+    pixels = meta["width"] * meta["height"]
+    max_pixels = vision_kwargs.get("max_pixels") or _VIDEO_MAX_PIXELS
+    total_pixels = vision_kwargs.get("total_pixels")
+    min_pixels = vision_kwargs.get("min_pixels") or 0
+    if total_pixels:
+        per_frame = total_pixels / nframes * _TEMPORAL_PATCH
+        max_pixels = min(max_pixels, per_frame)
+    pixels = min(pixels, max(max_pixels, min_pixels))
+    pixels = max(pixels, min_pixels)
+    return nframes / _TEMPORAL_PATCH * pixels / (_PATCH * _PATCH)
+
+
+def estimate_cost(meta: Dict[str, float], vision_kwargs: Dict[str, Any]) -> float:
+    """Relative decode + prefill cost of one video (unitless, for balancing)."""
+    src_frames = meta["duration"] * meta["fps"]
+    decode = src_frames * meta["width"] * meta["height"] / (_PATCH * _PATCH)
+    return estimate_visual_tokens(meta, vision_kwargs) + _DECODE_WEIGHT * decode
+
+
+def collect_meta(
+    samples: Iterable[Dict[str, Any]],
+    *,
+    video_field: str,
+    num_workers: int = 16,
+    cache: Optional[VideoMetaCache] = None,
+) -> List[Optional[Dict[str, float]]]:
+    """Manifest metadata where present, cached or freshly probed header metadata otherwise."""
+    metas: List[Optional[Dict[str, float]]] = []
+    paths: List[Optional[str]] = []
+    for s in samples:
+        metas.append(meta_from_sample(s))
+        paths.append(s.get(video_field))
+    todo = [i for i, m in enumerate(metas) if m is None and paths[i]]
+    if todo:
+        todo_paths = [str(paths[i]) for i in todo]
+        if cache is not None:
+            found = cache.probe(todo_paths, num_workers=num_workers)
+            probed: Iterable[Optional[Dict[str, float]]] = (found.get(p) for p in todo_paths)
+        else:
+            with ThreadPoolExecutor(max_workers=max(1, num_workers)) as ex:
+                probed = list(ex.map(probe_video, todo_paths))
+        for i, m in zip(todo, probed):
+            metas[i] = m
+    return metas
+
+
+def estimate_costs(
+    samples: Iterable[Dict[str, Any]],
+    *,
+    video_field: str,
+    vision_kwargs: Dict[str, Any],
+    num_workers: int = 16,
+    cache: Optional[VideoMetaCache] = None,
+) -> List[float]:
+    """Per-sample cost; samples without metadata get the median known cost."""
+    metas = collect_meta(samples, video_field=video_field, num_workers=num_workers, cache=cache)
+    costs = [estimate_cost(m, vision_kwargs) if m is not None else math.nan for m in metas]
+    known = sorted(c for c in costs if not math.isnan(c))
+    fallback = known[len(known) // 2] if known else 1.0
+    return [fallback if math.isnan(c) else c for c in costs]
+
+
+def estimate_prompt_tokens(
+    samples: Sequence[Dict[str, Any]],
+    *,
+    video_field: str,
+    vision_kwargs: Dict[str, Any],
+    num_workers: int = 16,
+    cache: Optional[VideoMetaCache] = None,
+) -> List[float]:
+    """
+    Approximate prompt length per sample: fixed instruction overhead + the sample's
+    own text (which tasks may splice into the prompt) + visual tokens. Samples
+    without metadata get the median visual token count.
+    """
+    metas = collect_meta(samples, video_field=video_field, num_workers=num_workers, cache=cache)
+    visual = [estimate_visual_tokens(m, vision_kwargs) if m is not None else math.nan for m in metas]
+    known = sorted(v for v in visual if not math.isnan(v))
+    fallback = known[len(known) // 2] if known else 0.0
+    out = []
+    for s, v in zip(samples, visual):
+        text = len(json.dumps(s, ensure_ascii=False)) / _CHARS_PER_TOKEN
+        out.append(_PROMPT_TOKENS + text + (fallback if math.isnan(v) else v))
+    return out
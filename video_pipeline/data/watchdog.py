@@ -0,0 +1,159 @@
+# video_pipeline/data/watchdog.py
+"""
+Decode watchdog: items are built (`BaseDataset.make_item`, i.e. video decoding) in
+supervised child processes with a per-sample wall-clock timeout.
+
+A decoder that hangs or spins on a malformed file cannot be interrupted inside a
+thread, so every decode runs in one of `num_procs` long-lived child processes.
+The calling thread waits at most `timeout_s` for the result; on timeout (or if the
+child crashes) the child is killed and replaced, and the sample comes back as an
+error item (`DecodeTimeout: ...`, see BaseDataset.catch_errors) so the batch goes on
+without it. Callers may be several decode threads (run.decode_threads); each takes
+an idle child for the duration of one sample.
+"""
+
+from __future__ import annotations
+
+import copy
+import multiprocessing as mp
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+class DecodeTimeout(RuntimeError):
+    pass
+
+
+class LatencyStats:
+    """Per-sample decode wall time (last `keep` samples) + timeout count."""
+
+    def __init__(self, keep: int = 100_000):
+        self._lat: Deque[float] = deque(maxlen=keep)
+        self.count = 0
+        self.timeouts = 0
+
+    def add(self, seconds: float) -> None:
+        self._lat.append(seconds)
+        self.count += 1
+
+    def summary(self) -> str:
+        lat: List[float] = sorted(self._lat)
+        if not lat:
+            return f"samples=0 timeouts={self.timeouts}"
+
+        def pct(p: float) -> float:
+            return lat[min(len(lat) - 1, int(p * len(lat)))]
+
+        return (
+            f"samples={self.count} p50={pct(0.5):.2f}s p99={pct(0.99):.2f}s max={lat[-1]:.2f}s "
+            f"timeouts={self.timeouts}"
+        )
+
+
+def _child_main(conn, dataset) -> None:
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            return
+        if msg is None:
+            return
+        line_idx, sample = msg
+        try:
+            reply = ("ok", dataset.make_item(line_idx, sample))
+        except Exception as e:  # noqa: BLE001 - re-raised by the parent
+            reply = ("err", f"{type(e).__name__}: {e}")
+        conn.send(reply)
+
+
+class _Child:
+    def __init__(self, ctx, dataset):
+        self.conn, child_conn = ctx.Pipe()
+        self.proc = ctx.Process(target=_child_main, args=(child_conn, dataset), name="decode-watchdog", daemon=True)
+        self.proc.start()
+        child_conn.close()
+
+    def kill(self) -> None:
+        self.proc.kill()
+        self.proc.join(timeout=5)
+        self.conn.close()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.proc.join(timeout=5)
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.conn.close()
+
+
+class DecodeWatchdog:
+    def __init__(self, dataset, *, num_procs: int, timeout_s: float, logger=None):
+        self.dataset = dataset
+        self.timeout_s = timeout_s
+        self.logger = logger
+        self._ctx = mp.get_context("spawn")  # the parent may already hold CUDA / threads
+        # children only need make_item: no sample list, no watchdog of their own
+        self._child_ds = copy.copy(dataset)
+        self._child_ds.samples = []
+        self._child_ds.watchdog = None
+        self._idle: "queue.Queue[_Child]" = queue.Queue()
+        self._all: List[_Child] = []
+        self._lock = threading.Lock()
+        for _ in range(max(1, num_procs)):
+            self._release(self._spawn())
+
+    def _spawn(self) -> _Child:
+        child = _Child(self._ctx, self._child_ds)
+        with self._lock:
+            self._all.append(child)
+        return child
+
+    def _release(self, child: _Child) -> None:
+        self._idle.put(child)
+
+    def _replace(self, child: _Child) -> None:
+        child.kill()
+        with self._lock:
+            self._all.remove(child)
+        self._release(self._spawn())
+
+    def make_item(self, line_idx: int, sample: Dict[str, Any]) -> Dict[str, Any]:
+        child = self._idle.get()
+        try:
+            child.conn.send((line_idx, sample))
+            t0 = time.perf_counter()
+            ready = child.conn.poll(self.timeout_s)
+            reply: Optional[tuple] = child.conn.recv() if ready else None
+        except (EOFError, OSError) as e:
+            self._replace(child)
+            return self._failed(line_idx, sample, f"decoder process died ({type(e).__name__}: {e})")
+        if reply is None:
+            self._replace(child)
+            self.dataset.decode_stats.timeouts += 1
+            waited = time.perf_counter() - t0
+            return self._failed(line_idx, sample, f"DecodeTimeout: no result after {waited:.0f}s", timeout=True)
+        self._release(child)
+        status, payload = reply
+        if status == "err":
+            raise RuntimeError(payload)  # only when the dataset does not catch errors itself
+        return payload
+
+    def _failed(self, line_idx: int, sample: Dict[str, Any], error: str, timeout: bool = False) -> Dict[str, Any]:
+        if self.logger is not None:
+            self.logger.warning("decode of line %d failed: %s", line_idx, error)
+        if not self.dataset.catch_errors:
+            raise DecodeTimeout(error) if timeout else RuntimeError(error)
+        return self.dataset.error_item(line_idx, sample, error)
+
+    def close(self) -> None:
+        with self._lock:
+            children = list(self._all)
+            self._all.clear()
+        for child in children:
+            child.stop()
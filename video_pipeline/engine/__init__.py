@@ -0,0 +1 @@
+from . import vllm_runner, fake, openai_http
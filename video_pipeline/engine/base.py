@@ -0,0 +1,208 @@
+# video_pipeline/engine/base.py
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ..config.schema import SamplingConfig
+from ..utils.pipeline import Prefetcher
+
+
+@dataclass
+class CompletionOutput:
+    """Minimal stand-in for vllm.CompletionOutput (what the worker reads)."""
+    text: str
+    token_ids: List[int] = field(default_factory=list)
+
+
+@dataclass
+class RequestOutput:
+    """Minimal stand-in for vllm.RequestOutput."""
+    request_id: str
+    outputs: List[CompletionOutput]
+    finished: bool = True
+    num_prompt_tokens: Optional[int] = None  # vllm exposes prompt_token_ids instead
+    num_cached_tokens: Optional[int] = None
+    from_cache: bool = False  # answered by the result cache (engine/result_cache.py)
+
+
+@dataclass
+class PrefixCacheStats:
+    """Prompt tokens vs. tokens served from the prefix cache, summed over outputs."""
+    requests: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    reported: int = 0  # outputs that carried prefix-cache information
+
+    def update(self, out: Any) -> None:
+        self.requests += 1
+        n_prompt = getattr(out, "num_prompt_tokens", None)
+        if n_prompt is None and getattr(out, "prompt_token_ids", None) is not None:
+            n_prompt = len(out.prompt_token_ids)
+        n_cached = getattr(out, "num_cached_tokens", None)
+        if n_prompt is None or n_cached is None:
+            return
+        self.reported += 1
+        self.prompt_tokens += n_prompt
+        self.cached_tokens += n_cached
+
+    def summary(self) -> str:
+        if not self.reported:
+            return f"requests={self.requests} (engine reports no prefix-cache info)"
+        rate = self.cached_tokens / max(1, self.prompt_tokens)
+        return (
+            f"requests={self.requests} prompt_tokens={self.prompt_tokens} "
+            f"hit_rate={rate:.1%} saved_prefill_tokens={self.cached_tokens}"
+        )
+
+
+@dataclass
+class RequestError:
+    """Returned by `step` in place of the output of a request that failed on its own."""
+    request_id: str
+    error: BaseException
+    finished: bool = True
+
+
+def request_sampling(llm_input: Dict[str, Any], scfg: SamplingConfig) -> Tuple[Dict[str, Any], SamplingConfig]:
+    """Strip a request's `sampling_overrides` (set by the worker from Task.sampling_overrides) and apply them."""
+    overrides = llm_input.get("sampling_overrides")
+    if not overrides:
+        return llm_input, scfg
+    return {k: v for k, v in llm_input.items() if k != "sampling_overrides"}, replace(scfg, **overrides)
+
+
+def generate_isolated(engine: "BaseEngine", llm_inputs: List[Dict[str, Any]], scfg: SamplingConfig) -> List[Any]:
+    """
+    `engine.generate_batch`, but a batch that raises is bisected until the requests
+    that make it fail are isolated; their slots hold the exception instead of an
+    output, everything else is generated normally. (The caller decides when too many
+    failures mean the engine itself is broken.) Engines with `per_request_errors`
+    report failed requests in place instead, so nothing is generated twice.
+    """
+    if engine.per_request_errors:
+        return engine.generate_batch(llm_inputs, scfg, return_exceptions=True)
+
+    results: List[Any] = [None] * len(llm_inputs)
+
+    def run(idxs: List[int]) -> None:
+        try:
+            outs = engine.generate_batch([llm_inputs[i] for i in idxs], scfg)
+        except Exception as e:
+            if len(idxs) == 1:
+                results[idxs[0]] = e
+                return
+            mid = len(idxs) // 2
+            run(idxs[:mid])
+            run(idxs[mid:])
+            return
+        for i, out in zip(idxs, outs):
+            results[i] = out
+
+    if llm_inputs:
+        run(list(range(len(llm_inputs))))
+    return results
+
+
+class BaseEngine(ABC):
+    """
+    Generation backend. Outputs only need `.outputs[0].text` (and `.request_id` /
+    `.finished` for streaming), so vLLM's RequestOutput and the dataclasses above
+    are interchangeable.
+
+    Continuous batching is built on three step-level hooks; engines that cannot
+    add requests incrementally only implement `generate_batch`. Every engine applies
+    per-request `sampling_overrides` via `request_sampling`.
+    """
+
+    # True => the worker adds the chat `messages` to every llm_input (HTTP backends)
+    needs_messages: bool = False
+    # True => requests are independent: generate_batch(..., return_exceptions=True)
+    # puts a failed request's exception in its slot instead of raising for the batch
+    per_request_errors: bool = False
+
+    def __init__(self, vcfg):
+        self.vcfg = vcfg
+
+    def close(self) -> None:
+        pass
+
+    @abstractmethod
+    def generate_batch(self, llm_inputs: List[Dict[str, Any]], scfg: SamplingConfig) -> List[Any]:
+        """One output per input, in input order."""
+
+    # ---------- step-level hooks (continuous batching) ----------
+
+    def add_request(self, request_id: str, llm_input: Dict[str, Any], scfg: SamplingConfig) -> None:
+        raise NotImplementedError(f"{type(self).__name__} does not support engine_mode: continuous")
+
+    def step(self) -> Sequence[Any]:
+        """Outputs that made progress; a request that failed alone comes back as a RequestError."""
+        raise NotImplementedError
+
+    def abort(self, request_ids: List[str]) -> None:
+        pass
+
+    def generate_stream(
+        self,
+        requests: Iterable[Tuple[Any, Dict[str, Any]]],
+        scfg: SamplingConfig,
+        *,
+        max_in_flight: int,
+        isolate_errors: bool = False,
+    ) -> Iterator[Tuple[Any, Any]]:
+        """
+        Continuous batching: `requests` yields (tag, llm_input) pairs (decoded in a
+        background thread); each is added to the engine as soon as it is ready and a
+        slot is free, and (tag, output) is yielded the moment it finishes.
+
+        With `isolate_errors` a request that `add_request` rejects or `step` reports as
+        a RequestError is yielded as (tag, exception) and the others go on. An exception
+        raised by `step` itself is an engine failure, not a request's, and propagates.
+        """
+        src = Prefetcher(requests, maxsize=max_in_flight)
+        in_flight: Dict[str, Any] = {}
+        next_id = 0
+        exhausted = False
+        try:
+            while True:
+                # top up: block for input only when the engine would otherwise idle
+                while not exhausted and len(in_flight) < max_in_flight:
+                    try:
+                        ready, req = src.poll(block=not in_flight)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if not ready:
+                        break
+                    tag, llm_input = req
+                    rid = str(next_id)
+                    next_id += 1
+                    try:
+                        self.add_request(rid, llm_input, scfg)
+                    except NotImplementedError:
+                        raise  # batch-only engine
+                    except Exception as e:
+                        if not isolate_errors:
+                            raise
+                        yield tag, e
+                        continue
+                    in_flight[rid] = tag
+                if not in_flight:
+                    if exhausted:
+                        return
+                    continue
+                for out in self.step():
+                    if not out.finished:
+                        continue
+                    tag = in_flight.pop(out.request_id)
+                    if isinstance(out, RequestError):
+                        if not isolate_errors:
+                            raise out.error
+                        yield tag, out.error
+                    else:
+                        yield tag, out
+        finally:
+            src.close()
+            if in_flight:
+                self.abort(list(in_flight))
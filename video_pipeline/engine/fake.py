@@ -0,0 +1,145 @@
+# video_pipeline/engine/fake.py
+"""
+CPU-only fake engine for benchmarking and regression-testing everything around
+generation (data path, writer, resume, scheduling) without GPUs or vllm.
+
+Per-request stop strings and JSON schemas are honoured (outputs are cut at the stop
+string / shaped like the schema). Outputs are deterministic: the output length and text are derived from a hash of
+the prompt (plus multimodal tensor shapes) and `seed`, so the same input always
+gives the same record regardless of batching, rank or schedule. Latency is
+simulated with sleeps:
+
+    batch      : per_request_latency_s * len(batch) + per_token_latency_s * longest output
+    continuous : every step costs per_token_latency_s, plus per_request_latency_s for
+                 each request added since the previous step (prefill)
+
+engine_params (vllm.engine_params):
+    per_request_latency_s: 0.0
+    per_token_latency_s: 0.0
+    output_tokens_mean: 64
+    output_tokens_std: 16
+    output_tokens_min: 1
+    seed: 0
+
+With vllm.enable_prefix_caching the engine also simulates a prefix cache: the prompt
+text before the first vision token counts as cached (in 16-token blocks) once any
+earlier request had the same prefix, and is reported via num_cached_tokens.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import time
+from typing import Any, Dict, List, Sequence
+
+from ..config.schema import SamplingConfig
+from .base import BaseEngine, CompletionOutput, RequestOutput, request_sampling
+from .registry import register_engine
+from ..utils.prompt import prompt_prefix
+
+_CHARS_PER_TOKEN = 4
+_BLOCK_TOKENS = 16
+
+_WORDS = (
+    "the", "a", "robot", "arm", "picks", "up", "places", "camera", "moves", "slowly",
+    "scene", "table", "object", "left", "right", "hand", "video", "shows", "person", "then",
+)
+
+
+def _shape_sig(x: Any) -> Any:
+    shape = getattr(x, "shape", None)
+    if shape is not None:
+        return tuple(shape)
+    if isinstance(x, (list, tuple)):
+        return [_shape_sig(v) for v in x]
+    if isinstance(x, dict):
+        return {k: _shape_sig(v) for k, v in sorted(x.items())}
+    return None
+
+
+def _schema_instance(schema: Dict[str, Any], text: str) -> Any:
+    """Smallest value satisfying a (simple) JSON schema; strings get `text`."""
+    t = schema.get("type")
+    if t == "object":
+        return {k: _schema_instance(v, text) for k, v in (schema.get("properties") or {}).items()}
+    if t == "array":
+        return [_schema_instance(schema.get("items") or {}, text)]
+    if t == "boolean":
+        return True
+    if t in ("integer", "number"):
+        return 0
+    return text
+
+
+@register_engine("fake")
+class FakeEngine(BaseEngine):
+    def __init__(self, vcfg):
+        super().__init__(vcfg)
+        p = vcfg.engine_params or {}
+        self.per_request_latency_s = float(p.get("per_request_latency_s", 0.0))
+        self.per_token_latency_s = float(p.get("per_token_latency_s", 0.0))
+        self.output_tokens_mean = float(p.get("output_tokens_mean", 64))
+        self.output_tokens_std = float(p.get("output_tokens_std", 16))
+        self.output_tokens_min = int(p.get("output_tokens_min", 1))
+        self.seed = int(p.get("seed", 0))
+        self._seen_prefixes = set() if vcfg.enable_prefix_caching else None
+        # continuous mode state: request_id -> [remaining tokens, output]
+        self._running: Dict[str, List[Any]] = {}
+        self._new_requests = 0
+
+    def _complete(self, request_id: str, llm_input: Dict[str, Any], scfg: SamplingConfig) -> RequestOutput:
+        llm_input, scfg = request_sampling(llm_input, scfg)
+        sig = repr((self.seed, llm_input.get("prompt"), _shape_sig(llm_input.get("multi_modal_data"))))
+        rng = random.Random(hashlib.sha1(sig.encode()).digest())
+        n = int(round(rng.gauss(self.output_tokens_mean, self.output_tokens_std)))
+        n = max(self.output_tokens_min, min(scfg.max_tokens, n))
+        token_ids = [rng.randrange(len(_WORDS)) for _ in range(n)]
+        text = " ".join(_WORDS[t] for t in token_ids)
+        if scfg.json_schema is not None:
+            text = json.dumps(_schema_instance(scfg.json_schema, text))
+        for s in scfg.stop or []:
+            text = text.split(s, 1)[0]
+
+        prompt = llm_input.get("prompt") or ""
+        cached = None
+        if self._seen_prefixes is not None:
+            prefix = prompt_prefix(prompt)
+            cached = 0
+            if prefix in self._seen_prefixes:
+                cached = len(prefix) // _CHARS_PER_TOKEN // _BLOCK_TOKENS * _BLOCK_TOKENS
+            self._seen_prefixes.add(prefix)
+        return RequestOutput(
+            request_id=request_id,
+            outputs=[CompletionOutput(text=text, token_ids=token_ids)],
+            num_prompt_tokens=max(1, len(prompt) // _CHARS_PER_TOKEN),
+            num_cached_tokens=cached,
+        )
+
+    def generate_batch(self, llm_inputs: List[Dict[str, Any]], scfg: SamplingConfig) -> List[RequestOutput]:
+        outs = [self._complete(str(i), x, scfg) for i, x in enumerate(llm_inputs)]
+        longest = max((len(o.outputs[0].token_ids) for o in outs), default=0)
+        time.sleep(self.per_request_latency_s * len(outs) + self.per_token_latency_s * longest)
+        return outs
+
+    def add_request(self, request_id: str, llm_input: Dict[str, Any], scfg: SamplingConfig) -> None:
+        out = self._complete(request_id, llm_input, scfg)
+        self._running[request_id] = [len(out.outputs[0].token_ids), out]
+        self._new_requests += 1
+
+    def step(self) -> Sequence[RequestOutput]:
+        time.sleep(self.per_token_latency_s + self.per_request_latency_s * self._new_requests)
+        self._new_requests = 0
+        finished = []
+        for rid in list(self._running):
+            state = self._running[rid]
+            state[0] -= 1
+            if state[0] <= 0:
+                finished.append(state[1])
+                del self._running[rid]
+        return finished
+
+    def abort(self, request_ids: List[str]) -> None:
+        for rid in request_ids:
+            self._running.pop(rid, None)
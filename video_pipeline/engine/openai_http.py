@@ -0,0 +1,308 @@
+# video_pipeline/engine/openai_http.py
+"""
+OpenAI-compatible chat endpoint backend (e.g. `vllm serve`), so CPU-only workers can
+decode and feed a shared pool of GPU servers.
+
+Requests go through one pooled keep-alive aiohttp session running on a background
+event loop; at most `max_in_flight` requests are outstanding per worker and servers
+in `base_urls` are picked by least outstanding requests. Connection errors, 429 and
+5xx are retried with exponential backoff + jitter.
+
+Video is sent according to `video_mode`:
+    url    : the video URI itself (server needs access: shared FS with
+             --allowed-local-media-path, or http(s) URLs)
+    inline : the encoded video file as a base64 data URL
+    frames : the frames decoded by the dataset, as JPEGs in a
+             `data:video/jpeg;base64,<f0>,<f1>,...` URL (vLLM extension), together with
+             the dataset's mm_processor_kwargs
+
+engine_params (vllm.engine_params):
+    base_urls: ["http://127.0.0.1:8000/v1"]   # or base_url: "..."
+    api_key: "EMPTY"
+    served_model: null        # default: vllm.model
+    video_mode: frames
+    jpeg_quality: 90
+    max_in_flight: 64
+    max_connections: 64
+    timeout_s: 600
+    max_retries: 5
+    backoff_s: 1.0
+    backoff_max_s: 30.0
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import io
+import mimetypes
+import random
+import threading
+from concurrent.futures import FIRST_COMPLETED, FIRST_EXCEPTION, Future, wait
+from typing import Any, Dict, List, Optional, Sequence
+
+from ..config.schema import SamplingConfig
+from .base import BaseEngine, CompletionOutput, RequestError, RequestOutput, request_sampling
+from .registry import register_engine
+
+_RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class HTTPEngineError(RuntimeError):
+    pass
+
+
+def _local_path(uri: str) -> str:
+    return uri[len("file://"):] if uri.startswith("file://") else uri
+
+
+def _frames_to_data_url(frames: Any, quality: int) -> str:
+    from PIL import Image
+
+    arr = frames
+    if hasattr(arr, "permute"):  # torch tensor (T, C, H, W) -> uint8 (T, H, W, C)
+        arr = arr.detach().cpu().clamp(0, 255).round().byte().permute(0, 2, 3, 1).numpy()
+    parts = []
+    for frame in arr:
+        buf = io.BytesIO()
+        Image.fromarray(frame).save(buf, format="JPEG", quality=quality)
+        parts.append(base64.b64encode(buf.getvalue()).decode())
+    return "data:video/jpeg;base64," + ",".join(parts)
+
+
+def _file_to_data_url(path: str, default_mime: str) -> str:
+    mime = mimetypes.guess_type(path)[0] or default_mime
+    with open(path, "rb") as f:
+        return f"data:{mime};base64," + base64.b64encode(f.read()).decode()
+
+
+@register_engine("openai_http")
+class OpenAIHTTPEngine(BaseEngine):
+    # worker attaches the chat `messages` to each llm_input
+    needs_messages = True
+    per_request_errors = True
+
+    def __init__(self, vcfg):
+        super().__init__(vcfg)
+        p = vcfg.engine_params or {}
+        urls = p.get("base_urls") or [p.get("base_url", "http://127.0.0.1:8000/v1")]
+        self.base_urls: List[str] = [u.rstrip("/") for u in urls]
+        self.api_key: str = p.get("api_key", "EMPTY")
+        self.served_model: str = p.get("served_model") or vcfg.model
+        self.video_mode: str = p.get("video_mode", "frames")
+        if self.video_mode not in ("url", "inline", "frames"):
+            raise ValueError(f"Unknown video_mode: {self.video_mode!r} (expected url | inline | frames)")
+        self.jpeg_quality = int(p.get("jpeg_quality", 90))
+        self.max_in_flight = int(p.get("max_in_flight", 64))
+        self.max_connections = int(p.get("max_connections", self.max_in_flight))
+        self.timeout_s = float(p.get("timeout_s", 600))
+        self.max_retries = int(p.get("max_retries", 5))
+        self.backoff_s = float(p.get("backoff_s", 1.0))
+        self.backoff_max_s = float(p.get("backoff_max_s", 30.0))
+
+        self._outstanding = {u: 0 for u in self.base_urls}
+        self._pending: Dict[str, Future] = {}
+
+        # one event loop + session per worker process, on a daemon thread
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="openai-http", daemon=True)
+        self._thread.start()
+        self._session = self._call(self._open_session())
+        self._sem = self._call(self._make_semaphore())
+
+    # ---------- event loop plumbing ----------
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _open_session(self):
+        import aiohttp
+
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=self.timeout_s),
+            headers={"Authorization": f"Bearer {self.api_key}"},
+        )
+
+    async def _make_semaphore(self):
+        return asyncio.Semaphore(self.max_in_flight)
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        self._call(self._session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    # ---------- request building ----------
+
+    def _video_content(self, item: Dict[str, Any], frames: Any) -> Dict[str, Any]:
+        uri = str(item.get("video", ""))
+        if self.video_mode == "frames" and frames is not None:
+            url = _frames_to_data_url(frames, self.jpeg_quality)
+        elif self.video_mode == "inline" and not uri.startswith(("http://", "https://")):
+            url = _file_to_data_url(_local_path(uri), "video/mp4")
+        else:
+            url = uri
+        return {"type": "video_url", "video_url": {"url": url}}
+
+    def _image_content(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        uri = str(item.get("image", ""))
+        if self.video_mode != "url" and not uri.startswith(("http://", "https://", "data:")):
+            uri = _file_to_data_url(_local_path(uri), "image/jpeg")
+        return {"type": "image_url", "image_url": {"url": uri}}
+
+    def build_body(self, llm_input: Dict[str, Any], scfg: SamplingConfig) -> Dict[str, Any]:
+        llm_input, scfg = request_sampling(llm_input, scfg)
+        mm = llm_input.get("multi_modal_data") or {}
+        videos = list(mm.get("video") or [])
+        messages = []
+        vi = 0
+        for msg in llm_input["messages"]:
+            content = msg.get("content")
+            if not isinstance(content, list):
+                messages.append({"role": msg["role"], "content": content})
+                continue
+            parts = []
+            for it in content:
+                kind = it.get("type") if isinstance(it, dict) else None
+                if kind == "text":
+                    parts.append({"type": "text", "text": it["text"]})
+                elif kind == "video":
+                    frames = videos[vi] if vi < len(videos) else None
+                    if isinstance(frames, tuple):  # (frames, video metadata)
+                        frames = frames[0]
+                    vi += 1
+                    parts.append(self._video_content(it, frames))
+                elif kind == "image":
+                    parts.append(self._image_content(it))
+            messages.append({"role": msg["role"], "content": parts})
+
+        body: Dict[str, Any] = {
+            "model": self.served_model,
+            "messages": messages,
+            "temperature": scfg.temperature,
+            "top_p": scfg.top_p,
+            "max_tokens": scfg.max_tokens,
+            "repetition_penalty": scfg.repetition_penalty,
+        }
+        if scfg.stop:
+            body["stop"] = list(scfg.stop)
+        if scfg.json_schema is not None:
+            body["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "output", "schema": scfg.json_schema},
+            }
+        if self.video_mode == "frames" and videos and llm_input.get("mm_processor_kwargs"):
+            # frames are already sampled / resized: reuse the dataset's processor kwargs
+            body["mm_processor_kwargs"] = _jsonable(llm_input["mm_processor_kwargs"])
+        return body
+
+    # ---------- sending ----------
+
+    def _pick_server(self) -> str:
+        return min(self.base_urls, key=lambda u: self._outstanding[u])
+
+    async def _post(self, request_id: str, body: Dict[str, Any]) -> RequestOutput:
+        import aiohttp
+
+        async with self._sem:
+            last_err: Optional[BaseException] = None
+            for attempt in range(self.max_retries + 1):
+                url = self._pick_server()
+                self._outstanding[url] += 1
+                try:
+                    async with self._session.post(f"{url}/chat/completions", json=body) as resp:
+                        if resp.status == 200:
+                            data = await resp.json()
+                            text = data["choices"][0]["message"].get("content") or ""
+                            # vllm serve --enable-prompt-tokens-details reports cached prompt tokens
+                            usage = data.get("usage") or {}
+                            details = usage.get("prompt_tokens_details") or {}
+                            return RequestOutput(
+                                request_id=request_id,
+                                outputs=[CompletionOutput(text=text)],
+                                num_prompt_tokens=usage.get("prompt_tokens"),
+                                num_cached_tokens=details.get("cached_tokens"),
+                            )
+                        detail = (await resp.text())[:500]
+                        last_err = HTTPEngineError(f"{url}: HTTP {resp.status}: {detail}")
+                        if resp.status not in _RETRY_STATUS:
+                            raise last_err
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    last_err = e
+                finally:
+                    self._outstanding[url] -= 1
+                if attempt < self.max_retries:
+                    delay = min(self.backoff_max_s, self.backoff_s * (2 ** attempt))
+                    await asyncio.sleep(delay * (0.5 + random.random() / 2))
+            raise HTTPEngineError(f"request {request_id} failed after {self.max_retries + 1} attempts: {last_err!r}")
+
+    def _submit(self, request_id: str, llm_input: Dict[str, Any], scfg: SamplingConfig) -> Future:
+        body = self.build_body(llm_input, scfg)
+        return asyncio.run_coroutine_threadsafe(self._post(request_id, body), self._loop)
+
+    def generate_batch(
+        self, llm_inputs: List[Dict[str, Any]], scfg: SamplingConfig, return_exceptions: bool = False
+    ) -> List[Any]:
+        futs: List[Future] = []
+        try:
+            for i, x in enumerate(llm_inputs):
+                try:
+                    futs.append(self._submit(str(i), x, scfg))
+                except Exception as e:  # the request body could not be built
+                    if not return_exceptions:
+                        raise
+                    failed: Future = Future()
+                    failed.set_exception(e)
+                    futs.append(failed)
+            if not return_exceptions:
+                done, _ = wait(futs, return_when=FIRST_EXCEPTION)
+                for f in done:
+                    if f.exception() is not None:
+                        raise f.exception()
+            return [f.result() if f.exception() is None else f.exception() for f in futs]
+        finally:
+            # after a failure, requests still in flight are cancelled rather than left running
+            for f in futs:
+                f.cancel()
+
+    # ---------- continuous batching ----------
+
+    def add_request(self, request_id: str, llm_input: Dict[str, Any], scfg: SamplingConfig) -> None:
+        self._pending[request_id] = self._submit(request_id, llm_input, scfg)
+
+    def step(self) -> Sequence[RequestOutput]:
+        if not self._pending:
+            return []
+        done, _ = wait(list(self._pending.values()), timeout=1.0, return_when=FIRST_COMPLETED)
+        finished: List[Any] = []
+        for rid in [r for r, f in self._pending.items() if f in done]:
+            f = self._pending.pop(rid)
+            error = f.exception()
+            # a request that failed after its retries fails alone
+            finished.append(f.result() if error is None else RequestError(rid, error))
+        return finished
+
+    def abort(self, request_ids: List[str]) -> None:
+        for rid in request_ids:
+            f = self._pending.pop(rid, None)
+            if f is not None:
+                f.cancel()
+
+
+def _jsonable(x: Any) -> Any:
+    if hasattr(x, "tolist"):
+        return x.tolist()
+    if isinstance(x, dict):
+        return {k: _jsonable(v) for k, v in x.items()}
+    if isinstance(x, (list, tuple)):
+        return [_jsonable(v) for v in x]
+    return x
@@ -0,0 +1,21 @@
+# video_pipeline/engine/registry.py
+from __future__ import annotations
+from typing import Dict, Type
+
+from .base import BaseEngine
+
+_ENGINES: Dict[str, Type[BaseEngine]] = {}
+
+def register_engine(name: str):
+    def deco(cls: Type[BaseEngine]):
+        _ENGINES[name] = cls
+        return cls
+    return deco
+
+def get_engine_cls(name: str) -> Type[BaseEngine]:
+    if name not in _ENGINES:
+        raise KeyError(f"Unknown engine: {name}. Available: {sorted(_ENGINES.keys())}")
+    return _ENGINES[name]
+
+def build_engine(vcfg) -> BaseEngine:
+    return get_engine_cls(vcfg.engine)(vcfg)
@@ -0,0 +1,246 @@
+# video_pipeline/engine/result_cache.py
+"""
+Persistent generation cache: identical requests are answered without the engine.
+
+The key is a hash of (engine, model, rendered prompt, media fingerprints, effective
+sampling params incl. per-sample overrides). Media are fingerprinted by content (size + first/last MiB, as for
+the frame cache) together with their sampling parameters (fps / pixels / ...),
+so moving a file does not invalidate it but re-encoding does. Requests whose media
+cannot be fingerprinted (URLs, missing files) bypass the cache.
+
+Entries live in a SQLite file shared by all ranks; when it grows past `max_bytes`
+the least recently used entries are dropped.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from dataclasses import asdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ..config.schema import SamplingConfig
+from ..utils.fingerprint import content_fingerprint
+from .base import BaseEngine, CompletionOutput, RequestError, RequestOutput, request_sampling
+
+_EVICT_CHECK_EVERY = 256  # puts between size checks
+
+
+def _local_path(uri: str) -> str:
+    return uri[len("file://"):] if uri.startswith("file://") else uri
+
+
+class ResultCache:
+    """key -> generated text, in SQLite. Lazily connected per process (like VideoMetaCache)."""
+
+    def __init__(self, db_path: str, max_bytes: int):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._puts = 0
+
+    def __getstate__(self):
+        return {**self.__dict__, "_conn": None, "_pid": None}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=60)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, text TEXT, nbytes INTEGER, last_used REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (last_used)")
+            self._pid = os.getpid()
+        return self._conn
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, str]:
+        db = self._db()
+        found: Dict[str, str] = {}
+        for key in keys:
+            row = db.execute("SELECT text FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                found[key] = row[0]
+        if found:
+            now = time.time()
+            with db:
+                db.executemany("UPDATE results SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        now = time.time()
+        rows = [(k, t, len(t.encode("utf-8")), now) for k, t in items]
+        if not rows:
+            return
+        db = self._db()
+        with db:
+            db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows)
+        self._puts += len(rows)
+        if self._puts >= _EVICT_CHECK_EVERY:
+            self._puts = 0
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries down to 90% of max_bytes."""
+        db = self._db()
+        total = db.execute("SELECT COALESCE(SUM(nbytes), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        doomed: List[str] = []
+        for key, nbytes in db.execute("SELECT key, nbytes FROM results ORDER BY last_used"):
+            doomed.append(key)
+            total -= nbytes
+            if total <= target:
+                break
+        with db:
+            db.executemany("DELETE FROM results WHERE key = ?", [(k,) for k in doomed])
+
+
+def open_result_cache(run_cfg) -> Optional[ResultCache]:
+    if not run_cfg.result_cache:
+        return None
+    return ResultCache(run_cfg.result_cache, int(run_cfg.result_cache_max_gb * (1 << 30)))
+
+
+class CachedEngine(BaseEngine):
+    """
+    Wraps another engine: cache hits are answered directly (outputs carry
+    `from_cache=True`), misses go to the inner engine and are stored on completion.
+    """
+
+    needs_messages = True  # media references come from the chat messages
+
+    @property
+    def per_request_errors(self) -> bool:  # type: ignore[override]
+        return self.inner.per_request_errors
+
+    def __init__(self, inner: BaseEngine, cache: ResultCache):
+        super().__init__(inner.vcfg)
+        self.inner = inner
+        self.cache = cache
+        self._static_key = json.dumps({"engine": inner.vcfg.engine, "model": inner.vcfg.model}, sort_keys=True)
+        self._fingerprints: Dict[Tuple[str, int, int], str] = {}
+        self._ready: List[RequestOutput] = []
+        self._inflight_keys: Dict[str, Optional[str]] = {}
+
+    # ---------- keys ----------
+
+    def _media_fingerprint(self, item: Dict[str, Any]) -> Optional[str]:
+        kind = item.get("type")
+        media = item.get(kind)
+        if not isinstance(media, str):
+            # in-memory image (e.g. PIL): hash its pixels
+            tobytes = getattr(media, "tobytes", None)
+            return hashlib.sha1(tobytes()).hexdigest() if tobytes is not None else None
+        if media.startswith(("http://", "https://")):
+            return None
+        path = _local_path(media)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        memo = (path, st.st_mtime_ns, st.st_size)
+        fp = self._fingerprints.get(memo)
+        if fp is None:
+            fp = self._fingerprints[memo] = content_fingerprint(path, st.st_size)
+        return fp
+
+    def request_key(self, llm_input: Dict[str, Any], scfg: SamplingConfig) -> Optional[str]:
+        """Hash of engine/model, prompt, media and the request's effective sampling params."""
+        llm_input, scfg = request_sampling(llm_input, scfg)
+        media = []
+        for msg in llm_input.get("messages") or []:
+            content = msg.get("content")
+            if not isinstance(content, list):
+                continue
+            for item in content:
+                if isinstance(item, dict) and item.get("type") in ("video", "image"):
+                    fp = self._media_fingerprint(item)
+                    if fp is None:
+                        return None
+                    params = {k: v for k, v in item.items() if k not in ("type", item["type"])}
+                    media.append([fp, params])
+        blob = json.dumps(
+            [self._static_key, llm_input.get("prompt"), media, asdict(scfg)], sort_keys=True, default=str
+        )
+        return hashlib.sha1(blob.encode()).hexdigest()
+
+    def _inner_input(self, llm_input: Dict[str, Any]) -> Dict[str, Any]:
+        if self.inner.needs_messages:
+            return llm_input
+        return {k: v for k, v in llm_input.items() if k != "messages"}
+
+    @staticmethod
+    def _hit(request_id: str, text: str) -> RequestOutput:
+        return RequestOutput(request_id=request_id, outputs=[CompletionOutput(text=text)], from_cache=True)
+
+    # ---------- batch ----------
+
+    def generate_batch(
+        self, llm_inputs: List[Dict[str, Any]], scfg: SamplingConfig, return_exceptions: bool = False
+    ) -> List[Any]:
+        keys = [self.request_key(x, scfg) for x in llm_inputs]
+        found = self.cache.get_many([k for k in keys if k is not None])
+        miss = [i for i, k in enumerate(keys) if k not in found]
+        outs: List[Any] = [None] * len(llm_inputs)
+        if miss:
+            inner_inputs = [self._inner_input(llm_inputs[i]) for i in miss]
+            if return_exceptions:
+                generated = self.inner.generate_batch(inner_inputs, scfg, return_exceptions=True)
+            else:
+                generated = self.inner.generate_batch(inner_inputs, scfg)
+            for i, out in zip(miss, generated):
+                outs[i] = out
+            self.cache.put_many(
+                (keys[i], out.outputs[0].text) for i, out in zip(miss, generated)
+                if keys[i] is not None and not isinstance(out, Exception) and out.outputs
+            )
+        for i, k in enumerate(keys):
+            if k in found:
+                outs[i] = self._hit(str(i), found[k])
+        return outs
+
+    # ---------- continuous batching ----------
+
+    def add_request(self, request_id: str, llm_input: Dict[str, Any], scfg: SamplingConfig) -> None:
+        key = self.request_key(llm_input, scfg)
+        text = self.cache.get_many([key]).get(key) if key is not None else None
+        if text is not None:
+            self._ready.append(self._hit(request_id, text))
+            return
+        self._inflight_keys[request_id] = key
+        try:
+            self.inner.add_request(request_id, self._inner_input(llm_input), scfg)
+        except Exception:
+            self._inflight_keys.pop(request_id, None)
+            raise
+
+    def step(self) -> Sequence[Any]:
+        finished = self._ready
+        self._ready = []
+        if self._inflight_keys:
+            outs = list(self.inner.step())
+            store = []
+            for o in outs:
+                if not o.finished:
+                    continue
+                key = self._inflight_keys.pop(o.request_id, None)
+                if key is not None and not isinstance(o, RequestError) and o.outputs:
+                    store.append((key, o.outputs[0].text))
+            self.cache.put_many(store)
+            finished = finished + outs
+        return finished
+
+    def abort(self, request_ids: List[str]) -> None:
+        for rid in request_ids:
+            self._inflight_keys.pop(rid, None)
+        self.inner.abort(request_ids)
+
+    def close(self) -> None:
+        self.inner.close()
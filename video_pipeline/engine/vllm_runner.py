@@ -1,34 +1,76 @@
 # video_pipeline/engine/vllm_runner.py
 from __future__ import annotations
-from typing import Any, Dict, List
-
-from vllm import LLM, SamplingParams
+from typing import Any, Dict, List, Sequence
 
 from ..config.schema import VLLMConfig, SamplingConfig
+from .base import BaseEngine, request_sampling
+from .registry import register_engine
 
-class VLLMRunner:
+@register_engine("vllm")
+class VLLMRunner(BaseEngine):
     def __init__(self, vcfg: VLLMConfig):
+        super().__init__(vcfg)
+        # vllm 延迟导入：注册表 / fake engine 在没有 GPU 的机器上也能用
+        from vllm import LLM
+
         self.llm = LLM(
             model=vcfg.model,
             dtype=vcfg.dtype,
             max_model_len=vcfg.max_model_len,
             gpu_memory_utilization=vcfg.gpu_memory_utilization,
             enforce_eager=vcfg.enforce_eager,
+            enable_prefix_caching=vcfg.enable_prefix_caching,
             tensor_parallel_size=vcfg.tensor_parallel_size,
             limit_mm_per_prompt=vcfg.limit_mm_per_prompt,
             trust_remote_code=vcfg.trust_remote_code,
         )
 
-    def generate_batch(
-        self,
-        llm_inputs: List[Dict[str, Any]],
-        scfg: SamplingConfig,
-    ):
-        sp = SamplingParams(
+    @staticmethod
+    def _sampling_params(scfg: SamplingConfig):
+        from vllm import SamplingParams
+
+        kwargs: Dict[str, Any] = {}
+        if scfg.stop:
+            kwargs["stop"] = list(scfg.stop)
+        if scfg.json_schema is not None:
+            try:  # vllm >= 0.11
+                from vllm.sampling_params import StructuredOutputsParams
+
+                kwargs["structured_outputs"] = StructuredOutputsParams(json=scfg.json_schema)
+            except ImportError:
+                from vllm.sampling_params import GuidedDecodingParams
+
+                kwargs["guided_decoding"] = GuidedDecodingParams(json=scfg.json_schema)
+        return SamplingParams(
             temperature=scfg.temperature,
             top_p=scfg.top_p,
             max_tokens=scfg.max_tokens,
             repetition_penalty=scfg.repetition_penalty,
+            **kwargs,
         )
+
+    def generate_batch(
+        self,
+        llm_inputs: List[Dict[str, Any]],
+        scfg: SamplingConfig,
+    ):
+        reqs = [request_sampling(x, scfg) for x in llm_inputs]
+        if all(c is scfg for _, c in reqs):
+            sp = self._sampling_params(scfg)
+        else:
+            # per-request SamplingParams (stop / max_tokens / guided decoding set by the task)
+            sp = [self._sampling_params(c) for _, c in reqs]
         # vLLM 支持 batch: list[{"prompt":..., "multi_modal_data":...}] :contentReference[oaicite:2]{index=2}
-        return self.llm.generate(llm_inputs, sampling_params=sp)
+        return self.llm.generate([x for x, _ in reqs], sampling_params=sp)
+
+    # ---------- continuous batching: drive the engine step by step ----------
+
+    def add_request(self, request_id: str, llm_input: Dict[str, Any], scfg: SamplingConfig) -> None:
+        llm_input, scfg = request_sampling(llm_input, scfg)
+        self.llm.llm_engine.add_request(request_id, llm_input, self._sampling_params(scfg))
+
+    def step(self) -> Sequence[Any]:
+        return self.llm.llm_engine.step()
+
+    def abort(self, request_ids: List[str]) -> None:
+        self.llm.llm_engine.abort_request(request_ids)
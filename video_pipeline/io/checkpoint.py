@@ -0,0 +1,170 @@
+# video_pipeline/io/checkpoint.py
+"""
+Compact resume checkpoint written next to each output JSONL.
+
+`<output>.done` is an append-only key log, one line per output record:
+
+    <end byte offset of the record in the output>\\t<key>\\n
+
+Resume reads this small file instead of parsing every (large) output record. The
+offsets tie the log to the output: entries pointing past the end of the output are
+ignored, and records the log has not caught up with yet (the writer flushes the
+output first) are recovered by parsing only the output's tail. A torn last line in
+either file — e.g. after a crash — is ignored.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from typing import Iterator, List, Optional, Tuple
+
+Entry = Tuple[int, str]  # (end offset in output, key)
+
+
+def checkpoint_path_for(output_jsonl: str) -> str:
+    return f"{output_jsonl}.done"
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _escape(key: str) -> str:
+    return key.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _unescape(key: str) -> str:
+    return re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), key)
+
+
+def _iter_checkpoint(ckpt_path: str) -> Iterator[Tuple[int, str, int]]:
+    """Yields (end_offset, key, end position in the checkpoint file)."""
+    try:
+        f = open(ckpt_path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        pos = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # torn last line
+            pos += len(line)
+            off, _, key = line[:-1].decode("utf-8").partition("\t")
+            if "\\" in key:
+                key = _unescape(key)
+            yield int(off), key, pos
+
+
+def _scan_output(output_jsonl: str, start: int, key_field: str) -> List[Entry]:
+    """Parse full records from byte offset `start` on (only used for the un-checkpointed tail)."""
+    entries: List[Entry] = []
+    try:
+        f = open(output_jsonl, "rb")
+    except FileNotFoundError:
+        return entries
+    with f:
+        f.seek(start)
+        pos = start
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # torn last line
+            pos += len(line)
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if key_field in obj:
+                entries.append((pos, str(obj[key_field])))
+    return entries
+
+
+def _valid_checkpoint(output_jsonl: str) -> Tuple[List[Entry], int]:
+    """Checkpoint entries consistent with the current output, and their byte length."""
+    size = _file_size(output_jsonl)
+    entries: List[Entry] = []
+    valid_bytes = 0
+    for off, key, pos in _iter_checkpoint(checkpoint_path_for(output_jsonl)):
+        if off > size:
+            break
+        entries.append((off, key))
+        valid_bytes = pos
+    return entries, valid_bytes
+
+
+def load_checkpoint(output_jsonl: str, key_field: str = "__key") -> List[Entry]:
+    """All (end_offset, key) entries of `output_jsonl`, read-only."""
+    entries, _ = _valid_checkpoint(output_jsonl)
+    start = entries[-1][0] if entries else 0
+    return entries + _scan_output(output_jsonl, start, key_field)
+
+
+def truncate_torn_tail(path: str) -> int:
+    """Cut a trailing partial line (no newline) from `path`; returns the new size."""
+    size = _file_size(path)
+    if size == 0:
+        return 0
+    with open(path, "rb+") as f:
+        pos = size
+        while pos > 0:
+            step = min(1 << 16, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            if pos == size and chunk.endswith(b"\n"):
+                return size
+            nl = chunk.rfind(b"\n")
+            if nl != -1:
+                pos = pos - step + nl + 1
+                break
+            pos -= step
+        f.truncate(pos)
+    return pos
+
+
+class CheckpointLog:
+    """
+    Appender for `<output>.done`, owned by `JsonlWriter`.
+
+    On open the output's torn tail is cut, stale entries are dropped and missing
+    entries are recovered from the output, so the log and the output agree again.
+    """
+
+    def __init__(self, output_jsonl: str, key_field: str = "__key"):
+        self.path = checkpoint_path_for(output_jsonl)
+        self.key_field = key_field
+        truncate_torn_tail(output_jsonl)
+        entries, valid_bytes = _valid_checkpoint(output_jsonl)
+        start = entries[-1][0] if entries else 0
+        tail = _scan_output(output_jsonl, start, key_field)
+
+        self._f = open(self.path, "ab")
+        self._f.truncate(valid_bytes)
+        for off, key in tail:
+            self.append(off, key)
+        self._f.flush()
+
+    def append(self, end_offset: int, key: Optional[str]) -> None:
+        if key is None:
+            return
+        if "\\" in key or "\n" in key:
+            key = _escape(key)
+        self._f.write(f"{end_offset}\t{key}\n".encode("utf-8"))
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def fsync(self) -> None:
+        os.fsync(self._f.fileno())
+
+    def close(self) -> None:
+        try:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+        finally:
+            self._f.close()
@@ -3,62 +3,70 @@
 
 from __future__ import annotations
 
-import json
 import os
-from pathlib import Path
-from typing import Optional
+import shutil
 from tqdm import tqdm
 
+from .checkpoint import CheckpointLog, checkpoint_path_for, load_checkpoint, truncate_torn_tail
+from .resume import list_rank_outputs
 
-def consolidate_jsonl(output_path: str, world_size: int, keep_rank_files: bool = False) -> str:
+
+def consolidate_jsonl(output_path: str, keep_rank_files: bool = False, append: bool = False) -> str:
     """
     Consolidate rank-sharded JSONL files into a single file.
+
+    All existing `<root>.rank*<ext>` files are merged, whatever world_size wrote them.
+    The consolidated output gets its own `.done` checkpoint (rank checkpoints are
+    shifted by the copy offset), so it takes part in resume like a rank file.
     
     Args:
         output_path: Path to the consolidated output (e.g., 'output/result.jsonl')
-        world_size: Number of ranks that were used during processing
         keep_rank_files: Whether to keep the individual rank files after consolidation
+        append: Append to an existing consolidated output (resume) instead of overwriting it
         
     Returns:
         Path to the consolidated file
     """
-    root, ext = os.path.splitext(output_path)
-    
-    # Find all rank files
-    rank_files = []
     output_dir = os.path.dirname(output_path) or "."
     os.makedirs(output_dir, exist_ok=True)
-    
-    for rank in range(world_size):
-        rank_file = f"{root}.rank{rank}{ext}"
-        if os.path.exists(rank_file):
-            rank_files.append((rank, rank_file))
-        else:
-            print(f"⚠️  Warning: Rank file not found: {rank_file}")
+
+    # Find all rank files
+    rank_files = list_rank_outputs(output_path)
     
     if not rank_files:
         print("❌ No rank files found to consolidate")
         return output_path
     
-    # Sort by rank
-    rank_files.sort(key=lambda x: x[0])
-    
     print(f"📦 Consolidating {len(rank_files)} rank files into {output_path}")
-    
+
+    if not append:
+        for p in (output_path, checkpoint_path_for(output_path)):
+            if os.path.exists(p):
+                os.remove(p)
+
     # Count total lines for progress bar
-    total_lines = 0
+    rank_entries = []
     for _, rank_file in rank_files:
-        with open(rank_file, "r", encoding="utf-8") as f:
-            total_lines += sum(1 for _ in f)
+        truncate_torn_tail(rank_file)
+        rank_entries.append(load_checkpoint(rank_file))
+    total_lines = sum(len(e) for e in rank_entries)
     
     # Merge all rank files into consolidated output
-    with open(output_path, "w", encoding="utf-8") as out_f:
-        with tqdm(total=total_lines, desc="Consolidating", unit="line") as pbar:
-            for rank, rank_file in rank_files:
-                with open(rank_file, "r", encoding="utf-8") as in_f:
-                    for line in in_f:
-                        out_f.write(line)
-                        pbar.update(1)
+    ckpt = CheckpointLog(output_path)
+    try:
+        with open(output_path, "ab") as out_f:
+            with tqdm(total=total_lines, desc="Consolidating", unit="line") as pbar:
+                for (rank, rank_file), entries in zip(rank_files, rank_entries):
+                    base = out_f.tell()
+                    with open(rank_file, "rb") as in_f:
+                        shutil.copyfileobj(in_f, out_f)
+                    for off, key in entries:
+                        ckpt.append(base + off, key)
+                    pbar.update(len(entries))
+            out_f.flush()
+            os.fsync(out_f.fileno())
+    finally:
+        ckpt.close()
     
     print(f"✅ Successfully consolidated to {output_path}")
     
@@ -70,5 +78,11 @@ def consolidate_jsonl(output_path: str, world_size: int, keep_rank_files: bool =
                 print(f"🗑️  Removed rank file: {rank_file}")
             except Exception as e:
                 print(f"⚠️  Failed to remove {rank_file}: {e}")
+            ckpt_file = checkpoint_path_for(rank_file)
+            if os.path.exists(ckpt_file):
+                try:
+                    os.remove(ckpt_file)
+                except Exception as e:
+                    print(f"⚠️  Failed to remove {ckpt_file}: {e}")
     
     return output_path
@@ -4,22 +4,51 @@ import json
 import os
 from typing import Any, Dict, Optional
 
+from .checkpoint import CheckpointLog, truncate_torn_tail
+
 class JsonlWriter:
-    def __init__(self, path: str, *, flush_every: int = 1, fsync_every: int = 1):
+    """
+    Append-only JSONL writer. With `checkpoint=True` (default) every record's key is
+    also logged to `<path>.done` (see io/checkpoint.py) so resume does not have to
+    re-parse the output. The checkpoint is always flushed after the output.
+    """
+    def __init__(
+        self,
+        path: str,
+        *,
+        flush_every: int = 1,
+        fsync_every: int = 1,
+        checkpoint: bool = True,
+        key_field: str = "__key",
+    ):
         self.path = path
         self.flush_every = max(1, flush_every)
         self.fsync_every = max(1, fsync_every)
+        self.key_field = key_field
         self._n = 0
         os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-        self._f = open(path, "a", encoding="utf-8")
+        # a crash can leave a partial last record; cut it so new records start on a fresh line
+        self._ckpt: Optional[CheckpointLog] = CheckpointLog(path, key_field) if checkpoint else None
+        if self._ckpt is None:
+            truncate_torn_tail(path)
+        self._f = open(path, "ab")
+        self._offset = self._f.tell()
 
     def write(self, obj: Dict[str, Any]) -> None:
-        self._f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+        data = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+        self._f.write(data)
+        self._offset += len(data)
         self._n += 1
+        if self._ckpt is not None and self.key_field in obj:
+            self._ckpt.append(self._offset, str(obj[self.key_field]))
         if self._n % self.flush_every == 0:
             self._f.flush()
+            if self._ckpt is not None:
+                self._ckpt.flush()
         if self._n % self.fsync_every == 0:
             os.fsync(self._f.fileno())
+            if self._ckpt is not None:
+                self._ckpt.fsync()
 
     def close(self) -> None:
         try:
@@ -27,6 +56,8 @@ class JsonlWriter:
             os.fsync(self._f.fileno())
         finally:
             self._f.close()
+            if self._ckpt is not None:
+                self._ckpt.close()
 
     def __enter__(self) -> "JsonlWriter":
         return self
@@ -1,24 +1,85 @@
 # video_pipeline/io/resume.py
 from __future__ import annotations
-import json
-from typing import Optional, Set
+import glob
+import os
+import re
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .checkpoint import load_checkpoint
 
 def load_done_keys(output_jsonl: str, key_field: str = "__key") -> Set[str]:
-    done: Set[str] = set()
-    try:
-        with open(output_jsonl, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                obj = json.loads(line)
-                if key_field in obj:
-                    done.add(str(obj[key_field]))
-    except FileNotFoundError:
-        pass
+    """
+    Keys already written to `output_jsonl`. Reads the compact `<output>.done`
+    checkpoint and only parses output records the checkpoint does not cover yet
+    (all of them for outputs written before checkpoints existed).
+    """
+    return {key for _, key in load_checkpoint(output_jsonl, key_field)}
+
+def rank_output_path(output_jsonl: str, rank: int) -> str:
+    root, ext = os.path.splitext(output_jsonl)
+    return f"{root}.rank{rank}{ext}"
+
+def task_output_path(output_jsonl: str, task_name: str, multi_task: bool) -> str:
+    """Multi-task runs write one output per task: `<root>.<task><ext>`."""
+    if not multi_task:
+        return output_jsonl
+    root, ext = os.path.splitext(output_jsonl)
+    return f"{root}.{task_name}{ext}"
+
+def quarantine_path(output_jsonl: str) -> str:
+    """Error records of samples that failed to decode / generate: `<root>.quarantine<ext>`."""
+    root, ext = os.path.splitext(output_jsonl)
+    return f"{root}.quarantine{ext}"
+
+def list_rank_outputs(output_jsonl: str) -> List[Tuple[int, str]]:
+    """All existing `<root>.rank<N><ext>` files, whatever world_size produced them."""
+    root, ext = os.path.splitext(output_jsonl)
+    pat = re.compile(re.escape(root) + r"\.rank(\d+)" + re.escape(ext) + "$")
+    found = []
+    for p in glob.glob(f"{glob.escape(root)}.rank*{glob.escape(ext)}"):
+        m = pat.match(p)
+        if m:
+            found.append((int(m.group(1)), p))
+    return sorted(found)
+
+def load_global_done_keys(output_jsonl: str, key_field: str = "__key") -> Set[str]:
+    """
+    Keys done by any previous run: every rank file (independent of the world_size
+    that wrote it) plus the consolidated output. Lets a restart use a different --dp.
+    """
+    done = load_done_keys(output_jsonl, key_field)
+    for _, p in list_rank_outputs(output_jsonl):
+        done |= load_done_keys(p, key_field)
     return done
 
 def make_key(line_idx: int, sample: dict, id_field: Optional[str]) -> str:
     if id_field and id_field in sample:
         return str(sample[id_field])
     return str(line_idx)
+
+def pending_line_filter(done: Set[str], id_field: Optional[str]) -> Optional[Callable[[int], bool]]:
+    """
+    Pre-parse filter on line_idx. Only possible when keys are line numbers
+    (id_field is None); otherwise the sample must be parsed to know its key.
+    """
+    if id_field is not None or not done:
+        return None
+    return lambda line_idx: str(line_idx) not in done
+
+def iter_pending(
+    samples: Iterable[Tuple[int, Dict]],
+    done: Set[str],
+    id_field: Optional[str],
+) -> Iterator[Tuple[int, Dict]]:
+    for line_idx, sample in samples:
+        if make_key(line_idx, sample, id_field) not in done:
+            yield line_idx, sample
+
+def pending_line_idxs(index, done: Set[str], id_field: Optional[str]) -> array:
+    """Line indices of `index` (a JsonlIndex) whose key is not in `done`."""
+    if not done:
+        return array("q", index.line_idxs)
+    if id_field is None:
+        return array("q", (i for i in index.line_idxs if str(i) not in done))
+    return array("q", (i for i, _ in iter_pending(index.iter_lines(index.line_idxs), done, id_field)))
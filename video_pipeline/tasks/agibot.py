@@ -1,7 +1,7 @@
 from __future__ import annotations
 from typing import Any, Dict, List
 
-from .base import Task
+from .base import Task, move_section_to_end
 from .registry import register_task
 
 # -------------------------- 多段动作描述 Prompt 模板 --------------------------
@@ -50,21 +50,32 @@ class AgiRobotActionTask(Task):
     name = "agibot_action"
     dataset_name = "qwen_video"
 
-    def build_messages(self, sample: Dict[str, Any]) -> List[Dict[str, Any]]:
-        # Extract action_config from label_info
-        action_config = sample.get("label_info", {}).get("action_config", [])
+    def _segments(self, sample: Dict[str, Any]) -> List[str]:
+        """Prompt line per action segment (memoised in the TaskContext; its length drives max_tokens and parse)."""
+
+        def build() -> List[str]:
+            # Extract action_config from label_info
+            action_config = sample.get("label_info", {}).get("action_config", [])
+            segments_text = []
+            for i, seg in enumerate(action_config, 1):
+                raw_text = seg.get("action_text", "No description")
+                start = seg["start_frame"]
+                end = seg["end_frame"]
+                segments_text.append(
+                    f"Segment {i}: Frames {start/30:.1f}s–{end/30:.1f}s — Raw: \"{raw_text}\""
+                )
+            return segments_text
 
+        return self.context(sample).memo("segments", build)
+
+    def build_messages(self, sample: Dict[str, Any]) -> List[Dict[str, Any]]:
         # Build segment descriptions for prompt
-        segments_text = []
-        for i, seg in enumerate(action_config, 1):
-            raw_text = seg.get("action_text", "No description")
-            start = seg["start_frame"]
-            end = seg["end_frame"]
-            segments_text.append(
-                f"Segment {i}: Frames {start/30:.1f}s–{end/30:.1f}s — Raw: \"{raw_text}\""
-            )
-        
-        prompt = MULTI_ACTION_PROMPT_TEMPLATE.format(
+        segments_text = self._segments(sample)
+
+        template = MULTI_ACTION_PROMPT_TEMPLATE
+        if self.use_shared_prefix():
+            template = move_section_to_end(template, "# Input Format")
+        prompt = template.format(
             action_segments_with_indices="\n".join(segments_text)
         )
 
@@ -79,6 +90,13 @@ class AgiRobotActionTask(Task):
             },
         ]
 
+    def sampling_overrides(self, sample: Dict[str, Any]) -> Dict[str, Any]:
+        # 每段 20-80 词：max_tokens 按段数缩放，而不是对所有样本用同一个上限
+        n_segments = len(self._segments(sample))
+        base = int(self.task_param("base_tokens", 64))
+        per_segment = int(self.task_param("tokens_per_segment", 160))
+        return {"max_tokens": base + per_segment * max(1, n_segments)}
+
     def parse(self, generated_text: str, sample: Dict[str, Any]) -> Dict[str, Any]:
         # Split by numbered lines (robust parsing)
         lines = generated_text.strip().split('\n')
@@ -105,8 +123,7 @@ class AgiRobotActionTask(Task):
             captions.append(current_caption.strip())
 
         # Ensure alignment with action_config
-        action_config = sample.get("label_info", {}).get("action_config", [])
-        expected_count = len(action_config)
+        expected_count = len(self._segments(sample))
         if len(captions) != expected_count:
             # Pad or truncate to match
             captions = (captions + ["[Caption generation failed.]"] * expected_count)[:expected_count]
@@ -1,13 +1,86 @@
 # video_pipeline/tasks/base.py
 from __future__ import annotations
+import hashlib
+import random
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
+
+
+def move_section_to_end(template: str, header: str) -> str:
+    """
+    Move the markdown section starting at line `header` (e.g. "## Structured Input") to
+    the end of `template`. Used for the shared-prefix prompt layout: the sample-specific
+    input section goes last, so every prompt of a task starts with the same instructions.
+    """
+    lines = template.split("\n")
+    try:
+        start = next(i for i, l in enumerate(lines) if l.strip() == header)
+    except StopIteration:
+        return template
+    level = header.split(" ", 1)[0]
+    end = next(
+        (i for i in range(start + 1, len(lines)) if lines[i].split(" ", 1)[0] == level),
+        len(lines),
+    )
+    section = "\n".join(lines[start:end]).strip()
+    rest = "\n".join(lines[:start] + lines[end:]).strip()
+    return f"{rest}\n\n{section}"
+
+
+def object_schema(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON schema of an object with exactly these (all required) properties."""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+STRING_SCHEMA: Dict[str, Any] = {"type": "string"}
+
+
+class TaskContext:
+    """
+    单个 (样本, task) 的上下文：由 dataset 在 make_item 中创建，随 item 经 collate 传到 parse
+    （task 通过 sample["__ctx"] / Task.context(sample) 取得）。
+      - memo(name, fn)：缓存 short_circuit / build_messages / parse 共用的中间结果（解析后的 JSON 等）
+      - rng：以 (task, __key) 为种子的 random.Random，同一样本每次运行结果一致
+    需可 pickle（DataLoader worker 进程 -> 主进程）。
+    """
+
+    def __init__(self, key: str, task_name: str):
+        self.key = key
+        self.task_name = task_name
+        seed = hashlib.sha1(f"{task_name}\0{key}".encode("utf-8")).digest()
+        self.rng = random.Random(int.from_bytes(seed[:8], "big"))
+        self._memo: Dict[str, Any] = {}
+
+    def memo(self, name: str, fn: Callable[[], Any]) -> Any:
+        if name not in self._memo:
+            self._memo[name] = fn()
+        return self._memo[name]
+
 
 class Task(ABC):
     name: str
     
     dataset_name: str = "qwen_video"
 
+    # task_params.shared_prefix: true => 与样本无关的长指令放在 prompt 最前，样本相关的输入放最后，
+    # 让 vLLM prefix caching 在样本间复用指令部分（只有支持的 task 会读取该开关）
+    def use_shared_prefix(self) -> bool:
+        return bool(self.task_param("shared_prefix", False))
+
+    def task_param(self, name: str, default: Any = None) -> Any:
+        """cfg.task_params[name]（worker 注入到 self.task_params）。"""
+        return (getattr(self, "task_params", None) or {}).get(name, default)
+
+    def context(self, sample: Dict[str, Any]) -> TaskContext:
+        """sample 携带的 TaskContext；没有（如单独调用 parse）时新建一个（不写回 sample），种子相同、结果一致。"""
+        ctx = sample.get("__ctx")
+        return ctx if ctx is not None else TaskContext(str(sample.get("__key", "")), self.name)
+
     @abstractmethod
     def build_messages(self, sample: Dict[str, Any]) -> List[Dict[str, Any]]:
         """返回 Qwen chat messages（含 video block）。"""
@@ -16,5 +89,19 @@ class Task(ABC):
     def parse(self, generated_text: str, sample: Dict[str, Any]) -> Dict[str, Any]:
         """把模型输出解析为你要写回 jsonl 的字段。"""
 
+    def short_circuit(self, sample: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        在构造 prompt / 解码之前调用：若该样本不需要模型即可得到最终结果，返回与 parse 相同格式的字段，
+        该样本不会提交给引擎；返回 None 则正常生成。
+        """
+        return None
+
+    def sampling_overrides(self, sample: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        按样本覆盖 SamplingConfig 字段，如 {"stop": ["\\n"]}、{"max_tokens": 256}、
+        {"json_schema": {...}}（guided decoding）；默认不覆盖。
+        """
+        return {}
+
     def extra_output_fields(self) -> Dict[str, Any]:
         return {}
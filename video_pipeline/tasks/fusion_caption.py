@@ -1,10 +1,11 @@
 from __future__ import annotations
 
+import copy
 import json
 import random
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
-from .base import Task
+from .base import Task, TaskContext, move_section_to_end
 from .registry import register_task
 
 
@@ -51,6 +52,40 @@ Please directly output the final composed caption without any additional informa
 """.strip()
 
 
+def load_struct_caption(sample: Dict[str, Any], input_field: str) -> Dict[str, Any]:
+    """The structured caption in `sample[input_field]` (JSON string or dict); raises if invalid."""
+    struct_text = sample.get(input_field, None)
+    if isinstance(struct_text, str):
+        s = struct_text.strip()
+        l = s.find("{")
+        r = s.rfind("}")
+        if l != -1 and r != -1 and r > l:
+            s = s[l : r + 1]
+        struct_caption = json.loads(s)
+    else:
+        struct_caption = struct_text
+    if not isinstance(struct_caption, dict):
+        raise ValueError(f"struct_caption is not dict: {type(struct_caption)}")
+    return struct_caption
+
+
+def _parse_error(input_field: str, error: str, original_text: str) -> Dict[str, Any]:
+    return {
+        "status": "error",
+        "error": f"{input_field}_json_parse_error: {error}",
+        "fusion_caption": original_text,
+        "fusion_by_llm": False,
+    }
+
+
+def _no_subject_result(original_text: str, camera_movement: str) -> Dict[str, Any]:
+    return {
+        "status": "ok",
+        "fusion_caption": (original_text + " " + camera_movement).strip(),
+        "fusion_by_llm": False,
+    }
+
+
 def compute_camera_movement(struct_caption: Dict[str, Any]) -> str:
     camera_movement = struct_caption.get("camera_motion", "")
     if camera_movement != "":
@@ -58,7 +93,11 @@ def compute_camera_movement(struct_caption: Dict[str, Any]) -> str:
     return camera_movement.capitalize()
 
 
-def clean_struct_caption(struct_caption: Dict[str, Any], task_mode: str) -> Dict[str, Any]:
+def clean_struct_caption(
+    struct_caption: Dict[str, Any], task_mode: str, rng: Optional[random.Random] = None
+) -> Dict[str, Any]:
+    """Modifies `struct_caption` in place. `rng` drives the random field drops (default: global random)."""
+    rand = rng.random if rng is not None else random.random
     raw_subjects = struct_caption.get("subjects", [])
     subjects = []
     for subject in raw_subjects:
@@ -85,9 +124,9 @@ def clean_struct_caption(struct_caption: Dict[str, Any], task_mode: str) -> Dict
         action = subject.get("action", "").strip()
         subject["action"] = action
 
-        if random.random() > 0.9 and "appearance" in subject:
+        if rand() > 0.9 and "appearance" in subject:
             del subject["appearance"]
-        if random.random() > 0.9 and "position" in subject:
+        if rand() > 0.9 and "position" in subject:
             del subject["position"]
 
         if task_mode == "i2v":
@@ -111,7 +150,7 @@ def clean_struct_caption(struct_caption: Dict[str, Any], task_mode: str) -> Dict
         "lighting": struct_caption.get("lighting", "").replace("_", " "),
     }
 
-    if task_mode == "t2v" and random.random() > 0.9:
+    if task_mode == "t2v" and rand() > 0.9:
         new_struct_caption.pop("lighting", None)
 
     if task_mode == "i2v":
@@ -144,31 +183,48 @@ class FusionCaptionTask(Task):
             "original_text": tp.get("original_text", self._default_original_text),
         }
 
+    def _prepared(self, sample: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        load + clean the structured input once per sample (memoised in its TaskContext, shared
+        by short_circuit / build_messages / parse); the random drops use the context's seeded rng.
+        """
+        ctx: TaskContext = self.context(sample)
+
+        def prepare() -> Dict[str, Any]:
+            p = self._get_params(sample)
+            try:
+                struct_caption = load_struct_caption(sample, p["input_field"])
+                error = None
+            except Exception as e:
+                struct_caption, error = {}, repr(e)
+            # clean_struct_caption 会修改传入的 dict（可能就是输入样本里的 dict），这里用副本
+            return {
+                "error": error,
+                "camera_movement": compute_camera_movement(struct_caption),
+                "cleaned": clean_struct_caption(copy.deepcopy(struct_caption), p["mode"], rng=ctx.rng),
+            }
+
+        return ctx.memo("fusion_input", prepare)
+
+    def short_circuit(self, sample: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # 无法解析的结构化输入、或没有 subject 的样本，parse 不会使用模型输出：直接给出结果
+        p = self._get_params(sample)
+        prep = self._prepared(sample)
+        if prep["error"] is not None:
+            return _parse_error(p["input_field"], prep["error"], p["original_text"])
+        if prep["cleaned"].get("num_subjects", 0) > 0:
+            return None
+        return _no_subject_result(p["original_text"], prep["camera_movement"])
+
     def build_messages(self, sample: Dict[str, Any]) -> List[Dict[str, Any]]:
         p = self._get_params(sample)
         mode = p["mode"]
-        input_field = p["input_field"]
 
         system_prompt = SYSTEM_PROMPT_T2V if mode == "t2v" else SYSTEM_PROMPT_I2V
+        if self.use_shared_prefix():
+            system_prompt = move_section_to_end(system_prompt, "## Structured Input")
 
-        struct_text = sample.get(input_field, None)
-        try:
-            if isinstance(struct_text, str):
-                s = struct_text.strip()
-                l = s.find("{")
-                r = s.rfind("}")
-                if l != -1 and r != -1 and r > l:
-                    s = s[l : r + 1]
-                struct_caption = json.loads(s)
-            else:
-                struct_caption = struct_text
-            if not isinstance(struct_caption, dict):
-                raise ValueError(f"struct_caption is not dict: {type(struct_caption)}")
-        except Exception:
-            struct_caption = {}
-
-        cleaned = clean_struct_caption(struct_caption, mode)
-        new_struct_caption = json.dumps(cleaned, indent=4, ensure_ascii=False)
+        new_struct_caption = json.dumps(self._prepared(sample)["cleaned"], indent=4, ensure_ascii=False)
 
         return [
             {
@@ -177,46 +233,22 @@ class FusionCaptionTask(Task):
             }
         ]
 
+    def sampling_overrides(self, sample: Dict[str, Any]) -> Dict[str, Any]:
+        # 只用第一行：生成到换行即停止
+        return {"stop": ["\n"]}
+
     def parse(self, generated_text: str, sample: Dict[str, Any]) -> Dict[str, Any]:
         p = self._get_params(sample)
-        mode = p["mode"]
-        input_field = p["input_field"]
-        original_text = p["original_text"]
-
-        struct_text = sample.get(input_field, None)
-        try:
-            if isinstance(struct_text, str):
-                s = struct_text.strip()
-                l = s.find("{")
-                r = s.rfind("}")
-                if l != -1 and r != -1 and r > l:
-                    s = s[l : r + 1]
-                struct_caption = json.loads(s)
-            else:
-                struct_caption = struct_text
-            if not isinstance(struct_caption, dict):
-                raise ValueError(f"struct_caption is not dict: {type(struct_caption)}")
-        except Exception as e:
-            return {
-                "status": "error",
-                "error": f"{input_field}_json_parse_error: {repr(e)}",
-                "fusion_caption": original_text,
-                "fusion_by_llm": False,
-            }
-
-        camera_movement = compute_camera_movement(struct_caption)
-        cleaned = clean_struct_caption(struct_caption, mode)
-        fusion_by_llm = cleaned.get("num_subjects", 0) > 0
+        prep = self._prepared(sample)
+        if prep["error"] is not None:
+            return _parse_error(p["input_field"], prep["error"], p["original_text"])
 
-        if not fusion_by_llm:
-            caption = (original_text + " " + camera_movement).strip()
-            return {
-                "status": "ok",
-                "fusion_caption": caption,
-                "fusion_by_llm": False,
-            }
+        camera_movement = prep["camera_movement"]
+        if prep["cleaned"].get("num_subjects", 0) == 0:
+            return _no_subject_result(p["original_text"], camera_movement)
 
-        # mimic stop=["\n"] by truncating the first line
+        # stop=["\n"] is requested via sampling_overrides; keep the first line only in
+        # case the engine did not apply it
         txt = (generated_text or "").strip().split("\n", 1)[0].strip()
         llm_caption = (txt + " " + camera_movement).strip()
         return {
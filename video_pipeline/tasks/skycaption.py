@@ -2,8 +2,9 @@
 from __future__ import annotations
 from typing import Any, Dict, List
 
-from .base import Task
+from .base import STRING_SCHEMA, Task, object_schema
 from .registry import register_task
+from .structured_caption import SUBJECT_SCHEMA
 
 SYSTEM_PROMPT = (
     "I need you to generate a structured and detailed caption for the provided video. "
@@ -23,6 +24,23 @@ SYSTEM_PROMPT = (
     "\"environment\": \"Video background/environment description\", \"lighting\": \"Lighting information in the video\"}"
 )
 
+def _enum(*values: str) -> Dict[str, Any]:
+    return {"type": "string", "enum": list(values)}
+
+
+JSON_SCHEMA = object_schema({
+    "subjects": {"type": "array", "items": SUBJECT_SCHEMA},
+    "shot_type": _enum("long_shot", "full_shot", "medium_shot", "close_up", "extreme_close_up", "other"),
+    "shot_angle": _enum("eye_level", "high_angle", "low_angle", "other"),
+    "shot_position": _enum(
+        "front_view", "back_view", "side_view", "over_the_shoulder", "overhead_view",
+        "point_of_view", "aerial_view", "overlooking_view", "other",
+    ),
+    "camera_motion": STRING_SCHEMA,
+    "environment": STRING_SCHEMA,
+    "lighting": STRING_SCHEMA,
+})
+
 @register_task
 class SkyCaptionerTask(Task):
     name = "skycaption"
@@ -39,5 +57,11 @@ class SkyCaptionerTask(Task):
             },
         ]
 
+    def sampling_overrides(self, sample: Dict[str, Any]) -> Dict[str, Any]:
+        # task_params.guided_json: true => 输出严格按 SYSTEM_PROMPT 中的结构（guided decoding）
+        if self.task_param("guided_json", False):
+            return {"json_schema": JSON_SCHEMA}
+        return {}
+
     def parse(self, generated_text: str, sample: Dict[str, Any]) -> Dict[str, Any]:
         return {"caption": generated_text.strip()}
@@ -3,9 +3,24 @@ from __future__ import annotations
 import json
 from typing import Any, Dict, List
 
-from .base import Task
+from .base import STRING_SCHEMA, Task, object_schema
 from .registry import register_task
 
+SUBJECT_SCHEMA = object_schema({
+    "appearance": STRING_SCHEMA,
+    "action": STRING_SCHEMA,
+    "expression": STRING_SCHEMA,
+    "position": STRING_SCHEMA,
+    "TYPES": object_schema({"type": STRING_SCHEMA, "sub_type": STRING_SCHEMA}),
+    "is_main_subject": {"type": "boolean"},
+})
+
+JSON_SCHEMA = object_schema({
+    "subjects": {"type": "array", "items": SUBJECT_SCHEMA},
+    "scene": object_schema({"environment": STRING_SCHEMA, "camera": STRING_SCHEMA}),
+    "time": object_schema({"order": STRING_SCHEMA}),
+})
+
 @register_task
 class StructuredCaptionTask(Task):
     name = "structured_caption"
@@ -42,6 +57,12 @@ class StructuredCaptionTask(Task):
             },
         ]
 
+    def sampling_overrides(self, sample: Dict[str, Any]) -> Dict[str, Any]:
+        # task_params.guided_json: true => guided decoding，直接生成合法 JSON
+        if self.task_param("guided_json", False):
+            return {"json_schema": JSON_SCHEMA}
+        return {}
+
     def parse(self, generated_text: str, sample: Dict[str, Any]) -> Dict[str, Any]:
         txt = generated_text.strip()
         # 最简单容错：截取第一个 { 到最后一个 }
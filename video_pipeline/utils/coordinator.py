@@ -0,0 +1,243 @@
+# video_pipeline/utils/coordinator.py
+"""
+Lightweight TCP coordinator for multi-node runs (multiprocessing.managers).
+
+The coordinator process owns the pending chunks (line indices) and a progress queue.
+Nodes connect, `register` their number of ranks, and get a global rank range; their
+workers pull chunks through the node's own work queue (dynamic schedule) and report
+progress to it, exactly as with the local launcher's queues. Rank files are written
+to the (shared) output directory under global rank numbers, so the coordinator
+consolidates them when the run is over.
+
+The coordinator tracks the chunks each node has taken. A node reports `node_idle`
+once its ranks are done (its chunks are then finished) and sends a heartbeat while it
+lives; a node that reports an error, or stays silent for `node_timeout_s`, is retired
+and its chunks are requeued (minus what it already wrote, see `requeue_filter`). Idle
+nodes wait for such requeued work and run another round.
+
+    coordinator : python -m video_pipeline.cli.launch --config c.yaml --serve 0.0.0.0:29600 --nodes 2
+    node        : python -m video_pipeline.cli.launch --config c.yaml --coordinator head:29600 --authkey <key>
+
+The manager unpickles whatever authenticated clients send, so the authkey is the only
+thing standing between the port and code execution: there is no default, the
+coordinator generates one unless given.
+"""
+
+from __future__ import annotations
+
+import collections
+import logging
+import queue
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+HEARTBEAT_S = 10.0
+
+
+def parse_address(s: str) -> Tuple[str, int]:
+    host, _, port = s.rpartition(":")
+    if not host or not port:
+        raise ValueError(f"Expected HOST:PORT, got {s!r}")
+    return host, int(port)
+
+
+class CoordinatorState:
+    """Served by the coordinator; nodes call its methods through a manager proxy."""
+
+    def __init__(
+        self,
+        chunks: Iterable[Sequence[int]],
+        *,
+        num_nodes: int,
+        node_timeout_s: float = 120.0,
+        requeue_filter: Optional[Callable[[List[int]], List[int]]] = None,  # -> lines still pending
+    ):
+        self.progress_q: "queue.Queue[Any]" = queue.Queue()
+        self.num_nodes = num_nodes
+        self.node_timeout_s = node_timeout_s
+        self.requeue_filter = requeue_filter
+        self._chunks: "collections.deque[List[int]]" = collections.deque(list(c) for c in chunks)
+        self.num_chunks = len(self._chunks)
+        self._cond = threading.Condition()
+        self._nodes: Dict[str, Dict[str, Any]] = {}
+        self._next_rank = 0
+        self._requeueing = 0  # retired nodes whose chunks are being filtered / requeued
+
+    def register(self, node_id: str, num_ranks: int) -> Tuple[int, int]:
+        """
+        -> (first global rank of the node, world size). Blocks until `num_nodes` nodes have
+        registered. Nodes joining later get fresh ranks and share the remaining chunks.
+        """
+        with self._cond:
+            if node_id not in self._nodes:
+                self._nodes[node_id] = {
+                    "rank_base": self._next_rank, "num_ranks": num_ranks, "held": [],
+                    "last_seen": time.monotonic(), "idle": False, "failed": False, "error": None,
+                }
+                self._next_rank += num_ranks
+                self._cond.notify_all()
+            self._cond.wait_for(lambda: len(self._nodes) >= self.num_nodes)
+            return self._nodes[node_id]["rank_base"], self._next_rank
+
+    def heartbeat(self, node_id: str) -> None:
+        with self._cond:
+            node = self._nodes.get(node_id)
+            if node is not None:
+                node["last_seen"] = time.monotonic()
+
+    def take(self, node_id: str) -> Optional[List[int]]:
+        """Next chunk for one of the node's consumers (recorded as held by the node); None when none is left."""
+        with self._cond:
+            node = self._nodes[node_id]
+            node["last_seen"] = time.monotonic()
+            if node["failed"] or not self._chunks:
+                return None
+            chunk = self._chunks.popleft()
+            node["held"].append(chunk)
+            return chunk
+
+    def node_idle(self, node_id: str, error: Optional[str] = None) -> bool:
+        """
+        The node's ranks have finished a round: its held chunks are done, or, with `error`,
+        requeued and the node is retired. Then blocks until chunks of a lost node are
+        requeued (-> True: run another round) or the run is over (-> False).
+        """
+        with self._cond:
+            node = self._nodes[node_id]
+            if node["failed"]:
+                return False
+            if error is not None:
+                held = self._retire(node, error)
+            else:
+                node["held"], node["idle"] = [], True
+                self._cond.notify_all()
+        if error is not None:
+            self._requeue(held)
+            return False
+        with self._cond:
+            self._cond.wait_for(lambda: self._chunks or node["failed"] or self._complete())
+            if self._chunks and not node["failed"]:
+                node["idle"] = False
+                return True
+            return False
+
+    def _retire(self, node: Dict[str, Any], error: str) -> List[List[int]]:
+        # caller holds the lock and passes the result to `_requeue` without it
+        held, node["held"] = node["held"], []
+        node["failed"], node["error"] = True, error
+        self._requeueing += 1
+        self._cond.notify_all()
+        return held
+
+    def _requeue(self, held: List[List[int]]) -> None:
+        lines = [i for chunk in held for i in chunk]
+        try:
+            if lines and self.requeue_filter is not None:
+                try:
+                    lines = list(self.requeue_filter(lines))
+                except Exception as e:
+                    # a duplicate is better than a lost sample
+                    logging.getLogger("video_pipeline.coordinator").warning(
+                        "requeue filter failed (%s: %s); requeueing all %d lines", type(e).__name__, e, len(lines)
+                    )
+            chunk_size = max(len(c) for c in held) if held else 1
+            with self._cond:
+                for i in range(0, len(lines), chunk_size):
+                    self._chunks.append(lines[i : i + chunk_size])
+        finally:
+            with self._cond:
+                self._requeueing -= 1
+                self._cond.notify_all()
+
+    def _complete(self) -> bool:
+        # every live node idle and nothing left to hand out (or nobody left to hand it to)
+        if len(self._nodes) < self.num_nodes or self._requeueing:
+            return False
+        alive = [n for n in self._nodes.values() if not n["failed"]]
+        return all(n["idle"] for n in alive) and (not self._chunks or not alive)
+
+    def pending_lines(self) -> int:
+        """Lines never handed out (after the run: left over because every node failed)."""
+        with self._cond:
+            return sum(len(c) for c in self._chunks)
+
+    def wait_finished(self) -> Dict[str, Optional[str]]:
+        """
+        Blocks until the run is over, retiring nodes silent for `node_timeout_s` (their
+        chunks are requeued); -> {node: error}.
+        """
+        poll_s = min(HEARTBEAT_S, self.node_timeout_s / 4)
+        while True:
+            with self._cond:
+                if self._complete():
+                    return {node_id: n["error"] for node_id, n in self._nodes.items()}
+                self._cond.wait(poll_s)
+                now = time.monotonic()
+                lost = [
+                    self._retire(n, f"no heartbeat for {self.node_timeout_s:.0f}s")
+                    for n in self._nodes.values()
+                    if not n["failed"] and now - n["last_seen"] > self.node_timeout_s
+                ]
+            for held in lost:
+                self._requeue(held)
+
+
+class NodeWorkQueue:
+    """A node's work queue (served next to the state): `get` takes the next chunk, None when none is left."""
+
+    def __init__(self, state: CoordinatorState, node_id: str):
+        self.state = state
+        self.node_id = node_id
+
+    def get(self) -> Optional[List[int]]:
+        return self.state.take(self.node_id)
+
+    def put(self, chunk: Optional[List[int]]) -> None:
+        # the launcher's restart hook re-posts stop tokens; `get` already returns None when work runs out
+        if chunk is not None:
+            raise ValueError("chunks are handed out by the coordinator")
+
+
+class CoordinatorManager(BaseManager):
+    pass
+
+
+class CoordinatorClient(BaseManager):
+    pass
+
+
+def serve_coordinator(state: CoordinatorState, address: Tuple[str, int], authkey: bytes):
+    """Start the manager server in a daemon thread; returns the server (call `.stop_event.set()` to stop)."""
+    CoordinatorManager.register("state", callable=lambda: state)
+    CoordinatorManager.register("work_queue", callable=lambda node_id: NodeWorkQueue(state, node_id))
+    CoordinatorManager.register("progress_queue", callable=lambda: state.progress_q)
+    server = CoordinatorManager(address=address, authkey=authkey).get_server()
+    threading.Thread(target=server.serve_forever, name="coordinator", daemon=True).start()
+    return server
+
+
+def connect_coordinator(address: Tuple[str, int], authkey: bytes) -> CoordinatorClient:
+    # a separate manager class, so a client in the coordinator's process keeps the served callables
+    CoordinatorClient.register("state")
+    CoordinatorClient.register("work_queue")
+    CoordinatorClient.register("progress_queue")
+    manager = CoordinatorClient(address=address, authkey=authkey)
+    manager.connect()
+    return manager
+
+
+def start_heartbeat(state, node_id: str, interval_s: float = HEARTBEAT_S) -> threading.Event:
+    """Call `state.heartbeat(node_id)` every `interval_s` from a daemon thread; set the returned event to stop."""
+    stop = threading.Event()
+
+    def beat() -> None:
+        while not stop.wait(interval_s):
+            try:
+                state.heartbeat(node_id)
+            except (OSError, EOFError):
+                return  # the coordinator is gone; the node notices on its next call
+
+    threading.Thread(target=beat, name="heartbeat", daemon=True).start()
+    return stop
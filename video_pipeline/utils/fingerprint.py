@@ -0,0 +1,18 @@
+# video_pipeline/utils/fingerprint.py
+from __future__ import annotations
+
+import hashlib
+import os
+
+_HASH_CHUNK = 1 << 20  # 首尾各 1MiB + 文件大小，作为内容指纹
+
+
+def content_fingerprint(path: str, size: int) -> str:
+    """sha1 over the file size and its first / last MiB."""
+    h = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as f:
+        h.update(f.read(_HASH_CHUNK))
+        if size > 2 * _HASH_CHUNK:
+            f.seek(-_HASH_CHUNK, os.SEEK_END)
+            h.update(f.read(_HASH_CHUNK))
+    return h.hexdigest()
@@ -111,12 +111,14 @@ def setup_logging(cfg: Optional[LogConfig] = None) -> Dict[str, str]:
     rank = get_dist_rank()
     world_size = get_world_size()
 
-    # Root logger: start clean (avoid duplicated handlers in notebooks/restarts)
+    # Root logger: start clean (avoid duplicated handlers in notebooks/restarts, and
+    # leaked log files when a resident daemon worker re-initialises per job)
     root = logging.getLogger()
     root.setLevel(logging.DEBUG)  # handlers control output
 
     for h in list(root.handlers):
         root.removeHandler(h)
+        h.close()
 
     # Format
     fmt = _make_format(cfg)
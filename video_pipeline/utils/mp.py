@@ -4,8 +4,9 @@ from __future__ import annotations
 import os
 import socket
 import multiprocessing as mp
-from dataclasses import dataclass
-from typing import Callable, Dict, List, Optional
+from collections import deque
+from multiprocessing.connection import wait
+from typing import Callable, Deque, Dict, List, Optional, Tuple
 
 
 def find_free_port() -> int:
@@ -48,33 +49,81 @@ def make_gpu_groups(
     return groups
 
 
-@dataclass
-class SpawnSpec:
-    gpu_groups: List[List[int]]    # len=world_size, each len=tp
-    master_addr: str = "127.0.0.1"
-    master_port: int = 0           # 0 => auto
-
-
-def spawn(
+def supervise(
     *,
     worker_fn: Callable[..., None],
     worker_kwargs_list: List[Dict],
+    max_restarts: int,
+    on_restart: Optional[Callable[[Dict], None]] = None,
+    log: Callable[[str], None] = print,
 ) -> None:
     """
-    Spawn N processes (spawn method) with provided kwargs.
+    Spawn one process per kwargs dict (spawn method) and watch them as they run. Each
+    kwargs dict is one rank's work (rank, shard plan, ...) and carries the `gpu_group`
+    it starts on.
+
+    - A rank that exits non-zero is restarted at once on the same GPU group with
+      `restart=<attempt>` (the worker then resumes from what it already wrote), as
+      long as that group has failed at most `max_restarts` times.
+    - A group that keeps failing is retired; its rank's remaining work moves to the
+      next group whose own rank finished successfully. A rank that has retired two
+      groups is given up (its samples stay pending for the next resumed run).
+
+    `on_restart(kwargs)` is called before every restart / move. Raises RuntimeError
+    at the end if any rank did not finish.
     """
     ctx = mp.get_context("spawn")
-    procs = []
-    for kwargs in worker_kwargs_list:
+    n = len(worker_kwargs_list)
+    groups = [kw["gpu_group"] for kw in worker_kwargs_list]
+    group_failures = [0] * n
+    attempts = [0] * n       # failures per rank, wherever it ran
+    groups_retired = [0] * n  # groups retired while running this rank
+    running: Dict[int, Tuple[mp.process.BaseProcess, int, int]] = {}  # sentinel -> (proc, rank idx, group idx)
+    orphans: Deque[int] = deque()
+    free_groups: List[int] = []
+    given_up: List[int] = []
+
+    def start(i: int, g: int) -> None:
+        kwargs = {**worker_kwargs_list[i], "gpu_group": groups[g]}
+        if attempts[i] > 0:
+            kwargs["restart"] = attempts[i]
+            if on_restart is not None:
+                on_restart(kwargs)
         p = ctx.Process(target=worker_fn, kwargs=kwargs, daemon=False)
         p.start()
-        procs.append(p)
+        running[p.sentinel] = (p, i, g)
+
+    for i in range(n):
+        start(i, i)
 
-    exit_codes = []
-    for p in procs:
-        p.join()
-        exit_codes.append(p.exitcode)
+    while running:
+        for sentinel in wait(list(running)):
+            p, i, g = running.pop(sentinel)
+            p.join()
+            if p.exitcode == 0:
+                free_groups.append(g)
+            else:
+                attempts[i] += 1
+                group_failures[g] += 1
+                if group_failures[g] <= max_restarts:
+                    log(
+                        f"🔁 rank {i} exited with code {p.exitcode} on GPUs {groups[g]}; "
+                        f"restarting ({group_failures[g]}/{max_restarts})"
+                    )
+                    start(i, g)
+                    continue
+                groups_retired[i] += 1
+                log(f"🚫 GPUs {groups[g]} failed {group_failures[g]} times; retiring the group")
+                if groups_retired[i] >= 2:
+                    log(f"⚠️  rank {i} failed on two GPU groups; giving up on its remaining samples")
+                    given_up.append(i)
+                else:
+                    orphans.append(i)
+            while orphans and free_groups:
+                i, g = orphans.popleft(), free_groups.pop()
+                log(f"➡️  moving the remaining work of rank {i} to GPUs {groups[g]}")
+                start(i, g)
 
-    bad = [c for c in exit_codes if c != 0]
-    if bad:
-        raise RuntimeError(f"Some workers exited non-zero: exit_codes={exit_codes}")
+    unfinished = sorted(list(orphans) + given_up)
+    if unfinished:
+        raise RuntimeError(f"Ranks {unfinished} did not finish (restart budget exhausted)")
@@ -0,0 +1,246 @@
+# video_pipeline/utils/pipeline.py
+"""
+Three-stage worker pipeline: decode -> generate -> parse/write.
+
+    producer thread : iterates the batch source (DataLoader / threaded decoder) into
+                      a bounded prefetch queue
+    caller thread   : pulls ready batches and runs generation
+    writer thread   : parses + writes results from a second bounded queue
+
+Stage stats (time each stage waits on its neighbours and the queue depths) tell
+which stage is the bottleneck: a generator that mostly waits for input means
+decoding is too slow; a full output queue means writing is.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+_END = object()
+
+
+@dataclass
+class _Failure:
+    exc: BaseException
+
+
+@dataclass
+class PipelineStats:
+    batches: int = 0
+    gen_wait_s: float = 0.0      # generator idle, waiting for decoded batches
+    gen_busy_s: float = 0.0      # time inside generate()
+    write_block_s: float = 0.0   # generator blocked because the writer queue is full
+    in_depth_sum: int = 0
+    out_depth_sum: int = 0
+
+    def summary(self) -> str:
+        n = max(1, self.batches)
+        return (
+            f"batches={self.batches} gen_busy={self.gen_busy_s:.1f}s gen_wait_input={self.gen_wait_s:.1f}s "
+            f"blocked_on_writer={self.write_block_s:.1f}s "
+            f"avg_prefetch_depth={self.in_depth_sum / n:.2f} avg_write_depth={self.out_depth_sum / n:.2f}"
+        )
+
+
+class Prefetcher:
+    """
+    Iterate `source` in a background thread into a bounded queue. `poll()` lets the
+    consumer take an item only if one is ready, so it can keep other work going.
+    """
+
+    def __init__(self, source: Iterable[Any], maxsize: int):
+        self._q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, maxsize))
+        self._stop = threading.Event()
+        self._done = False
+        self._thread = threading.Thread(target=self._run, args=(source,), name="prefetch", daemon=True)
+        self._thread.start()
+
+    def _put(self, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, source: Iterable[Any]) -> None:
+        try:
+            for item in source:
+                if not self._put(item):
+                    return
+            self._put(_END)
+        except BaseException as e:  # noqa: BLE001 - forwarded to the consumer
+            self._put(_Failure(e))
+
+    def poll(self, block: bool = True) -> Tuple[bool, Any]:
+        """(True, item) | (False, None) if nothing is ready; StopIteration when exhausted."""
+        if self._done:
+            raise StopIteration
+        try:
+            item = self._q.get(block=block)
+        except queue.Empty:
+            return False, None
+        if item is _END:
+            self._done = True
+            raise StopIteration
+        if isinstance(item, _Failure):
+            self._done = True
+            raise item.exc
+        return True, item
+
+    def qsize(self) -> int:
+        return self._q.qsize()
+
+    def close(self) -> None:
+        self._stop.set()
+        while True:
+            try:
+                self._q.get_nowait()
+            except queue.Empty:
+                break
+        self._thread.join(timeout=5)
+
+
+def iter_threaded_batches(
+    dataset,
+    *,
+    batches: Iterable[Sequence[int]],
+    collate_fn: Callable[[List[Any]], Any],
+    num_threads: int,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[Any]:
+    """
+    Collated `batches` (lists of indices) of a map-style dataset whose items are built
+    by `num_threads` threads (decoders such as torchcodec/ffmpeg release the GIL), in
+    order. At most `max_in_flight` items are being built or waiting at any time.
+    """
+    max_in_flight = max_in_flight or num_threads * 2
+    with ThreadPoolExecutor(max_workers=num_threads) as ex:
+        pending: Deque = deque()  # (future, last item of its batch?)
+
+        def _drain(limit: int) -> Iterator[Any]:
+            batch: List[Any] = []
+            while len(pending) > limit or (pending and batch):
+                fut, last = pending.popleft()
+                batch.append(fut.result())
+                if last:
+                    yield collate_fn(batch)
+                    batch = []
+                    if len(pending) <= limit:
+                        return
+
+        for idxs in batches:
+            for n, i in enumerate(idxs):
+                pending.append((ex.submit(dataset.__getitem__, i), n == len(idxs) - 1))
+            yield from _drain(max_in_flight)
+        yield from _drain(0)
+
+
+def run_pipelined(
+    source: Iterable[Any],
+    generate: Callable[[Any], Any],
+    consume: Callable[[Any, Any], None],
+    *,
+    prefetch: int,
+    write_queue: int = 2,
+    logger: Optional[logging.Logger] = None,
+    log_every: int = 20,
+) -> PipelineStats:
+    """
+    Run `consume(batch, generate(batch))` for every batch of `source` with decoding,
+    generation and writing overlapped. `generate` may return None to skip a batch.
+    Exceptions from any stage are re-raised in the caller.
+    """
+    in_q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, prefetch))
+    out_q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, write_queue))
+    stop = threading.Event()
+    stats = PipelineStats()
+
+    def _put(q: "queue.Queue[Any]", item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer() -> None:
+        try:
+            for batch in source:
+                if not _put(in_q, batch):
+                    return
+            _put(in_q, _END)
+        except BaseException as e:  # noqa: BLE001 - forwarded to the caller
+            _put(in_q, _Failure(e))
+
+    writer_error: List[BaseException] = []
+
+    def writer() -> None:
+        while True:
+            item = out_q.get()
+            if item is _END:
+                return
+            try:
+                consume(*item)
+            except BaseException as e:  # noqa: BLE001
+                writer_error.append(e)
+                stop.set()
+                return
+
+    t_prod = threading.Thread(target=producer, name="pipeline-decode", daemon=True)
+    t_write = threading.Thread(target=writer, name="pipeline-write", daemon=True)
+    t_prod.start()
+    t_write.start()
+
+    try:
+        while not writer_error:
+            t0 = time.perf_counter()
+            batch = in_q.get()
+            stats.gen_wait_s += time.perf_counter() - t0
+            if batch is _END:
+                break
+            if isinstance(batch, _Failure):
+                raise batch.exc
+            stats.in_depth_sum += in_q.qsize()
+            stats.out_depth_sum += out_q.qsize()
+
+            t0 = time.perf_counter()
+            result = generate(batch)
+            stats.gen_busy_s += time.perf_counter() - t0
+            stats.batches += 1
+
+            if result is not None:
+                t0 = time.perf_counter()
+                if not _put(out_q, (batch, result)):
+                    break
+                stats.write_block_s += time.perf_counter() - t0
+
+            if logger is not None and log_every > 0 and stats.batches % log_every == 0:
+                logger.info("pipeline: %s", stats.summary())
+    finally:
+        if not writer_error:
+            out_q.put(_END)
+            t_write.join()
+        stop.set()
+        # unblock the producer if it is waiting on a full queue
+        while True:
+            try:
+                in_q.get_nowait()
+            except queue.Empty:
+                break
+        t_prod.join(timeout=5)
+
+    if writer_error:
+        raise writer_error[0]
+    if logger is not None:
+        logger.info("pipeline done: %s", stats.summary())
+    return stats
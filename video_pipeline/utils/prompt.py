@@ -0,0 +1,11 @@
+# video_pipeline/utils/prompt.py
+from __future__ import annotations
+
+# 第一个视觉占位符之前的 prompt 是可以跨样本共享的前缀（Qwen-VL chat template）
+_VISION_MARKERS = ("<|vision_start|>", "<|video_pad|>", "<|image_pad|>")
+
+
+def prompt_prefix(prompt: str) -> str:
+    """Part of the prompt before the first per-sample vision token."""
+    cut = min((i for i in (prompt.find(m) for m in _VISION_MARKERS) if i >= 0), default=len(prompt))
+    return prompt[:cut]